@@ -3,10 +3,13 @@ import httpx
 import secrets
 import hashlib
 import base64
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, TYPE_CHECKING
 from urllib.parse import urlencode
 from dataclasses import dataclass
 
+if TYPE_CHECKING:
+    from providers.http_transport import HTTPTransport
+
 @dataclass
 class OAuthProvider:
     """OAuth provider configuration"""
@@ -62,8 +65,19 @@ class OAuthManager:
         ),
     }
     
-    def __init__(self):
+    def __init__(self, http_transport: Optional['HTTPTransport'] = None):
+        """
+        Args:
+            http_transport: Shared pooled HTTP transport (throwaway client if None)
+        """
         self._pending_states: Dict[str, Dict] = {}  # state -> provider_data
+        self.http_transport = http_transport
+    
+    def _http_session(self):
+        """HTTP client context (shared pool when available)"""
+        if self.http_transport:
+            return self.http_transport.session()
+        return httpx.AsyncClient()
     
     def add_provider(self, provider: OAuthProvider):
         """Dynamically add a new OAuth provider"""
@@ -189,7 +203,7 @@ class OAuthManager:
             token_data["client_secret"] = provider.client_secret
         
         # Exchange code for token
-        async with httpx.AsyncClient() as client:
+        async with self._http_session() as client:
             response = await client.post(
                 provider.token_url,
                 data=token_data,
@@ -236,7 +250,7 @@ class OAuthManager:
         if provider.client_secret:
             refresh_data["client_secret"] = provider.client_secret
         
-        async with httpx.AsyncClient() as client:
+        async with self._http_session() as client:
             response = await client.post(
                 provider.token_url,
                 data=refresh_data,
@@ -43,6 +43,9 @@ class Settings(BaseSettings):
     # Ollama (Local, Free, Privacy-first) - PRIORITY 1
     ollama_base_url: Optional[str] = None
     ollama_model: str = "llama2"  # or llama3, mistral, etc.
+    ollama_max_concurrency: int = 2  # Local GPU box runs only a few generations at once
+    ollama_max_queue: int = 8
+    ollama_context_window: int = 4096
     
     # Claude (Fallback) - PRIORITY 2
     anthropic_api_key: Optional[str] = None
@@ -56,7 +59,107 @@ class Settings(BaseSettings):
     # Groq (FREEMIUM - gratuit, ultra rapide) - PRIORITY 1
     groq_api_key: Optional[str] = None
     
-    # Mem0 Memory Layer (Token Optimization)
+    # Shared HTTP transport (provider + OAuth calls)
+    http_pool_max_connections: int = 100
+    http_pool_max_keepalive_connections: int = 20
+    http_pool_keepalive_expiry_seconds: float = 30.0
+    http2_enabled: bool = False  # Requires `h2` package
+    http_timeout_seconds: float = 30.0
+    
+    # Exact-match response cache (LLMRouter)
+    response_cache_backend: str = "memory"  # none | memory | sqlite
+    response_cache_max_entries: int = 1000
+    response_cache_ttl_seconds: float = 3600.0
+    response_cache_path: str = "./data/response_cache.db"
+    
+    # Circuit Breaker (per LLM deployment)
+    circuit_breaker_window: int = 20  # Recent calls used for error rate
+    circuit_breaker_min_calls: int = 5
+    circuit_breaker_error_threshold: float = 0.5
+    circuit_breaker_cooldown_seconds: float = 30.0
+    circuit_breaker_max_consecutive_timeouts: int = 2
+    
+    # Hedged requests (free-tier deployments are interchangeable)
+    hedge_default_delay_seconds: float = 1.5  # Until enough TTFT samples
+    hedge_min_delay_seconds: float = 0.3
+    hedge_max_delay_seconds: float = 5.0
+    hedge_min_samples: int = 5
+    
+    # Bulkheads (per deployment concurrency limit + fair wait queue)
+    bulkhead_max_concurrency: int = 16
+    bulkhead_max_queue: int = 32  # Full queue → spill over to next deployment
+    
+    # Token-budgeted context (per LLM call)
+    context_max_prompt_tokens: int = 8000  # Cost cap, even for huge windows
+    context_safety_margin_tokens: int = 256  # Estimator error margin
+    context_max_messages: int = 200  # History rows loaded from DB
+    
+    # Latency-aware routing (live EWMA stats per deployment)
+    routing_ewma_alpha: float = 0.2  # Weight of newest observation
+    routing_latency_bucket_seconds: float = 0.5  # Near-ties fall back to priority
+    routing_default_latency_seconds: float = 2.0  # Deployments without data yet
+    routing_stats_half_life_seconds: float = 300.0  # Idle stats decay back to the default
+    
+    # Rolling summary memory (room/memory.py). Local: summarizes the room
+    # transcript through the LLM router, independent of mem0_enabled below.
+    memory_enabled: bool = True
+    memory_summary_threshold: int = 30  # Unsummarized messages before folding
+    memory_recent_turns: int = 10  # Newest messages always sent verbatim
+    memory_chunk_tokens: int = 4000  # Max transcript tokens per summarizer call
+    memory_summary_max_tokens: int = 600  # Summary reply cap (chat replies get DEFAULT_MAX_TOKENS)
+    
+    # Agreement short-circuit (local draft similarity, orchestrator/agreement.py)
+    agreement_skip_threshold: float = 0.9  # Near-identical drafts (same negations, names, numbers) → no review calls
+    agreement_divergence_threshold: float = 0.3  # Below → "however"/"actually" count as disagreement
+    
+    # Request deadline (one wall-clock budget per user message, see
+    # providers/deadline.py) - every LLM call gets the remaining budget
+    chat_deadline_seconds: float = 60.0  # /chat response time SLA
+    deadline_step_reserve_seconds: float = 8.0  # Less left → skip optional steps, answer now
+    
+    # Unit of work: user message, discussion and AI answer written in one
+    # transaction per user message (one SQLite commit instead of 4-6)
+    unit_of_work: bool = True
+    unit_of_work_persist_user_first: bool = False  # Commit the question before AI calls (survives a crash)
+    
+    # Write-behind persistence (room/write_behind.py): finished turns are
+    # queued and written in batches by a background task
+    write_behind_enabled: bool = False
+    write_behind_flush_ms: int = 50  # Max delay before a row is written
+    write_behind_max_rows: int = 500  # Pending rows that trigger an immediate write
+    
+    # Client disconnect detection (cancel orchestration nobody will read)
+    disconnect_poll_seconds: float = 0.5
+    
+    # Background refinement (/chat returns the primary answer, review and
+    # discussion continue afterwards and are pushed over the room WebSocket)
+    background_refinement: bool = False
+    
+    # Quorum (return when k answers agree, cancel the rest)
+    quorum_n: int = 3  # Deployments queried by LLMRouter.quorum_chat
+    quorum_k: int = 2
+    quorum_similarity_threshold: float = 0.6  # Paraphrases score ~0.65; names / numbers / negations must match too
+    
+    # Semantic response cache (answers to repeated questions, every strategy)
+    semantic_cache_enabled: bool = True
+    semantic_cache_path: str = "./data/semantic_cache"
+    semantic_cache_threshold: float = 0.92  # Candidate cosine similarity (a hit also needs the same content words)
+    semantic_cache_ttl_seconds: float = 86400.0
+    semantic_cache_max_entries: int = 5000  # Per scope + AIs + strategy
+    semantic_cache_scope: str = "room"  # room | user (never shared across users)
+    
+    # Local vector index (retrieval of relevant earlier messages)
+    vector_index_enabled: bool = True
+    vector_index_path: str = "./data/vector_index"
+    vector_index_segment_rows: int = 4096  # Append segment size
+    vector_index_batch_size: int = 2000  # Messages read + embedded per background batch
+    vector_index_max_segments: int = 8  # More → compact into one segment
+    embedding_dim: int = 128  # 100k rows = 51 MB float32, scanned in a few ms
+    retrieval_top_k: int = 5
+    retrieval_min_score: float = 0.3  # Cosine similarity floor
+    
+    # Mem0 Memory Layer (Token Optimization). External Mem0/Qdrant store,
+    # separate from the rolling summary (memory_enabled above).
     mem0_api_key: Optional[str] = None
     mem0_enabled: bool = True
     
@@ -11,9 +11,18 @@ from datetime import datetime
 
 # Config & Models
 from config import settings
-from models.room import init_db, get_db, Room as DBRoom, Message as DBMessage, DemoSession
+from models.room import init_db, get_db, run_db, Room as DBRoom, Message as DBMessage, DemoSession
 from providers.llm_router import LLMRouter
+from providers.http_transport import HTTPTransport
 from room.manager import RoomManager
+from orchestrator.strategies import DEFAULT_STRATEGY, STRATEGIES
+from orchestrator.cancellation import ClientDisconnected, cancel_on_disconnect
+from providers.deadline import DeadlineExceeded, deadline_scope
+from room.memory import ConversationMemory
+from room.vector_index import VectorIndex
+from room.indexer import VectorIndexer
+from providers.semantic_cache import build_semantic_cache
+from room.write_behind import build_write_behind
 
 # Security
 from security.input_sanitizer import InputSanitizer
@@ -50,12 +59,47 @@ from auth.oauth_manager import OAuthManager
 from auth.token_store import TokenStore
 from auth.oauth_refresh import OAuthRefresher
 
-oauth_manager = OAuthManager()
+# Shared pooled HTTP transport (started/closed with the app)
+http_transport = HTTPTransport()
+
+oauth_manager = OAuthManager(http_transport=http_transport)
 token_store = TokenStore()
 oauth_refresher = OAuthRefresher(oauth_manager, token_store)
 
 # Initialize LLM Router with OAuth support
+# Shared app-wide so circuit breaker state survives across requests
 llm_router = LLMRouter(token_store=token_store, oauth_refresher=oauth_refresher)
+app.state.llm_router = llm_router
+
+# Rolling summary memory (background summarization of long rooms)
+conversation_memory = ConversationMemory(llm_router)
+
+# Local vector index (relevant earlier messages pulled into context)
+vector_index = VectorIndex() if settings.vector_index_enabled else None
+# New messages are embedded in the background, off the DB thread
+vector_indexer = VectorIndexer(vector_index) if vector_index else None
+
+# Semantic cache (answers to repeated questions)
+semantic_cache = build_semantic_cache()
+app.state.semantic_cache = semantic_cache  # Demo routes
+
+# Write-behind queue (batched message persistence for high-traffic rooms)
+write_behind = build_write_behind()
+
+
+@app.on_event("startup")
+async def start_http_transport():
+    """Open the app-lifetime connection pool (provider + OAuth calls)"""
+    await http_transport.start()
+    llm_router.use_transport(http_transport)
+
+
+@app.on_event("shutdown")
+async def close_http_transport():
+    """Close pooled connections, write queued messages"""
+    await http_transport.close()
+    if write_behind:
+        await write_behind.close()
 
 
 # === Health Check Endpoint === #
@@ -65,13 +109,20 @@ async def health_check():
     """
     Health check endpoint for frontend monitoring
     
-    Returns available AI providers and backend status
+    Returns available AI providers, circuit breaker state per deployment,
+    response cache savings and backend status
     """
     try:
         available_ais = llm_router.get_available_providers()
         return {
             "status": "online",
             "available_ais": available_ais,
+            "deployments": llm_router.get_health(),
+            "response_cache": llm_router.get_cache_stats(),
+            "coalescing": llm_router.get_coalescing_stats(),
+            "vector_index": vector_index.stats() if vector_index else None,
+            "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+            "write_behind": write_behind.stats() if write_behind else None,
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
@@ -88,6 +139,7 @@ async def health_check():
 class RoomCreate(BaseModel):
     title: constr(min_length=1, max_length=200) = "New Chat"
     active_ais: Optional[List[str]] = ['claude', 'gpt']
+    strategy: str = DEFAULT_STRATEGY
     
     @validator('title')
     def validate_title(cls, v):
@@ -103,6 +155,12 @@ class RoomCreate(BaseModel):
             if ai not in allowed_ais:
                 raise ValueError(f"Invalid AI: {ai}. Allowed: {allowed_ais}")
         return v
+    
+    @validator('strategy')
+    def validate_strategy(cls, v):
+        if v not in STRATEGIES:
+            raise ValueError(f"Invalid strategy: {v}. Allowed: {sorted(STRATEGIES)}")
+        return v
 
 
 class ChatMessage(BaseModel):
@@ -149,6 +207,10 @@ class ConnectionManager:
         if room_id in self.active_connections:
             self.active_connections[room_id].remove(websocket)
     
+    def has_listeners(self, room_id: str) -> bool:
+        """Is any WebSocket client still following this room?"""
+        return bool(self.active_connections.get(room_id))
+    
     async def broadcast(self, room_id: str, message: dict):
         """Broadcast message to all clients in room"""
         if room_id in self.active_connections:
@@ -193,16 +255,19 @@ async def create_room(
     await check_rate_limit_middleware(request, max_requests=5)
     
     room_manager = RoomManager(llm_router, db)
-    room = room_manager.create_room(
+    room = await run_db(
+        room_manager.create_room,
         title=room_data.title,
         user_id="default_user",  # TODO: Get from auth
-        active_ais=room_data.active_ais
+        active_ais=room_data.active_ais,
+        strategy=room_data.strategy
     )
     
     return {
         "room_id": room.room_id,
         "title": room.title,
         "active_ais": room.ai_list,
+        "strategy": room.strategy,
         "created_at": room.created_at.isoformat()
     }
 
@@ -211,12 +276,13 @@ async def create_room(
 async def list_rooms(db = Depends(get_db)):
     """List all rooms for user"""
     room_manager = RoomManager(llm_router, db)
-    rooms = room_manager.list_rooms(user_id="default_user")
+    rooms = await run_db(room_manager.list_rooms, user_id="default_user")
     
     return [{
         "room_id": r.room_id,
         "title": r.title,
         "active_ais": r.ai_list,
+        "strategy": r.strategy,
         "created_at": r.created_at.isoformat(),
         "updated_at": r.updated_at.isoformat()
     } for r in rooms]
@@ -226,7 +292,7 @@ async def list_rooms(db = Depends(get_db)):
 async def get_room(room_id: str, db = Depends(get_db)):
     """Get room details"""
     room_manager = RoomManager(llm_router, db)
-    room = room_manager.get_room(room_id)
+    room = await run_db(room_manager.get_room, room_id)
     
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
@@ -235,6 +301,7 @@ async def get_room(room_id: str, db = Depends(get_db)):
         "room_id": room.room_id,
         "title": room.title,
         "active_ais": room.ai_list,
+        "strategy": room.strategy,
         "created_at": room.created_at.isoformat(),
         "updated_at": room.updated_at.isoformat()
     }
@@ -243,13 +310,13 @@ async def get_room(room_id: str, db = Depends(get_db)):
 @app.get("/rooms/{room_id}/messages")
 async def get_messages(room_id: str, db = Depends(get_db)):
     """Get all messages in a room"""
-    room_manager = RoomManager(llm_router, db)
-    room = room_manager.get_room(room_id)
+    room_manager = RoomManager(llm_router, db, write_behind=write_behind)
+    room = await run_db(room_manager.get_room, room_id)
     
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
-    messages = room_manager.get_messages(room)
+    messages = await run_db(room_manager.get_messages, room)
     
     return [{
         "role": m.role,
@@ -264,13 +331,13 @@ async def get_messages(room_id: str, db = Depends(get_db)):
 @app.get("/rooms/{room_id}/discussions")
 async def get_discussions(room_id: str, db = Depends(get_db)):
     """Get all AI discussions in a room"""
-    room_manager = RoomManager(llm_router, db)
-    room = room_manager.get_room(room_id)
+    room_manager = RoomManager(llm_router, db, write_behind=write_behind)
+    room = await run_db(room_manager.get_room, room_id)
     
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
-    discussions = room_manager.get_discussions(room)
+    discussions = await run_db(room_manager.get_discussions, room)
     
     return [{
         "id": d.id,
@@ -293,21 +360,74 @@ async def send_message(
     """Send a chat message and get AI response(s)
     
     SECURITY: Rate limited, sanitized, prompt filtered
+    
+    AI output is streamed to /ws/{room_id} as incremental "token" frames
+    (author + phase), then the full result is broadcast as "new_messages".
+    
+    With settings.background_refinement, multi-AI messages return the
+    primary answer right away ("refining": true); the reviewed result is
+    broadcast later as a "refined_message" frame.
     """
     await check_rate_limit_middleware(request_obj, max_requests=10)
     
+    # Stream AI output to WebSocket clients as it is generated
+    async def stream_token(author: str, phase: str, delta: str):
+        await manager.broadcast(chat_msg.room_id, {
+            "type": "token",
+            "data": {
+                "author": author,
+                "phase": phase,
+                "delta": delta
+            }
+        })
+    
+    # Revised answer from background review/discussion
+    async def push_refinement(room_id: str, payload: dict):
+        await manager.broadcast(room_id, {
+            "type": "refined_message",
+            "data": payload
+        })
+    
     # Get room
-    room_manager = RoomManager(llm_router, db)
-    room = room_manager.get_room(chat_msg.room_id)
+    room_manager = RoomManager(
+        llm_router,
+        db,
+        on_token=stream_token,
+        memory=conversation_memory,
+        vector_index=vector_index,
+        indexer=vector_indexer,
+        semantic_cache=semantic_cache,
+        write_behind=write_behind,
+        on_refined=push_refinement
+    )
+    room = await run_db(room_manager.get_room, chat_msg.room_id)
     
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
+    # Nobody left to read the answer: HTTP caller gone and no WebSocket
+    # client following the room
+    async def client_gone() -> bool:
+        return await request_obj.is_disconnected() and not manager.has_listeners(chat_msg.room_id)
+    
     # Process message (orchestrate AI collaboration)
-    result = await room_manager.process_user_message(
-        room=room,
-        content=chat_msg.content
-    )
+    # SAFEGUARD: cancelled on disconnect - in-flight provider calls are
+    # aborted and the partial answer is recorded
+    # SAFEGUARD: one deadline for the whole message - every LLM call gets
+    # the remaining budget, optional steps are skipped when it runs low
+    try:
+        with deadline_scope(settings.chat_deadline_seconds):
+            result = await cancel_on_disconnect(
+                client_gone,
+                room_manager.process_user_message(
+                    room=room,
+                    content=chat_msg.content
+                )
+            )
+    except ClientDisconnected:
+        return {"cancelled": True}
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="AI response timed out")
     
     # Return response
     response_data = {
@@ -324,7 +444,8 @@ async def send_message(
             "mentions": result['ai_message'].mention_list,
             "timestamp": result['ai_message'].timestamp.isoformat()
         },
-        "discussion": None
+        "discussion": None,
+        "refining": result.get('refinement') is not None
     }
     
     # Include discussion if exists
@@ -356,7 +477,7 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
     try:
         while True:
             # Just keep connection alive
-            # (messages are broadcasted from /chat endpoint)
+            # (tokens + messages are broadcasted from /chat endpoint)
             data = await websocket.receive_text()
             # Echo back (optional)
             await websocket.send_json({"type": "ack", "data": "received"})
@@ -2,12 +2,53 @@
 
 Models for rooms, messages, and AI discussions.
 """
-from sqlalchemy import String, DateTime, Text, ForeignKey, Integer
+from sqlalchemy import String, DateTime, Text, ForeignKey, Integer, Index
+from sqlalchemy.ext.mutable import MutableList
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 from typing import List
 import json
 
+try:
+    import orjson  # Optional fast codec
+except ImportError:
+    orjson = None
+
+
+def json_dumps(value) -> str:
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value)
+
+
+def json_loads(text: str):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+class JSONText(TypeDecorator):
+    """JSON list stored as TEXT (same format as before - no migration)
+    
+    Decoded once when the row is loaded, not on every attribute access;
+    with MutableList, in-place changes (append...) are tracked too.
+    """
+    impl = Text
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        return json_dumps(value) if value is not None else None
+    
+    def process_result_value(self, value, dialect):
+        return json_loads(value) if value else []
+
+
+def json_list_column(**kwargs):
+    """Mapped column holding a JSON list (decoded once per load)"""
+    return mapped_column(MutableList.as_mutable(JSONText), default=list, **kwargs)
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -19,23 +60,24 @@ class Room(Base):
     room_id: Mapped[str] = mapped_column(String(100), unique=True, index=True)
     title: Mapped[str] = mapped_column(String(200))
     user_id: Mapped[str] = mapped_column(String(100))
-    active_ais: Mapped[str] = mapped_column(Text)
+    active_ais: Mapped[list] = json_list_column()
+    strategy: Mapped[str] = mapped_column(String(32), default="consensus")  # orchestrator/strategies.py
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     messages: Mapped[List["Message"]] = relationship(back_populates="room", cascade="all, delete-orphan")
     discussions: Mapped[List["AIDiscussion"]] = relationship(back_populates="room", cascade="all, delete-orphan")
+    summary: Mapped["RoomSummary | None"] = relationship(back_populates="room", cascade="all, delete-orphan", uselist=False)
     
     @property
     def ai_list(self) -> list:
-        """Parse active_ais JSON"""
-        return json.loads(self.active_ais) if self.active_ais else []
+        """Active AIs (decoded when the row was loaded)"""
+        return self.active_ais if self.active_ais is not None else []
     
     @ai_list.setter
     def ai_list(self, value: list) -> None:
-        """Set active_ais as JSON"""
-        self.active_ais = json.dumps(value)
+        self.active_ais = list(value)
 
 
 class Message(Base):
@@ -47,9 +89,11 @@ class Message(Base):
     role: Mapped[str] = mapped_column(String(20))
     author: Mapped[str] = mapped_column(String(50))
     content: Mapped[str] = mapped_column(Text)
-    mentions: Mapped[str] = mapped_column(Text)
+    mentions: Mapped[list] = json_list_column()
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     discussion_id: Mapped[int | None] = mapped_column(ForeignKey("ai_discussions.id"), nullable=True)
+    # Set when background refinement replaced this answer (left out of contexts)
+    superseded_by_id: Mapped[int | None] = mapped_column(ForeignKey("messages.id"), nullable=True)
     
     # Relationships
     room: Mapped["Room"] = relationship(back_populates="messages")
@@ -57,13 +101,12 @@ class Message(Base):
     
     @property
     def mention_list(self) -> list:
-        """Parse mentions JSON"""
-        return json.loads(self.mentions) if self.mentions else []
+        """@mentions (decoded when the row was loaded)"""
+        return self.mentions if self.mentions is not None else []
     
     @mention_list.setter
     def mention_list(self, value: list) -> None:
-        """Set mentions as JSON"""
-        self.mentions = json.dumps(value)
+        self.mentions = list(value)
 
 
 class AIDiscussion(Base):
@@ -72,9 +115,9 @@ class AIDiscussion(Base):
     
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     room_id: Mapped[int] = mapped_column(ForeignKey("rooms.id"))
-    participants: Mapped[str] = mapped_column(Text)
+    participants: Mapped[list] = json_list_column()
     topic: Mapped[str] = mapped_column(String(500))
-    messages: Mapped[str] = mapped_column(Text)
+    messages: Mapped[list] = json_list_column()  # Legacy - turns now in discussion_turns
     consensus: Mapped[str | None] = mapped_column(Text, nullable=True)
     status: Mapped[str] = mapped_column(String(20), default="ongoing")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -82,32 +125,88 @@ class AIDiscussion(Base):
     
     # Relationship
     room: Mapped["Room"] = relationship(back_populates="discussions")
+    turns: Mapped[List["DiscussionTurn"]] = relationship(
+        back_populates="discussion",
+        cascade="all, delete-orphan",
+        order_by="DiscussionTurn.seq",
+        lazy="selectin"  # Discussion lists load all turns in one query
+    )
     
     @property
     def participant_list(self) -> list:
-        return json.loads(self.participants) if self.participants else []
+        return self.participants if self.participants is not None else []
     
     @participant_list.setter
     def participant_list(self, value: list) -> None:
-        self.participants = json.dumps(value)
+        self.participants = list(value)
     
     @property
     def message_list(self) -> list:
-        return json.loads(self.messages) if self.messages else []
+        """Discussion turns as dicts (legacy discussions: JSON column)"""
+        if self.turns:
+            return [turn.as_dict() for turn in self.turns]
+        return list(self.messages or [])
     
     @message_list.setter
     def message_list(self, value: list) -> None:
-        self.messages = json.dumps(value)
+        self.turns = [
+            DiscussionTurn(seq=seq, ai=msg["ai"], content=msg["content"], created_at=datetime.utcnow())
+            for seq, msg in enumerate(value)
+        ]
+        self.messages = []
+    
+    def add_message(self, ai_name: str, content: str) -> "DiscussionTurn":
+        """Add a message to the discussion (one INSERT, nothing rewritten)"""
+        if not self.turns and self.messages:
+            self.message_list = list(self.messages)  # Legacy discussion → turns
+        turn = DiscussionTurn(seq=len(self.turns), ai=ai_name, content=content, created_at=datetime.utcnow())
+        self.turns.append(turn)
+        return turn
+
+
+class DiscussionTurn(Base):
+    """One message of an AI discussion (append-only)"""
+    __tablename__ = "discussion_turns"
+    __table_args__ = (
+        Index("ix_discussion_turns_discussion_seq", "discussion_id", "seq", unique=True),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    discussion_id: Mapped[int] = mapped_column(ForeignKey("ai_discussions.id"))
+    seq: Mapped[int] = mapped_column(Integer)
+    ai: Mapped[str] = mapped_column(String(50))
+    content: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    
+    # Relationship
+    discussion: Mapped["AIDiscussion"] = relationship(back_populates="turns")
     
-    def add_message(self, ai_name: str, content: str) -> None:
-        """Add a message to the discussion"""
-        msgs = self.message_list
-        msgs.append({
-            'ai': ai_name,
-            'content': content,
-            'timestamp': datetime.utcnow().isoformat()
-        })
-        self.message_list = msgs
+    def as_dict(self) -> dict:
+        """Same shape as the legacy JSON entries"""
+        return {
+            'ai': self.ai,
+            'content': self.content,
+            'timestamp': (self.created_at or datetime.utcnow()).isoformat()
+        }
+
+
+class RoomSummary(Base):
+    """Rolling summary of a room's older messages (memory layer)
+    
+    Messages with id <= covered_until_id are folded into the summary;
+    context = summary + messages after it.
+    """
+    __tablename__ = "room_summaries"
+    
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    room_id: Mapped[int] = mapped_column(ForeignKey("rooms.id"), unique=True, index=True)
+    summary: Mapped[str] = mapped_column(Text)
+    covered_until_id: Mapped[int] = mapped_column(Integer, default=0)
+    covered_count: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationship
+    room: Mapped["Room"] = relationship(back_populates="summary")
 
 
 class DemoSession(Base):
@@ -159,18 +258,57 @@ class DemoSession(Base):
 
 
 # Database setup
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Generator, TypeVar
+import asyncio
+import functools
+
+T = TypeVar("T")
 
 DATABASE_URL = "sqlite:///./chika.db"
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: loaded attributes stay readable on the event loop
+# after a commit (no lazy reload = no hidden blocking query)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Dedicated DB thread: blocking SQLAlchemy calls (query, commit + SQLite
+# fsync) never run on the event loop. One thread = SQLite's single writer
+# (no lock contention), and a session is never used by two threads at once.
+_db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+
+# Columns added after first release: (table, column, DDL) - create_all
+# doesn't alter existing tables
+ADDED_COLUMNS = [
+    ("rooms", "strategy", "VARCHAR(32) NOT NULL DEFAULT 'consensus'"),
+    ("messages", "superseded_by_id", "INTEGER REFERENCES messages(id)"),
+]
 
 def init_db() -> None:
     """Initialize database"""
     Base.metadata.create_all(bind=engine)
+    ensure_columns()
+
+def ensure_columns() -> None:
+    """Add columns missing from databases created by older versions"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, column, ddl in ADDED_COLUMNS:
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+                print(f"🛠️ Added column {table}.{column}")
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking DB function on the DB thread
+    
+    Usage from async code:
+        room = await run_db(room_manager.get_room, room_id)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(fn, *args, **kwargs))
 
 def get_db() -> Generator[Session, None, None]:
     """Get database session"""
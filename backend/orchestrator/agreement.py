@@ -0,0 +1,102 @@
+"""Agreement Scorer - Cheap local check of whether AI answers converge
+
+Drafts generated concurrently for the same question are compared with
+local embeddings (hashed words / bigrams / character trigrams, see
+providers/embeddings.py) in one NumPy matrix product. When they already
+say the same thing, review and discussion calls are skipped; escalation
+is kept for real divergence.
+
+Hashed n-grams can't see what changed between two texts: "is correct" vs
+"is not correct" scores ~0.95, "the capital is Sydney" vs "the capital is
+Canberra" ~0.9. So answers only count as agreeing (answers_agree) when
+they are similar AND use the same negations AND name the same numbers /
+names. The quorum uses the same check to decide which answers are
+equivalent (LLMRouter.quorum_chat, "quorum" strategy).
+"""
+import re
+from collections import Counter
+from typing import List, Set
+
+import numpy as np
+
+from providers.embeddings import STOP_WORDS, embed_texts, normalize_text, tokenize
+
+# Wider than the retrieval index: only a handful of texts are compared,
+# and fewer hash collisions give a cleaner similarity signal
+AGREEMENT_DIM = 1024
+
+# Words that flip a statement (English + French)
+NEGATION_RE = re.compile(
+    r"\b(?:not|no|never|none|nothing|neither|nor|cannot|without|avoid|"
+    r"incorrect|wrong|false|ne|pas|jamais|aucun|aucune|rien|sans|éviter)\b|n't\b",
+    re.IGNORECASE
+)
+
+# Tokens as written (case kept): numbers and capitalized words are the
+# facts of an answer (Sydney / Canberra, PostgreSQL / MongoDB, 3 / 4)
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def similarity_matrix(texts: List[str]) -> np.ndarray:
+    """Pairwise cosine similarity of texts (shape (n, n))"""
+    vectors = embed_texts(texts, AGREEMENT_DIM)
+    return vectors @ vectors.T
+
+
+def agreement_score(texts: List[str]) -> float:
+    """Lowest pairwise similarity (1.0 = identical, ~0.1 = unrelated)
+
+    The minimum is used so one outlier draft is enough to escalate.
+    """
+    if len(texts) < 2:
+        return 1.0
+    matrix = similarity_matrix(texts)
+    off_diagonal = matrix[~np.eye(len(texts), dtype=bool)]
+    return float(off_diagonal.min())
+
+
+def text_similarity(a: str, b: str) -> float:
+    """Cosine similarity of two texts"""
+    return float(similarity_matrix([a, b])[0, 1])
+
+
+def polarity_conflict(texts: List[str]) -> bool:
+    """Texts use different negations (one may contradict another)"""
+    negations = [Counter(m.lower() for m in NEGATION_RE.findall(text)) for text in texts]
+    return any(n != negations[0] for n in negations[1:])
+
+
+def key_terms(text: str) -> Set[str]:
+    """Numbers and capitalized words of a text (normalized, stop words left out)"""
+    terms = set()
+    for token in _WORD_RE.findall(text):
+        if token[0].isdigit() or token[0].isupper():
+            term = normalize_text(token)
+            if term not in STOP_WORDS:
+                terms.add(term)
+    return terms
+
+
+def fact_conflict(texts: List[str]) -> bool:
+    """A number or name appears in some texts but not in others"""
+    words = [set(tokenize(text)) for text in texts]
+    terms: Set[str] = set().union(*(key_terms(text) for text in texts))
+    return any(
+        any(term in w for w in words) and not all(term in w for w in words)
+        for term in terms
+    )
+
+
+def answers_agree(texts: List[str], threshold: float) -> bool:
+    """Texts give the same answer
+
+    Similar wording (lowest pairwise similarity >= threshold), same
+    negations and same numbers / names.
+    """
+    if len(texts) < 2:
+        return True
+    return (
+        agreement_score(texts) >= threshold
+        and not polarity_conflict(texts)
+        and not fact_conflict(texts)
+    )
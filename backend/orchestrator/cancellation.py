@@ -0,0 +1,55 @@
+"""Cancellation - Stop orchestration when the client goes away
+
+Provider calls keep running (and billing) after the HTTP caller has
+disconnected. cancel_on_disconnect runs the orchestration as a child task
+and polls the client; on disconnect the task is cancelled, which aborts
+in-flight provider calls (bulkhead slots and breaker probes are released
+by the router) and skips further rounds. Orchestration code records its
+partial result in its CancelledError handler before re-raising.
+"""
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+from config import settings
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """The client left before the orchestration finished"""
+
+
+async def cancel_on_disconnect(
+    is_disconnected: Callable[[], Awaitable[bool]],
+    work: Awaitable[T],
+    poll_interval: float = settings.disconnect_poll_seconds
+) -> T:
+    """Run work, cancelling it as soon as the client disconnects
+
+    Args:
+        is_disconnected: Async check, e.g. FastAPI's request.is_disconnected
+        work: Orchestration coroutine
+        poll_interval: Seconds between disconnect checks
+
+    Returns:
+        Result of work
+
+    Raises:
+        ClientDisconnected: If the client left (work was cancelled)
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                task.cancel()
+                # Let the task finish its cleanup (partial result, DB commit)
+                await asyncio.gather(task, return_exceptions=True)
+                print("🔌 Client disconnected - orchestration cancelled")
+                raise ClientDisconnected()
+    except asyncio.CancelledError:
+        task.cancel()  # Server shutting the request down - same cleanup
+        raise
+
@@ -2,11 +2,21 @@
 
 This is the CORE of Chika - makes AIs act like team members.
 """
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Callable, Awaitable
+import asyncio
 import re
 from datetime import datetime
 from .smart_router import SmartRouter
+from config import settings
 from providers.ai_personas import AIPersonas
+from providers.llm_router import DEFAULT_MAX_TOKENS
+from providers.deadline import DeadlineExceeded, current_deadline, near_deadline
+from providers.mock_llm import is_unavailable_response
+from models.room import run_db
+from room.context_builder import fit_to_budget
+from .consensus import StreamingConsensus
+from .agreement import text_similarity
+from .strategies import DEFAULT_STRATEGY, StrategyContext, run_strategy
 
 
 class AICollaborator:
@@ -19,16 +29,45 @@ class AICollaborator:
     4. Ask second AI if they agree
     5. If disagreement → private discussion
     6. Return consensus to user
+    
+    Modes (the "consensus" strategy DAG, orchestrator/strategies.py):
+    - "concurrent" (default): all selected AIs draft at the same time,
+      then every draft is reviewed in parallel (one provider call per phase)
+    - "sequential": primary drafts, then the other AIs review it in turn
     """
     
-    def __init__(self, llm_router, db_session):
+    MODES = ('concurrent', 'sequential')
+    
+    def __init__(
+        self,
+        llm_router,
+        db_session,
+        mode: str = 'concurrent',
+        on_token: Optional[Callable[[str, str, str], Awaitable[None]]] = None,
+        semantic_cache=None,
+        unit_of_work: bool = False
+    ):
         """
         Args:
             llm_router: LLM router instance (from providers/llm_router.py)
             db_session: Database session for storing discussions
+            mode: Orchestration mode ('concurrent' or 'sequential')
+            on_token: Optional async callback(author, phase, delta) - when set,
+                responses are streamed and every delta is forwarded
+                (phase: draft/review/discussion/consensus)
+            semantic_cache: Optional SemanticCache - answers to repeated
+                questions are reused (every strategy)
+            unit_of_work: Discussions are only staged in the session (no
+                commit) - the caller commits them with the AI message
         """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown orchestration mode: {mode}. Allowed: {self.MODES}")
         self.router = llm_router
         self.db = db_session
+        self.mode = mode
+        self.on_token = on_token
+        self.semantic_cache = semantic_cache
+        self.unit_of_work = unit_of_work
     
     async def process_user_message(
         self,
@@ -48,14 +87,75 @@ class AICollaborator:
                 'response': str,  # Final response to user
                 'author': str,  # Which AI responded
                 'discussion_id': int | None,  # If there was a private discussion
+                'discussion': AIDiscussion,  # Present when there was one
                 'mentions': List[str]  # Who was mentioned
             }
         """
         
-        # 1. Detect @mentions in user message
+        # 1-2. Detect @mentions and decide which AIs to involve
+        target_ais = self.select_target_ais(room, user_message)
+        
+        # 3. Run the room's orchestration strategy (see orchestrator/strategies.py)
+        return await self._answer(
+            room=room,
+            strategy=getattr(room, 'strategy', None) or DEFAULT_STRATEGY,
+            target_ais=target_ais,
+            user_message=user_message,
+            context=context
+        )
+    
+    async def _answer(
+        self,
+        room,
+        strategy: str,
+        target_ais: List[str],
+        user_message: str,
+        context: List[Dict]
+    ) -> Dict:
+        """Run a strategy - a repeated question gets the cached answer
+        
+        The semantic cache is keyed on the question + AIs + strategy (never
+        on the history, which changes after every answer), so the same
+        question asked again in the room costs no provider call.
+        """
+        cache_scope = self._semantic_cache_scope(room)
+        cache_persona = "+".join(sorted(target_ais))
+        if cache_scope:
+            cached = await self.semantic_cache.alookup(cache_scope, cache_persona, user_message, strategy)
+            if cached is not None:
+                if self.on_token:
+                    phase = 'draft' if cached['author'] in target_ais else 'consensus'
+                    await self.on_token(cached['author'], phase, cached['response'])
+                return {
+                    'response': cached['response'],
+                    'author': cached['author'],
+                    'discussion_id': None,
+                    'mentions': ['@user']
+                }
+        
+        result = await run_strategy(
+            strategy,
+            StrategyContext(
+                collaborator=self,
+                room=room,
+                target_ais=target_ais,
+                user_message=user_message,
+                context=context
+            )
+        )
+        
+        if cache_scope and self._cacheable(result['response']):
+            await self.semantic_cache.astore(
+                cache_scope, cache_persona, user_message, result['response'], result['author'], strategy
+            )
+        return result
+    
+    def select_target_ais(self, room, user_message: str) -> List[str]:
+        """Which AIs answer: @mentioned ones, else auto-selected (never empty)"""
+        # Detect @mentions in user message
         mentions = self._extract_mentions(user_message)
         
-        # 2. Decide which AIs to involve
+        # Decide which AIs to involve
         active_ais = room.ai_list
         if mentions:
             # User explicitly mentioned AIs
@@ -66,100 +166,60 @@ class AICollaborator:
         
         if not target_ais:
             target_ais = [active_ais[0]] if active_ais else ['claude']
-        
-        # 3. Get first AI's response
-        primary_ai = target_ais[0]
-        primary_response = await self._get_ai_response(
-            ai_name=primary_ai,
-            user_message=user_message,
-            context=context
-        )
-        
-        # 4. If multiple AIs involved, check for consensus
-        if len(target_ais) > 1:
-            return await self._multi_ai_consensus(
-                room=room,
-                primary_ai=primary_ai,
-                primary_response=primary_response,
-                other_ais=target_ais[1:],
-                user_message=user_message,
-                context=context
-            )
-        
-        # Single AI response
-        return {
-            'response': primary_response,
-            'author': primary_ai,
-            'discussion_id': None,
-            'mentions': ['@user']
-        }
+        return target_ais
     
-    async def _multi_ai_consensus(
+    async def primary_answer(
         self,
         room,
-        primary_ai: str,
-        primary_response: str,
-        other_ais: List[str],
+        target_ais: List[str],
         user_message: str,
         context: List[Dict]
     ) -> Dict:
-        """Get consensus from multiple AIs
+        """Answer with the primary AI only ("single" strategy)
         
-        Process:
-        1. Show primary AI's response to other AIs
-        2. Ask if they agree
-        3. If disagreement → private discussion
-        4. Return consensus
-        """
+        First half of background refinement: goes through the strategy
+        engine and the semantic cache like any other answer; refine()
+        then has the other AIs review it.
         
-        # Ask second AI what they think
-        secondary_ai = other_ais[0]
-        review_prompt = f"""
-@{primary_ai} proposed this response to the user:
-
-"{primary_response}"
-
-Do you agree with this approach? If not, what would you suggest instead?
-Be constructive and specific.
-"""
-        
-        secondary_response = await self._get_ai_response(
-            ai_name=secondary_ai,
-            user_message=review_prompt,
+        Returns:
+            Same dict as process_user_message
+        """
+        return await self._answer(
+            room=room,
+            strategy="single",
+            target_ais=target_ais[:1],
+            user_message=user_message,
             context=context
         )
+    
+    async def refine(
+        self,
+        room,
+        target_ais: List[str],
+        user_message: str,
+        context: List[Dict],
+        primary_response: str
+    ) -> Dict:
+        """Review (and discuss if needed) an answer already sent to the user
         
-        # Detect if there's disagreement
-        has_disagreement = self._detect_disagreement(secondary_response)
+        Used for background refinement: the primary AI's answer is returned
+        immediately, every other AI in target_ais checks it afterwards.
         
-        if has_disagreement:
-            # Start private discussion
-            discussion = await self._private_discussion(
+        Returns:
+            Same dict as process_user_message (discussion_id None = the
+            reviewers agreed with the primary answer)
+        """
+        return await run_strategy(
+            DEFAULT_STRATEGY,
+            StrategyContext(
+                collaborator=self,
                 room=room,
-                participants=[primary_ai, secondary_ai],
-                topic=f"How to respond to: {user_message[:100]}",
-                initial_messages=[
-                    {'ai': primary_ai, 'content': primary_response},
-                    {'ai': secondary_ai, 'content': secondary_response}
-                ],
-                context=context
+                target_ais=target_ais,
+                user_message=user_message,
+                context=context,
+                options={'primary_response': primary_response}
             )
-            
-            # Return consensus from discussion
-            return {
-                'response': discussion['consensus'],
-                'author': f"{primary_ai} & {secondary_ai}",
-                'discussion_id': discussion['id'],
-                'mentions': ['@user']
-            }
-        
-        # Agreement - return primary response
-        return {
-            'response': primary_response,
-            'author': primary_ai,
-            'discussion_id': None,
-            'mentions': ['@user']
-        }
+        )
     
     async def _private_discussion(
         self,
@@ -182,9 +242,10 @@ Be constructive and specific.
         
         Returns:
             {
-                'id': int,
+                'id': int | None,  # None until committed (unit-of-work mode)
                 'consensus': str,
-                'messages': List[Dict]
+                'messages': List[Dict],
+                'record': AIDiscussion
             }
         """
         from models.room import AIDiscussion
@@ -199,70 +260,197 @@ Be constructive and specific.
         discussion.message_list = initial_messages
         
         self.db.add(discussion)
-        self.db.commit()
+        await self._commit()
         
         # Run discussion rounds
         discussion_context = context.copy()
+        # Prompt history grows by one turn per round (never rebuilt)
+        discussion_history = "\n\n".join(
+            f"@{msg['ai']}: {msg['content']}" for msg in initial_messages
+        )
         
-        for round_num in range(max_rounds):
-            # Alternate between AIs
-            current_ai = participants[round_num % len(participants)]
-            other_ai = participants[(round_num + 1) % len(participants)]
-            
-            # Build discussion prompt
-            discussion_history = "\n\n".join([
-                f"@{msg['ai']}: {msg['content']}"
-                for msg in discussion.message_list
-            ])
-            
-            prompt = f"""
+        try:
+            for round_num in range(max_rounds):
+                # SAFEGUARD: no new round when the deadline is near (last
+                # message is used, as after max_rounds)
+                if self._out_of_time():
+                    print(f"⏱️ Deadline near - discussion stopped after {round_num} rounds")
+                    break
+                
+                # Alternate between AIs
+                current_ai = participants[round_num % len(participants)]
+                other_ai = participants[(round_num + 1) % len(participants)]
+                
+                # Build discussion prompt
+                prompt = f"""
 You are {current_ai}, discussing with @{other_ai} about: {topic}
 
 Previous discussion:
 {discussion_history}
 
 What's your response? Try to reach consensus or propose a compromise.
-If you agree with the other AI, say "I agree" and propose a final response to the user.
+If you agree with @{other_ai}'s proposal as it is, just say "I agree" - it becomes the final response.
+If you agree with changes, say "I agree", then "Final response:" followed by the answer to the user.
 """
-            
-            response = await self._get_ai_response(
-                ai_name=current_ai,
-                user_message=prompt,
-                context=discussion_context
-            )
-            
-            # Add to discussion
-            discussion.add_message(current_ai, response)
-            
-            # Check if consensus reached
-            if self._consensus_reached(response):
-                discussion.status = 'resolved'
-                discussion.consensus = self._extract_consensus(response)
-                discussion.resolved_at = datetime.utcnow()
-                self.db.commit()
-                break
+                
+                # Agreement is detected while streaming: once the agreeing
+                # sentence is done, the rest of the turn is cut off
+                detector = StreamingConsensus()
+                try:
+                    response = await self._get_ai_response(
+                        ai_name=current_ai,
+                        user_message=prompt,
+                        context=discussion_context,
+                        phase='discussion',
+                        room_key=room.room_id,
+                        detector=detector
+                    )
+                except DeadlineExceeded:
+                    print(f"⏱️ Deadline reached during round {round_num + 1}")
+                    break
+                
+                # Add to discussion (one new turn row)
+                discussion.add_message(current_ai, response)
+                discussion_history += f"\n\n@{current_ai}: {response}"
+                
+                # Check if consensus reached (no further rounds)
+                if detector.agreed or self._consensus_reached(response):
+                    discussion.status = 'resolved'
+                    if detector.agreed and not detector.has_payload:
+                        # Plain "I agree" - the proposal agreed with is the answer
+                        discussion.consensus = self._latest_proposal(discussion.message_list, current_ai, response)
+                    else:
+                        discussion.consensus = self._extract_consensus(response)
+                    discussion.resolved_at = datetime.utcnow()
+                    await self._commit()
+                    break
+        except asyncio.CancelledError:
+            # Client left - keep what was said so far
+            discussion.status = 'cancelled'
+            discussion.consensus = discussion.turns[-1].content if discussion.turns else None
+            await self._commit()
+            raise
         
         # If no consensus after max_rounds, use last response
         if discussion.status != 'resolved':
             discussion.status = 'timeout'
-            discussion.consensus = discussion.message_list[-1]['content']
-            self.db.commit()
+            discussion.consensus = discussion.turns[-1].content
+            await self._commit()
+        
+        if self.on_token:
+            await self.on_token(" & ".join(participants), 'consensus', discussion.consensus)
         
         return {
             'id': discussion.id,
             'consensus': discussion.consensus,
-            'messages': discussion.message_list
+            'messages': discussion.message_list,
+            'record': discussion
         }
     
+    async def _commit(self) -> None:
+        """Commit discussion state (deferred to the caller in unit-of-work mode)"""
+        if not self.unit_of_work:
+            await run_db(self.db.commit)
+    
     async def _get_ai_response(
         self,
         ai_name: str,
         user_message: str,
-        context: List[Dict]
+        context: List[Dict],
+        phase: str = 'draft',
+        room_key: Optional[str] = None,
+        detector: Optional[StreamingConsensus] = None
     ) -> str:
         """Get response from specific AI with proper persona/identity
         
         IMPORTANT: Injecte system prompt pour que chaque IA sache qui elle est!
+        
+        When on_token is set, the response is streamed and each delta is
+        forwarded tagged with the AI name and orchestration phase.
+        
+        room_key identifies the room for fair provider queueing.
+        
+        With a detector, the response is always streamed and generation
+        is cut off as soon as the detector reports agreement.
+        
+        Under a request deadline, a streamed answer cut off by the deadline
+        is returned as is (best so far).
+        
+        Raises:
+            DeadlineExceeded: If the deadline passed before any text arrived
+        """
+        messages_with_persona = self._build_persona_messages(ai_name, user_message, context)
+        
+        if self.on_token or detector:
+            chunks = []
+            stream = self.router.stream_chat(
+                messages=messages_with_persona,
+                preferred_provider=ai_name,
+                room_id=room_key
+            )
+            try:
+                async for delta in stream:
+                    chunks.append(delta)
+                    if self.on_token:
+                        await self.on_token(ai_name, phase, delta)
+                    if detector and detector.feed(delta):
+                        break  # Agreement signalled - stop paying for tokens
+            except DeadlineExceeded:
+                if not chunks:
+                    raise
+                print(f"⏱️ Deadline reached - keeping {ai_name}'s partial answer")
+            finally:
+                # SAFEGUARD: closing the stream cancels the upstream call
+                await stream.aclose()
+            return detector.final_text if detector else "".join(chunks)
+        
+        response = await self.router.chat(
+            messages=messages_with_persona,
+            preferred_provider=ai_name,
+            stream=False,
+            room_id=room_key
+        )
+        
+        return response
+    
+    async def _get_quorum_response(
+        self,
+        ai_name: str,
+        user_message: str,
+        context: List[Dict],
+        room_key: Optional[str] = None,
+        n: Optional[int] = None,
+        k: Optional[int] = None
+    ) -> Dict:
+        """Ask several deployments ai_name's question, return once k answers agree
+        
+        The persona is left out: the deployments are different models, and
+        "you are Claude" must not be sent to Gemini or Llama.
+        
+        Returns:
+            LLMRouter.quorum_chat result (response, deployments, agreed)
+        """
+        result = await self.router.quorum_chat(
+            messages=self._build_persona_messages(ai_name, user_message, context, persona=False),
+            n=n,
+            k=k,
+            preferred_provider=ai_name,
+            room_id=room_key
+        )
+        if self.on_token:
+            await self.on_token(ai_name, 'draft', result['response'])
+        return result
+    
+    def _build_persona_messages(
+        self,
+        ai_name: str,
+        user_message: str,
+        context: List[Dict],
+        persona: bool = True
+    ) -> List[Dict]:
+        """Persona + context + question, trimmed to the AI's token budget
+        
+        persona=False leaves the system prompt out (model-neutral request)
         """
         # Build messages WITHOUT system prompt (context already has conversation)
         user_messages = context.copy()
@@ -270,6 +458,8 @@ If you agree with the other AI, say "I agree" and propose a final response to th
             'role': 'user',
             'content': user_message
         })
+        if not persona:
+            return fit_to_budget(user_messages, max_tokens=self._prompt_token_budget(ai_name))
         
         # Inject AI persona (system prompt) so it knows its identity
         messages_with_persona = AIPersonas.build_messages_with_persona(
@@ -277,13 +467,56 @@ If you agree with the other AI, say "I agree" and propose a final response to th
             user_messages=user_messages
         )
         
-        response = await self.router.chat(
-            messages=messages_with_persona,
-            preferred_provider=ai_name,
-            stream=False
+        # Token budget: newest turns that fit (persona + question pinned)
+        return fit_to_budget(
+            messages_with_persona,
+            max_tokens=self._prompt_token_budget(ai_name)
         )
+    
+    @staticmethod
+    def _out_of_time() -> bool:
+        """Request deadline too close to start an optional LLM step"""
+        return near_deadline(settings.deadline_step_reserve_seconds)
+    
+    @staticmethod
+    def _cacheable(response: str) -> bool:
+        """Complete answer from a real provider
         
-        return response
+        SAFEGUARD: never cache the "no AI available" fallback, nor an answer
+        cut short by the request deadline
+        """
+        if not response or is_unavailable_response(response):
+            return False
+        deadline = current_deadline()
+        return deadline is None or not deadline.expired
+    
+    def _semantic_cache_scope(self, room) -> Optional[str]:
+        """Privacy scope of cached answers (None = cache off)"""
+        if self.semantic_cache is None:
+            return None
+        if settings.semantic_cache_scope == 'user':
+            return f"user-{room.user_id}"
+        return f"room-{room.room_id}"
+    
+    def _prompt_token_budget(self, ai_name: str) -> int:
+        """Prompt token budget for a call (context window minus reply room)"""
+        budget = settings.context_max_prompt_tokens
+        get_window = getattr(self.router, 'get_context_window', None)
+        if get_window:
+            window = get_window(ai_name) - DEFAULT_MAX_TOKENS - settings.context_safety_margin_tokens
+            budget = min(budget, window)
+        return max(budget, 0)
+    
+    def _build_review_prompt(self, author_ai: str, draft: str) -> str:
+        """Build prompt asking an AI to review another AI's draft"""
+        return f"""
+@{author_ai} proposed this response to the user:
+
+"{draft}"
+
+Do you agree with this approach? If not, what would you suggest instead?
+Be constructive and specific.
+"""
     
     def _extract_mentions(self, text: str) -> List[str]:
         """Extract @mentions from text
@@ -313,7 +546,7 @@ If you agree with the other AI, say "I agree" and propose a final response to th
         
         return selected
     
-    def _detect_disagreement(self, response: str) -> bool:
+    def _detect_disagreement(self, response: str, reference: Optional[str] = None) -> bool:
         """Detect if AI disagrees with previous response
         
         Keywords indicating disagreement:
@@ -322,19 +555,31 @@ If you agree with the other AI, say "I agree" and propose a final response to th
         - "However"
         - "I would suggest instead"
         - "Not sure about that"
+        
+        "Actually" / "however" / "instead" appear in most polite replies,
+        so with a reference (the reviewed draft) they only count when the
+        reply really diverges from it (local similarity check).
         """
         disagreement_patterns = [
             r'\bi disagree\b',
-            r'\bactually\b',
-            r'\bhowever\b',
-            r'\binstead\b',
             r'\bnot sure\b',
             r'\bI would.*differently\b',
             r'\bbetter approach\b'
         ]
+        weak_patterns = [
+            r'\bactually\b',
+            r'\bhowever\b',
+            r'\binstead\b'
+        ]
         
         response_lower = response.lower()
-        return any(re.search(pattern, response_lower) for pattern in disagreement_patterns)
+        if any(re.search(pattern, response_lower) for pattern in disagreement_patterns):
+            return True
+        if not any(re.search(pattern, response_lower) for pattern in weak_patterns):
+            return False
+        if reference is None:
+            return True
+        return text_similarity(response, reference) < settings.agreement_divergence_threshold
     
     def _consensus_reached(self, response: str) -> bool:
         """Check if AI indicates consensus reached"""
@@ -349,6 +594,13 @@ If you agree with the other AI, say "I agree" and propose a final response to th
         response_lower = response.lower()
         return any(re.search(pattern, response_lower) for pattern in consensus_patterns)
     
+    def _latest_proposal(self, messages: List[Dict], agreeing_ai: str, fallback: str) -> str:
+        """Latest message of another participant (the proposal agreed with)"""
+        for msg in reversed(messages):
+            if msg['ai'] != agreeing_ai:
+                return self._extract_consensus(msg['content'])
+        return fallback
+    
     def _extract_consensus(self, response: str) -> str:
         """Extract the consensus/final response from AI message
         
@@ -0,0 +1,109 @@
+"""Streaming Consensus - Detect agreement while a turn is being generated
+
+Discussion loops used to wait for each full completion before checking
+for agreement. StreamingConsensus is fed every delta instead: once a
+participant clearly agrees and finishes that sentence, the rest of the
+turn can be cut off (no more tokens paid for) and no further rounds are
+scheduled.
+
+If the participant starts writing an explicit final answer
+("Final response: ...", "Consensus: ...") the turn runs to the end,
+since that text is the payload.
+"""
+import re
+from typing import List, Optional, Pattern
+
+# Same signals AICollaborator._consensus_reached looks for
+AGREEMENT_PATTERNS = [
+    r"\bi agree\b",
+    r"\bsounds good\b",
+    r"\bthat works\b",
+    r"\blet's go with\b",
+    r"\bconsensus\b"
+]
+
+PAYLOAD_RE = re.compile(
+    r"(?:consensus|final response|final answer|here's what we should say)\s*:",
+    re.IGNORECASE
+)
+
+_SENTENCE_END_RE = re.compile(r"[.!?\n]")
+
+# Characters re-scanned before each new delta (a signal can span deltas)
+_LOOKBEHIND_CHARS = 32
+
+
+class StreamingConsensus:
+    """Incremental agreement detector for one streamed turn"""
+
+    def __init__(
+        self,
+        patterns: Optional[List[str]] = None,
+        grace_chars: int = 32,
+        payload_re: Optional[Pattern] = PAYLOAD_RE,
+        case_sensitive: bool = False
+    ):
+        """
+        Args:
+            patterns: Agreement regexes (default: AGREEMENT_PATTERNS)
+            grace_chars: Text read past the agreeing sentence before cutting
+                off (room to spot a "Final response:" payload)
+            payload_re: Marker of an explicit final answer (never cut off)
+            case_sensitive: Match patterns as written (e.g. "CONSENSUS" keywords)
+        """
+        flags = 0 if case_sensitive else re.IGNORECASE
+        self._patterns = [re.compile(p, flags) for p in (patterns or AGREEMENT_PATTERNS)]
+        self._payload_re = payload_re
+        self.grace_chars = grace_chars
+
+        self.text = ""
+        self.agreed_at: Optional[int] = None  # End offset of the agreement signal
+        self.stopped = False
+        self._sentence_end: Optional[int] = None
+
+    @property
+    def agreed(self) -> bool:
+        return self.agreed_at is not None
+
+    @property
+    def has_payload(self) -> bool:
+        """Participant wrote an explicit final answer"""
+        return bool(self._payload_re and self._payload_re.search(self.text))
+
+    @property
+    def final_text(self) -> str:
+        """Turn output (trimmed to the agreeing sentence when cut off)"""
+        if self.stopped and self._sentence_end is not None:
+            return self.text[:self._sentence_end].strip()
+        return self.text
+
+    def feed(self, delta: str) -> bool:
+        """Add a streamed delta
+
+        Returns:
+            True once the remaining generation can be cut off
+        """
+        scan_from = max(0, len(self.text) - _LOOKBEHIND_CHARS)
+        self.text += delta
+
+        if self.agreed_at is None:
+            for pattern in self._patterns:
+                match = pattern.search(self.text, scan_from)
+                if match:
+                    self.agreed_at = match.end()
+                    break
+            else:
+                return False
+
+        if self.has_payload:
+            return False  # Final answer being written - let it finish
+
+        if self._sentence_end is None:
+            end = _SENTENCE_END_RE.search(self.text, self.agreed_at)
+            if end is None:
+                return False
+            self._sentence_end = end.end()
+
+        if len(self.text) - self._sentence_end >= self.grace_chars:
+            self.stopped = True
+        return self.stopped
@@ -0,0 +1,385 @@
+"""Orchestration Strategies - Multi-AI workflows as small DAGs of LLM steps
+
+Each strategy builds a list of Steps; a Step runs once all the steps it
+depends on are done, and independent steps run concurrently. The final
+step is always named "result" and returns the usual collaborator dict:
+
+    {'response': str, 'author': str, 'discussion_id': int | None, 'mentions': [...]}
+
+Built-ins (selectable per room via Room.strategy):
+- consensus:  drafts → reviews → private discussion on disagreement
+              (concurrent mode: every AI drafts, AI i+1 reviews AI i;
+              sequential mode: primary drafts, the others review in turn)
+- single:     primary AI answers alone (cheapest)
+- vote:       all AIs draft in parallel, the most central draft wins
+              (local similarity, no extra call)
+- quorum:     all AIs draft in parallel, return as soon as k drafts agree
+              and cancel the rest (latency of the k-th fastest)
+- provider_quorum: the question goes to N deployments at once
+              (LLMRouter.quorum_chat) WITHOUT the primary AI's persona
+              (Gemini isn't told it is Claude); first k equivalent answers
+              win and are credited to the deployments that agreed
+- debate:     drafts → every AI revises after reading the others → primary
+              writes the final answer
+- map_reduce: drafts → primary synthesizes one answer
+
+New strategies: decorate a builder with @register_strategy("name").
+Internal workflows (e.g. the demo discussion, routes/demo.py) register
+with selectable=False: run_strategy finds them, rooms can't pick them.
+
+Under a request deadline (providers/deadline.py) optional steps (debate
+revisions, synthesis) fall back to the drafts they already have.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+from providers.deadline import DeadlineExceeded, near_deadline
+from providers.quorum import race_to_quorum
+from .agreement import answers_agree, similarity_matrix
+
+
+@dataclass
+class Step:
+    """One node of a strategy DAG"""
+    name: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]  # Receives {dep_name: result}
+    deps: Tuple[str, ...] = ()
+
+
+@dataclass
+class StrategyContext:
+    """Everything a strategy needs to answer one user message"""
+    collaborator: Any  # AICollaborator
+    room: Any
+    target_ais: List[str]
+    user_message: str
+    context: List[Dict]
+    options: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def primary_ai(self) -> str:
+        return self.target_ais[0]
+
+    async def ask(self, ai_name: str, prompt: Optional[str] = None, phase: str = 'draft') -> str:
+        """One LLM call as ai_name (persona, token budget, streaming handled)"""
+        return await self.collaborator._get_ai_response(
+            ai_name=ai_name,
+            user_message=prompt if prompt is not None else self.user_message,
+            context=self.context,
+            phase=phase,
+            room_key=self.room.room_id
+        )
+
+    async def ask_or(self, fallback: str, ai_name: str, prompt: str, phase: str) -> str:
+        """Optional LLM step: fallback when the request deadline is (nearly) up"""
+        if near_deadline(settings.deadline_step_reserve_seconds):
+            print(f"⏱️ Deadline near - skipping {phase} step of {ai_name}")
+            return fallback
+        try:
+            return await self.ask(ai_name, prompt, phase)
+        except DeadlineExceeded:
+            print(f"⏱️ Deadline reached during {phase} step of {ai_name}")
+            return fallback
+
+
+StrategyBuilder = Callable[[StrategyContext], List[Step]]
+
+STRATEGIES: Dict[str, StrategyBuilder] = {}  # Selectable per room
+_INTERNAL_STRATEGIES: Dict[str, StrategyBuilder] = {}
+
+DEFAULT_STRATEGY = "consensus"
+
+
+def register_strategy(name: str, selectable: bool = True) -> Callable[[StrategyBuilder], StrategyBuilder]:
+    """Register a strategy builder under a name
+
+    Args:
+        name: Strategy name (Room.strategy / run_strategy)
+        selectable: False = internal workflow, not offered to rooms
+    """
+    def decorator(builder: StrategyBuilder) -> StrategyBuilder:
+        (STRATEGIES if selectable else _INTERNAL_STRATEGIES)[name] = builder
+        return builder
+    return decorator
+
+
+async def run_dag(steps: List[Step]) -> Dict[str, Any]:
+    """Run steps as soon as their dependencies are done
+
+    Returns:
+        {step_name: result}
+
+    Raises:
+        ValueError: On unknown dependencies or cycles
+        Exception: First step failure (other running steps are cancelled)
+    """
+    names = {step.name for step in steps}
+    for step in steps:
+        missing = [d for d in step.deps if d not in names]
+        if missing:
+            raise ValueError(f"Step '{step.name}' depends on unknown steps: {missing}")
+
+    results: Dict[str, Any] = {}
+    pending = {step.name: step for step in steps}
+    running: Dict[asyncio.Task, str] = {}
+    try:
+        while pending or running:
+            for name, step in list(pending.items()):
+                if all(d in results for d in step.deps):
+                    del pending[name]
+                    task = asyncio.create_task(step.run({d: results[d] for d in step.deps}))
+                    running[task] = name
+
+            if not running:
+                raise ValueError(f"Strategy has a dependency cycle: {sorted(pending)}")
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                results[running.pop(task)] = task.result()
+    finally:
+        # SAFEGUARD: never leave provider calls running after a failure -
+        # and wait until they have released their slots / connections
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+    return results
+
+
+async def run_strategy(name: str, ctx: StrategyContext) -> Dict:
+    """Build and run a strategy, returning its "result" step"""
+    builder = STRATEGIES.get(name) or _INTERNAL_STRATEGIES.get(name)
+    if builder is None:
+        print(f"⚠️ Unknown strategy '{name}' - using {DEFAULT_STRATEGY}")
+        builder = STRATEGIES[DEFAULT_STRATEGY]
+    results = await run_dag(builder(ctx))
+    return results["result"]
+
+
+def _answer(response: str, author: str, discussion_id: Optional[int] = None) -> Dict:
+    return {
+        'response': response,
+        'author': author,
+        'discussion_id': discussion_id,
+        'mentions': ['@user']
+    }
+
+
+def _draft_steps(ctx: StrategyContext) -> List[Step]:
+    """One independent draft step per AI ("draft:<ai>")"""
+    def make(ai: str) -> Step:
+        async def run(_: Dict) -> str:
+            return await ctx.ask(ai)
+        return Step(f"draft:{ai}", run)
+    return [make(ai) for ai in ctx.target_ais]
+
+
+def _draft_names(ctx: StrategyContext) -> Tuple[str, ...]:
+    return tuple(f"draft:{ai}" for ai in ctx.target_ais)
+
+
+@register_strategy("consensus")
+def consensus_strategy(ctx: StrategyContext) -> List[Step]:
+    """drafts → (converge) → reviews → result (discussion on disagreement)
+
+    ctx.options['primary_response']: primary answer already sent
+    (background refinement) - no draft call, the others review it.
+    """
+    collaborator = ctx.collaborator
+    primary = ctx.primary_ai
+    parallel = collaborator.mode == 'concurrent'
+    given = ctx.options.get('primary_response')
+    all_draft = parallel and len(ctx.target_ais) > 1 and given is None
+
+    if all_draft:
+        # Every AI drafts; AI i+1 reviews AI i's draft
+        drafts = _draft_steps(ctx)
+        ais = list(ctx.target_ais)
+        pairs = [(ai, ais[(i + 1) % len(ais)]) for i, ai in enumerate(ais)]
+    else:
+        async def primary_draft(_: Dict) -> str:
+            return given if given is not None else await ctx.ask(primary)
+        drafts = [Step(f"draft:{primary}", primary_draft)]
+        pairs = [(primary, reviewer) for reviewer in ctx.target_ais[1:]]
+    draft_names = tuple(step.name for step in drafts)
+
+    steps = list(drafts)
+    if all_draft:
+        async def converge(results: Dict[str, str]) -> bool:
+            # SAFEGUARD: a negation flip ("is not correct") or another name /
+            # number ("Sydney" vs "Canberra") is a real divergence
+            if answers_agree([results[name] for name in draft_names], settings.agreement_skip_threshold):
+                print("🤝 Drafts converge - skipping review")
+                return True
+            return False
+        steps.append(Step("converge", converge, draft_names))
+
+    def make_review(author: str, reviewer: str, previous: Optional[str]) -> Step:
+        async def run(results: Dict[str, Any]) -> Optional[str]:
+            # None = review skipped (drafts converge, deadline near)
+            if results.get("converge") or (previous and results[previous] is None):
+                return None
+            if collaborator._out_of_time():
+                return None
+            try:
+                prompt = collaborator._build_review_prompt(author, results[f"draft:{author}"])
+                return await ctx.ask(reviewer, prompt, phase='review')
+            except DeadlineExceeded:
+                return None
+        deps = (f"draft:{author}",) + (("converge",) if all_draft else ()) + ((previous,) if previous else ())
+        return Step(f"review:{reviewer}", run, deps)
+
+    reviews = []
+    for author, reviewer in pairs:
+        # Sequential mode: one reviewer after the other
+        previous = reviews[-1].name if reviews and not parallel else None
+        reviews.append(make_review(author, reviewer, previous))
+    steps += reviews
+
+    async def settle(results: Dict[str, Any]) -> Dict:
+        primary_response = results[f"draft:{primary}"]
+        if not pairs or results.get("converge"):
+            return _answer(primary_response, primary)
+        texts = [results[f"review:{reviewer}"] for _, reviewer in pairs]
+        if any(text is None for text in texts):
+            # SAFEGUARD: deadline near - the primary draft is the best answer so far
+            print(f"⏱️ Deadline near - answering with {primary}'s draft, reviews skipped")
+            return _answer(primary_response, primary)
+
+        dissent = [
+            (reviewer, text)
+            for (author, reviewer), text in zip(pairs, texts)
+            if collaborator._detect_disagreement(text, reference=results[f"draft:{author}"])
+        ]
+        if not dissent:
+            return _answer(primary_response, primary)
+
+        authors = [name.split(":", 1)[1] for name in draft_names]
+        participants = authors + [reviewer for reviewer, _ in dissent if reviewer not in authors]
+        discussion = await collaborator._private_discussion(
+            room=ctx.room,
+            participants=participants,
+            topic=f"How to respond to: {ctx.user_message[:100]}",
+            initial_messages=[
+                {'ai': ai, 'content': results[f"draft:{ai}"]} for ai in authors
+            ] + [
+                {'ai': reviewer, 'content': text} for reviewer, text in dissent
+            ],
+            context=ctx.context
+        )
+        result = _answer(discussion['consensus'], " & ".join(participants), discussion['id'])
+        result['discussion'] = discussion['record']
+        return result
+
+    settle_deps = draft_names + tuple(step.name for step in reviews) + (("converge",) if all_draft else ())
+    return steps + [Step("result", settle, settle_deps)]
+
+
+@register_strategy("single")
+def single_strategy(ctx: StrategyContext) -> List[Step]:
+    async def run(_: Dict) -> Dict:
+        return _answer(await ctx.ask(ctx.primary_ai), ctx.primary_ai)
+    return [Step("result", run)]
+
+
+@register_strategy("vote")
+def vote_strategy(ctx: StrategyContext) -> List[Step]:
+    async def run(drafts: Dict[str, str]) -> Dict:
+        ais = list(ctx.target_ais)
+        texts = [drafts[f"draft:{ai}"] for ai in ais]
+        # Most central draft = highest total similarity to the others
+        winner = int(similarity_matrix(texts).sum(axis=1).argmax()) if len(texts) > 1 else 0
+        return _answer(texts[winner], ais[winner])
+    return _draft_steps(ctx) + [Step("result", run, _draft_names(ctx))]
+
+
+@register_strategy("quorum")
+def quorum_strategy(ctx: StrategyContext) -> List[Step]:
+    k = min(ctx.options.get('k', settings.quorum_k), len(ctx.target_ais))
+    threshold = ctx.options.get('threshold', settings.quorum_similarity_threshold)
+
+    async def run(_: Dict) -> Dict:
+        group, answers = await race_to_quorum(
+            [(ai, ctx.ask(ai)) for ai in ctx.target_ais],
+            k,
+            lambda a, b: answers_agree([a, b], threshold)
+        )
+        if group:
+            return _answer(group[0][1], " & ".join(ai for ai, _ in group))
+        # No quorum: first answer that arrived
+        if answers:
+            return _answer(answers[0][1], answers[0][0])
+        raise RuntimeError("Quorum: every draft failed")
+    return [Step("result", run)]
+
+
+@register_strategy("provider_quorum")
+def provider_quorum_strategy(ctx: StrategyContext) -> List[Step]:
+    async def run(_: Dict) -> Dict:
+        result = await ctx.collaborator._get_quorum_response(
+            ai_name=ctx.primary_ai,
+            user_message=ctx.user_message,
+            context=ctx.context,
+            room_key=ctx.room.room_id,
+            n=ctx.options.get('n'),
+            k=ctx.options.get('k')
+        )
+        return _answer(result['response'], " & ".join(result['deployments']) or ctx.primary_ai)
+    return [Step("result", run)]
+
+
+@register_strategy("debate")
+def debate_strategy(ctx: StrategyContext) -> List[Step]:
+    def make_revision(ai: str) -> Step:
+        async def run(drafts: Dict[str, str]) -> str:
+            others = "\n\n".join(
+                f"@{other}: {drafts[f'draft:{other}']}"
+                for other in ctx.target_ais if other != ai
+            )
+            prompt = f"""Question: {ctx.user_message}
+
+Your draft:
+{drafts[f'draft:{ai}']}
+
+Other answers:
+{others}
+
+Point out any mistakes, then give your improved answer."""
+            return await ctx.ask_or(drafts[f'draft:{ai}'], ai, prompt, phase='discussion')
+        return Step(f"revise:{ai}", run, _draft_names(ctx))
+
+    async def judge(revisions: Dict[str, str]) -> Dict:
+        answers = "\n\n".join(f"@{ai}: {revisions[f'revise:{ai}']}" for ai in ctx.target_ais)
+        prompt = f"""Question: {ctx.user_message}
+
+Revised answers after debate:
+{answers}
+
+Write the final answer for the user, keeping what the answers agree on."""
+        best = revisions[f'revise:{ctx.primary_ai}']
+        return _answer(await ctx.ask_or(best, ctx.primary_ai, prompt, phase='consensus'), " & ".join(ctx.target_ais))
+
+    revisions = [make_revision(ai) for ai in ctx.target_ais]
+    return _draft_steps(ctx) + revisions + [
+        Step("result", judge, tuple(step.name for step in revisions))
+    ]
+
+
+@register_strategy("map_reduce")
+def map_reduce_strategy(ctx: StrategyContext) -> List[Step]:
+    async def reduce(drafts: Dict[str, str]) -> Dict:
+        if len(drafts) == 1:
+            return _answer(next(iter(drafts.values())), ctx.primary_ai)
+        answers = "\n\n".join(f"@{ai}: {drafts[f'draft:{ai}']}" for ai in ctx.target_ais)
+        prompt = f"""Question: {ctx.user_message}
+
+Answers:
+{answers}
+
+Synthesize one final answer for the user."""
+        best = drafts[f'draft:{ctx.primary_ai}']
+        return _answer(await ctx.ask_or(best, ctx.primary_ai, prompt, phase='consensus'), " & ".join(ctx.target_ais))
+    return _draft_steps(ctx) + [Step("result", reduce, _draft_names(ctx))]
+
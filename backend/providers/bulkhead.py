@@ -0,0 +1,132 @@
+"""Bulkhead - Per-deployment concurrency limit with a fair wait queue
+
+A burst against one provider (Groq, a local Ollama GPU box) must not
+slow every request down together: only max_concurrent calls run at once,
+the rest wait in a bounded queue served round-robin across rooms, and
+when the queue is full the caller spills over to the next deployment.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict
+
+
+class BulkheadFullError(Exception):
+    """Deployment is at capacity and its wait queue is full"""
+
+
+class Bulkhead:
+    """Semaphore-style bulkhead with per-room fair scheduling
+
+    Waiting requests are grouped by room and rooms are served round-robin,
+    so one busy room can't starve the others.
+    """
+
+    def __init__(self, name: str, max_concurrent: int = 16, max_queue: int = 32):
+        """
+        Args:
+            name: Deployment name
+            max_concurrent: Max calls running at once
+            max_queue: Max calls waiting for a slot (beyond → BulkheadFullError)
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+
+        self.active = 0
+        self._queued = 0
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._turns: Deque[str] = deque()  # Round-robin order of waiting rooms
+
+        # Metrics
+        self.rejected = 0
+        self.admitted = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    @asynccontextmanager
+    async def slot(self, room_key: str = "global") -> AsyncIterator[None]:
+        """Hold one concurrency slot for the duration of a call
+
+        Raises:
+            BulkheadFullError: If no slot is free and the queue is full
+        """
+        await self.acquire(room_key)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, room_key: str = "global") -> None:
+        """Wait for a slot (fair across rooms)"""
+        if self.active < self.max_concurrent and self._queued == 0:
+            self.active += 1
+            self._record_wait(0.0)
+            return
+
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            raise BulkheadFullError(f"{self.name} at capacity ({self.active} running, {self._queued} queued)")
+
+        future = asyncio.get_running_loop().create_future()
+        if room_key not in self._waiters:
+            self._waiters[room_key] = deque()
+            self._turns.append(room_key)
+        self._waiters[room_key].append(future)
+        self._queued += 1
+
+        started_at = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # Slot granted just before cancellation - hand it on
+            else:
+                self._remove_waiter(room_key, future)
+            raise
+        self._record_wait(time.monotonic() - started_at)
+
+    def release(self) -> None:
+        """Free a slot and grant it to the next room in turn"""
+        self.active -= 1
+        while self.active < self.max_concurrent and self._turns:
+            room_key = self._turns.popleft()
+            waiters = self._waiters[room_key]
+            future = waiters.popleft()
+            self._queued -= 1
+            if waiters:
+                self._turns.append(room_key)  # Back of the line
+            else:
+                del self._waiters[room_key]
+            if future.done():
+                continue
+            self.active += 1
+            future.set_result(None)
+
+    def snapshot(self) -> Dict:
+        """Bulkhead metrics for /health"""
+        return {
+            "active": self.active,
+            "queued": self._queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "avg_queue_ms": round(self._total_wait / self.admitted * 1000) if self.admitted else 0,
+            "max_queue_ms": round(self._max_wait * 1000)
+        }
+
+    def _record_wait(self, seconds: float) -> None:
+        self.admitted += 1
+        self._total_wait += seconds
+        self._max_wait = max(self._max_wait, seconds)
+
+    def _remove_waiter(self, room_key: str, future: asyncio.Future) -> None:
+        waiters = self._waiters.get(room_key)
+        if waiters is None or future not in waiters:
+            return
+        waiters.remove(future)
+        self._queued -= 1
+        if not waiters:
+            del self._waiters[room_key]
+            self._turns.remove(room_key)
@@ -0,0 +1,141 @@
+"""Circuit Breaker - Skip failing LLM deployments instantly
+
+A provider that is down or hanging should cost milliseconds, not a full
+timeout, before fallback to the next deployment starts.
+"""
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class CircuitBreaker:
+    """Per-deployment circuit breaker
+
+    States:
+    - closed: requests flow, outcomes recorded in a rolling window
+    - open: requests skipped until cooldown elapsed
+    - half_open: one probe request allowed (success → closed, failure → open)
+
+    Trips when the recent error rate exceeds the threshold (once enough
+    calls are recorded) OR after consecutive timeouts (hanging provider).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = 20,
+        min_calls: int = 5,
+        error_threshold: float = 0.5,
+        cooldown_seconds: float = 30.0,
+        max_consecutive_timeouts: int = 2
+    ):
+        """
+        Args:
+            name: Deployment name
+            window_size: Number of recent outcomes kept for error rate
+            min_calls: Minimum outcomes before error rate can trip
+            error_threshold: Error rate (0-1) that opens the circuit
+            cooldown_seconds: Time spent open before a half-open probe
+            max_consecutive_timeouts: Timeouts in a row that open the circuit
+        """
+        self.name = name
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_consecutive_timeouts = max_consecutive_timeouts
+
+        self.state = self.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window_size)  # True = success
+        self._consecutive_timeouts = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Check if a request may be sent to this deployment"""
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.cooldown_seconds:
+                return False
+            # Cooldown elapsed - let one probe through
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+        # HALF_OPEN: only one probe at a time
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        """Record a successful call"""
+        self._outcomes.append(True)
+        self._consecutive_timeouts = 0
+        if self.state == self.HALF_OPEN:
+            self._close()
+
+    def record_failure(self, timeout: bool = False) -> None:
+        """Record a failed call (timeout=True for hanging provider)"""
+        self._outcomes.append(False)
+        self._consecutive_timeouts = self._consecutive_timeouts + 1 if timeout else 0
+
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+
+        if self._consecutive_timeouts >= self.max_consecutive_timeouts:
+            self._open()
+        elif len(self._outcomes) >= self.min_calls and self.error_rate >= self.error_threshold:
+            self._open()
+
+    def release(self) -> None:
+        """Release a half-open probe without outcome (e.g. caller cancelled)"""
+        self._probe_in_flight = False
+
+    @property
+    def error_rate(self) -> float:
+        """Error rate over the rolling window"""
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    @property
+    def health_score(self) -> float:
+        """Health score (0 = down, 1 = healthy)"""
+        if self.state == self.OPEN:
+            return 0.0
+        return round(1.0 - self.error_rate, 3)
+
+    def snapshot(self) -> Dict:
+        """Breaker state for /health"""
+        retry_in = None
+        if self.state == self.OPEN:
+            retry_in = max(0.0, self.cooldown_seconds - (time.monotonic() - self._opened_at))
+
+        return {
+            "state": self.state,
+            "health_score": self.health_score,
+            "error_rate": round(self.error_rate, 3),
+            "calls": len(self._outcomes),
+            "consecutive_timeouts": self._consecutive_timeouts,
+            "retry_in_seconds": round(retry_in, 1) if retry_in is not None else None
+        }
+
+    def _open(self) -> None:
+        if self.state != self.OPEN:
+            print(f"🔌 Circuit OPEN for {self.name} (error rate {self.error_rate:.0%})")
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def _close(self) -> None:
+        print(f"✅ Circuit CLOSED for {self.name}")
+        self.state = self.CLOSED
+        self._outcomes.clear()
+        self._consecutive_timeouts = 0
+        self._probe_in_flight = False
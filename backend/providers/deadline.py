@@ -0,0 +1,140 @@
+"""Deadline - One wall-clock budget per user message
+
+The route opens a deadline scope; every LLM call made inside it (by
+AICollaborator, strategies, the demo loop...) reads the current deadline
+and uses the remaining budget as its timeout instead of a fixed 120s.
+Orchestrators check `near()` before optional steps (review, another
+discussion round) and fall back to the best answer they already have.
+
+The deadline lives in a ContextVar, so tasks created inside the scope
+(fan-out drafts, hedged attempts) inherit it automatically.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    """The user message's time budget ran out"""
+
+
+class Deadline:
+    """Absolute point in time (monotonic clock) a request must finish by"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def near(self, reserve: float) -> bool:
+        """Less than reserve seconds left (don't start an optional step)"""
+        return self.remaining() < reserve
+
+    def timeout(self, default: float) -> float:
+        """Timeout for one step: default, capped by the remaining budget
+
+        Raises:
+            DeadlineExceeded: If no budget is left
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"deadline of {self.seconds:.0f}s exceeded")
+        return min(default, remaining)
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline of the request being processed (None = no limit)"""
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """Run the block under a deadline (None clears any inherited one)"""
+    deadline = Deadline(seconds) if seconds is not None else None
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def step_timeout(default: float) -> float:
+    """Timeout for one LLM call under the current deadline
+
+    Raises:
+        DeadlineExceeded: If the current deadline has passed
+    """
+    deadline = current_deadline()
+    return deadline.timeout(default) if deadline else default
+
+
+def near_deadline(reserve: float) -> bool:
+    """Current deadline has less than reserve seconds left"""
+    deadline = current_deadline()
+    return deadline is not None and deadline.near(reserve)
+
+
+async def await_until_deadline(awaitable: Awaitable[T]) -> T:
+    """Await under the current deadline, cancelling the work when it passes
+
+    Only the deadline's own cut-off becomes DeadlineExceeded: a timeout
+    raised by the work itself (provider timeout) propagates unchanged.
+
+    Raises:
+        DeadlineExceeded: If the deadline passed before the work finished
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return await awaitable
+    try:
+        timeout = deadline.timeout(float("inf"))
+    except DeadlineExceeded:
+        close = getattr(awaitable, "close", None)
+        if close:
+            close()  # Never started - no "coroutine was never awaited" warning
+        raise
+    task = asyncio.ensure_future(awaitable)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+    except BaseException:
+        task.cancel()
+        raise
+    if not done:
+        task.cancel()
+        # Let the call release its resources (bulkhead slot, connection)
+        await asyncio.gather(task, return_exceptions=True)
+        raise DeadlineExceeded(f"deadline of {deadline.seconds:.0f}s exceeded")
+    return task.result()
+
+
+async def iterate_until_deadline(stream: AsyncIterator[T]) -> AsyncGenerator[T, None]:
+    """Re-yield a stream, stopping it when the current deadline passes
+
+    Raises:
+        DeadlineExceeded: If the deadline passed before the stream ended
+    """
+    try:
+        while True:
+            try:
+                item = await await_until_deadline(stream.__anext__())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose:
+            await aclose()
@@ -0,0 +1,129 @@
+"""Deployment Stats - Live latency tracking per LLM deployment"""
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+
+class DeploymentStats:
+    """Live latency + error stats for one deployment
+
+    - Rolling time-to-first-token (TTFT) samples: drive the adaptive hedge
+      delay (a backup fires once a deployment is slower than its own p90)
+    - Exponentially weighted (EWMA) latency, TTFT and error rate: drive
+      latency-aware routing (best expected completion time first)
+
+    Latency and error rate decay back toward the default latency / no
+    errors while a deployment gets no traffic (half-life): a deployment
+    ranked last after one slow call is tried again later instead of never
+    refreshing its stats.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_samples: int = 100,
+        alpha: float = 0.2,
+        half_life_seconds: Optional[float] = None,
+        default_latency: float = 2.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            name: Deployment name
+            max_samples: Number of recent TTFT samples kept
+            alpha: EWMA weight of the newest observation (0-1)
+            half_life_seconds: Time without observations after which the
+                stats are halfway back to the defaults (None = no decay)
+            default_latency: Latency stale stats decay toward
+            clock: Time source (tests)
+        """
+        self.name = name
+        self.alpha = alpha
+        self.half_life_seconds = half_life_seconds
+        self.default_latency = default_latency
+        self._clock = clock
+        self._ttft: Deque[float] = deque(maxlen=max_samples)
+        self.ewma_latency: Optional[float] = None
+        self.ewma_ttft: Optional[float] = None
+        self.ewma_error_rate: float = 0.0
+        self._updated_at = clock()
+
+    def record_ttft(self, seconds: float) -> None:
+        """Record time to first token (streamed calls only)"""
+        self._ttft.append(seconds)
+        self.ewma_ttft = self._ewma(self.ewma_ttft, seconds)
+
+    def record_completion(self, seconds: float) -> None:
+        """Record a successful call's total latency"""
+        self._apply_decay()
+        self.ewma_latency = self._ewma(self.ewma_latency, seconds)
+        self.ewma_error_rate = self._ewma(self.ewma_error_rate, 0.0)
+
+    def record_error(self) -> None:
+        """Record a failed call"""
+        self._apply_decay()
+        self.ewma_error_rate = self._ewma(self.ewma_error_rate, 1.0)
+
+    @property
+    def sample_count(self) -> int:
+        return len(self._ttft)
+
+    def ttft_percentile(self, p: float) -> Optional[float]:
+        """TTFT percentile (p in 0-1), None if no samples yet"""
+        if not self._ttft:
+            return None
+        ordered = sorted(self._ttft)
+        index = min(len(ordered) - 1, int(p * len(ordered)))
+        return ordered[index]
+
+    def expected_latency(self) -> Optional[float]:
+        """Expected completion time including retries after errors
+
+        EWMA latency / success rate (a call failing with probability p
+        needs 1 / (1 - p) attempts on average). None if no data yet.
+        """
+        if self.ewma_latency is None:
+            return None
+        weight = self._decay_weight()
+        latency = self.default_latency + (self.ewma_latency - self.default_latency) * weight
+        success_rate = max(1.0 - self.ewma_error_rate * weight, 0.1)
+        return latency / success_rate
+
+    def snapshot(self) -> Dict:
+        """Stats for /health"""
+        p50 = self.ttft_percentile(0.5)
+        p90 = self.ttft_percentile(0.9)
+        expected = self.expected_latency()
+        return {
+            "samples": self.sample_count,
+            "ttft_p50_ms": self._ms(p50),
+            "ttft_p90_ms": self._ms(p90),
+            "ewma_latency_ms": self._ms(self.ewma_latency),
+            "ewma_ttft_ms": self._ms(self.ewma_ttft),
+            "ewma_error_rate": round(self.ewma_error_rate, 3),
+            "expected_latency_ms": self._ms(expected)
+        }
+
+    def _decay_weight(self) -> float:
+        """Weight of the stored stats (1 = fresh, → 0 when stale)"""
+        if not self.half_life_seconds:
+            return 1.0
+        age = max(0.0, self._clock() - self._updated_at)
+        return 0.5 ** (age / self.half_life_seconds)
+
+    def _apply_decay(self) -> None:
+        """Fold the decay into the stored stats before a new observation"""
+        weight = self._decay_weight()
+        if self.ewma_latency is not None:
+            self.ewma_latency = self.default_latency + (self.ewma_latency - self.default_latency) * weight
+        self.ewma_error_rate *= weight
+        self._updated_at = self._clock()
+
+    def _ewma(self, current: Optional[float], value: float) -> float:
+        if current is None:
+            return value
+        return self.alpha * value + (1 - self.alpha) * current
+
+    @staticmethod
+    def _ms(seconds: Optional[float]) -> Optional[int]:
+        return round(seconds * 1000) if seconds is not None else None
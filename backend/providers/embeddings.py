@@ -0,0 +1,97 @@
+"""Embeddings - Small local text embedding (no model download, no API call)
+
+Feature hashing of normalized words, word bigrams and character
+trigrams into a fixed-size float32 vector, L2-normalized so cosine
+similarity is a plain dot product. Good enough to find earlier messages
+on the same topic and near-duplicate questions.
+"""
+import re
+import unicodedata
+import zlib
+from typing import List
+
+import numpy as np
+
+from config import settings
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+# Relative weight of each feature family
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.7
+TRIGRAM_WEIGHT = 0.3
+
+# Function words (English + French, normalized: lowercase, no accents).
+# Negations ("not", "without", "pas", "sans"...) are NOT listed: they
+# change the meaning and must count as content.
+STOP_WORDS = frozenset("""
+a an the is are was were be been being am do does did have has had i me my
+we our us you your he she him her it its they them their this that these
+those what which who whom whose when where why how of in on at to for from
+by with about as into than then so and or but if can could would should
+will shall may might must please there here some any s t d ll re ve m
+le la les l un une des du de d au aux et ou est sont etre ai as ont c ce
+ca cela ceci qu que qui quoi quel quelle quels quelles comment pourquoi
+quand je j tu il elle nous vous ils elles on me te se mon ma mes ton ta
+tes son sa ses notre votre leur leurs en y dans sur pour par avec
+""".split())
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and collapse whitespace"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _SPACE_RE.sub(" ", stripped.lower()).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """Normalized word tokens"""
+    return _TOKEN_RE.findall(normalize_text(text))
+
+
+def content_words(text: str) -> List[str]:
+    """Normalized tokens minus stop words, in order
+
+    "What is Python?" and "what's python ?" both give ["python"];
+    "sort a list" and "reverse a list" stay different.
+    """
+    return [token for token in tokenize(text) if token not in STOP_WORDS]
+
+
+def embed_texts(texts: List[str], dim: int = settings.embedding_dim) -> np.ndarray:
+    """Embed texts as L2-normalized float32 rows
+
+    Args:
+        texts: Texts to embed
+        dim: Vector size
+
+    Returns:
+        Array of shape (len(texts), dim); empty texts give zero vectors
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = tokenize(text)
+        for token in tokens:
+            _add_feature(vectors[row], token, WORD_WEIGHT, dim)
+            padded = f"#{token}#"
+            for i in range(len(padded) - 2):
+                _add_feature(vectors[row], padded[i:i + 3], TRIGRAM_WEIGHT, dim)
+        for first, second in zip(tokens, tokens[1:]):
+            _add_feature(vectors[row], f"{first} {second}", BIGRAM_WEIGHT, dim)
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def embed_text(text: str, dim: int = settings.embedding_dim) -> np.ndarray:
+    """Embed one text (shape (dim,))"""
+    return embed_texts([text], dim)[0]
+
+
+def _add_feature(vector: np.ndarray, feature: str, weight: float, dim: int) -> None:
+    """Signed hashing trick (sign bit limits collision bias)"""
+    h = zlib.crc32(feature.encode("utf-8"))
+    vector[h % dim] += weight if (h >> 31) & 1 else -weight
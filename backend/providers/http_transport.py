@@ -0,0 +1,97 @@
+"""HTTP Transport - App-lifetime pooled HTTP client
+
+One httpx.AsyncClient shared by every provider and OAuth call, so short
+completions don't pay TCP + TLS setup on each request.
+"""
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+import litellm
+
+from config import settings
+
+
+class HTTPTransport:
+    """Shared HTTP connection pool
+
+    - Keep-alive connection pool per host (httpx pools by origin)
+    - Optional HTTP/2 (needs the `h2` package, falls back to HTTP/1.1)
+    - Configurable pool limits
+
+    Lifecycle: start() / close() from the FastAPI startup/shutdown hooks.
+
+    Example:
+        >>> transport = HTTPTransport()
+        >>> await transport.start()
+        >>> async with transport.session() as client:
+        ...     await client.get("https://example.com")
+        >>> await transport.close()
+    """
+
+    def __init__(
+        self,
+        max_connections: int = settings.http_pool_max_connections,
+        max_keepalive_connections: int = settings.http_pool_max_keepalive_connections,
+        keepalive_expiry: float = settings.http_pool_keepalive_expiry_seconds,
+        http2: bool = settings.http2_enabled,
+        timeout: float = settings.http_timeout_seconds
+    ):
+        """
+        Args:
+            max_connections: Max open connections (all hosts)
+            max_keepalive_connections: Max idle connections kept alive
+            keepalive_expiry: Seconds an idle connection stays in the pool
+            http2: Enable HTTP/2 if the `h2` package is installed
+            timeout: Default request timeout (seconds)
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2
+        self.timeout = timeout
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        """Create the shared client (idempotent)"""
+        if self.client is not None and not self.client.is_closed:
+            return
+
+        http2 = self.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            print("⚠️ HTTP/2 requested but `h2` is not installed - using HTTP/1.1")
+            http2 = False
+
+        self.client = httpx.AsyncClient(
+            limits=self.limits,
+            http2=http2,
+            timeout=self.timeout
+        )
+        print(f"✅ HTTP transport started (HTTP/{'2' if http2 else '1.1'}, "
+              f"max {self.limits.max_connections} connections)")
+
+    async def close(self) -> None:
+        """Close every pooled connection"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+            if litellm.aclient_session is not None and litellm.aclient_session.is_closed:
+                litellm.aclient_session = None
+
+    def bind_litellm(self) -> None:
+        """Make LiteLLM reuse the shared client (its aclient_session hook)"""
+        if self.client is not None:
+            litellm.aclient_session = self.client
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[httpx.AsyncClient]:
+        """Shared client if started, else a throwaway one (scripts/tests)"""
+        if self.client is not None and not self.client.is_closed:
+            yield self.client
+            return
+
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            yield client
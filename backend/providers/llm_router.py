@@ -1,12 +1,39 @@
 """LiteLLM Router - Universal LLM Gateway with Mock Fallback + OAuth Support"""
-from typing import List, Dict, Optional, AsyncGenerator, TYPE_CHECKING
+from typing import List, Dict, Optional, AsyncGenerator, Callable, Literal, Union, overload, TYPE_CHECKING
+import asyncio
+import time
 import litellm
 from config import settings
 from providers.mock_llm import MockLLM
+from providers.circuit_breaker import CircuitBreaker
+from providers.deployment_stats import DeploymentStats
+from providers.response_cache import ResponseCache, build_response_cache, make_cache_key
+from providers.single_flight import SingleFlight
+from providers.quorum import race_to_quorum
+from providers.bulkhead import Bulkhead, BulkheadFullError
+from providers.deadline import DeadlineExceeded, await_until_deadline, iterate_until_deadline, step_timeout
 
 if TYPE_CHECKING:
     from auth.token_store import TokenStore
     from auth.oauth_refresh import OAuthRefresher
+    from providers.http_transport import HTTPTransport
+
+# Completion defaults (SHORT responses for landing page demo!)
+DEFAULT_TIMEOUT = 120  # 120s timeout for local models (DeepSeek-R1 is slow)
+                       # Capped by the request deadline (providers/deadline.py)
+DEFAULT_MAX_TOKENS = 150
+DEFAULT_TEMPERATURE = 0.7
+
+# Map provider name to OAuth provider
+OAUTH_PROVIDER_MAP = {
+    "claude": "anthropic",
+    "gpt": "openai",
+    "gemini": "google"
+}
+
+class CircuitOpenError(Exception):
+    """Deployment skipped because its circuit breaker is open"""
+
 
 class LLMRouter:
     """Universal LLM router with fallback to mock (for dev/testing) + OAuth support"""
@@ -14,12 +41,17 @@ class LLMRouter:
     def __init__(
         self, 
         token_store: Optional['TokenStore'] = None,
-        oauth_refresher: Optional['OAuthRefresher'] = None
+        oauth_refresher: Optional['OAuthRefresher'] = None,
+        cache: Optional[ResponseCache] = None
     ):
         litellm.set_verbose = False
         self.token_store = token_store  # OAuth token store
         self.oauth_refresher = oauth_refresher  # Auto-refresh helper
+        self.http_transport: Optional['HTTPTransport'] = None  # Shared connection pool
         self.deployments = self._build_deployments()
+        self._init_deployment_state()
+        self.cache = cache if cache is not None else build_response_cache()
+        self.flights = SingleFlight()  # Coalesces identical in-flight requests
         self.mock = MockLLM()  # Always available fallback
     
     def _build_deployments(self) -> List[Dict]:
@@ -29,6 +61,13 @@ class LLMRouter:
         - PRIORITY 1: Gemini 2.0 Flash (gratuit freemium)
         - PRIORITY 2: PRO users' configured AIs (OAuth/API keys)
         - PRIORITY 999: Mock fallback (dev/testing)
+        
+        Deployments sharing a "hedge_group" are interchangeable: any of them
+        is an acceptable answer (used by hedged requests).
+        
+        Optional "max_concurrency" / "max_queue" override the bulkhead
+        defaults for a deployment. "context_window" is the model's max
+        prompt + completion tokens (used for token-budgeted context).
         """
         deployments = []
         
@@ -39,6 +78,9 @@ class LLMRouter:
                 "model": f"ollama/{settings.ollama_model}",
                 "api_base": settings.ollama_base_url,
                 "priority": 2,
+                "max_concurrency": settings.ollama_max_concurrency,  # Local GPU box
+                "max_queue": settings.ollama_max_queue,
+                "context_window": settings.ollama_context_window,
                 "enabled": True
             })
         
@@ -52,6 +94,7 @@ class LLMRouter:
                 "name": "claude",
                 "model": "claude-3-5-sonnet-20241022",
                 "api_key": claude_key,
+                "context_window": 200000,
                 "priority": 2,
                 "enabled": True,
                 "oauth": self.token_store and self.token_store.is_token_valid("anthropic")
@@ -67,6 +110,7 @@ class LLMRouter:
                 "name": "gpt",
                 "model": "gpt-4-turbo-preview",
                 "api_key": openai_key,
+                "context_window": 128000,
                 "priority": 2,
                 "enabled": True,
                 "oauth": self.token_store and self.token_store.is_token_valid("openai")
@@ -82,7 +126,9 @@ class LLMRouter:
                 "name": "gemini",
                 "model": "gemini/gemini-2.0-flash-exp",
                 "api_key": google_key,
+                "context_window": 1048576,
                 "priority": 1,
+                "hedge_group": "free",
                 "enabled": True,
                 "oauth": self.token_store and self.token_store.is_token_valid("google")
             })
@@ -94,7 +140,9 @@ class LLMRouter:
                 "name": "llama",  # SmartRouter mapping
                 "model": "groq/llama-3.1-70b-versatile",
                 "api_key": groq_key,
+                "context_window": 131072,
                 "priority": 1,
+                "hedge_group": "free",
                 "enabled": True,
                 "oauth": False
             })
@@ -105,7 +153,9 @@ class LLMRouter:
                 "name": "mixtral",
                 "model": "groq/mixtral-8x7b-32768",
                 "api_key": groq_key,
+                "context_window": 32768,
                 "priority": 1,
+                "hedge_group": "free",
                 "enabled": True,
                 "oauth": False
             })
@@ -122,60 +172,201 @@ class LLMRouter:
         return sorted([d for d in deployments if d["enabled"]], 
                      key=lambda x: x["priority"])
     
+    def use_transport(self, http_transport: 'HTTPTransport') -> None:
+        """Route provider calls through the shared pooled HTTP transport"""
+        self.http_transport = http_transport
+        http_transport.bind_litellm()
+    
+    def _init_deployment_state(self) -> None:
+        """(Re)build per-deployment runtime state (breakers, bulkheads, latency stats)"""
+        self.breakers = self._build_breakers()
+        self.bulkheads = {
+            d["name"]: Bulkhead(
+                name=d["name"],
+                max_concurrent=d.get("max_concurrency", settings.bulkhead_max_concurrency),
+                max_queue=d.get("max_queue", settings.bulkhead_max_queue)
+            )
+            for d in self.deployments
+            if d["name"] != "mock"
+        }
+        self.stats = {
+            d["name"]: DeploymentStats(
+                d["name"],
+                alpha=settings.routing_ewma_alpha,
+                half_life_seconds=settings.routing_stats_half_life_seconds,
+                default_latency=settings.routing_default_latency_seconds
+            )
+            for d in self.deployments
+        }
+    
+    def _build_breakers(self) -> Dict[str, CircuitBreaker]:
+        """One circuit breaker per deployment (mock never trips)"""
+        return {
+            d["name"]: CircuitBreaker(
+                name=d["name"],
+                window_size=settings.circuit_breaker_window,
+                min_calls=settings.circuit_breaker_min_calls,
+                error_threshold=settings.circuit_breaker_error_threshold,
+                cooldown_seconds=settings.circuit_breaker_cooldown_seconds,
+                max_consecutive_timeouts=settings.circuit_breaker_max_consecutive_timeouts
+            )
+            for d in self.deployments
+            if d["name"] != "mock"
+        }
+    
+    def _order_deployments(self, preferred_provider: Optional[str] = None) -> List[Dict]:
+        """Deployments in try order (latency-aware)
+        
+        1. Preferred provider first (persona identity)
+        2. Best expected completion time (live EWMA latency + error rate),
+           bucketed so that static priority breaks near-ties
+        3. Mock always last
+        """
+        def sort_key(deployment: Dict):
+            if deployment["name"] == "mock":
+                return (2, 0, deployment["priority"])
+            return (
+                0 if deployment["name"] == preferred_provider else 1,
+                self._expected_latency_bucket(deployment),
+                deployment["priority"]
+            )
+        
+        return sorted(self.deployments, key=sort_key)
+    
+    def _expected_latency_bucket(self, deployment: Dict) -> int:
+        """Expected completion time, in buckets of routing_latency_bucket_seconds"""
+        expected = self.stats[deployment["name"]].expected_latency()
+        if expected is None:
+            expected = settings.routing_default_latency_seconds  # No data yet
+        return int(expected / settings.routing_latency_bucket_seconds)
+    
+    def _cache_key(self, deployment: Dict, messages: List[Dict], max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+        return make_cache_key(
+            deployment["model"], messages, DEFAULT_TEMPERATURE, max_tokens
+        )
+    
+    async def _cache_get(self, deployment: Dict, messages: List[Dict], max_tokens: int = DEFAULT_MAX_TOKENS) -> Optional[str]:
+        """Cached response for this deployment + request (None on miss)
+        
+        Disk-backed caches read on their own thread, not the event loop.
+        """
+        if self.cache is None:
+            return None
+        return await self.cache.aget(self._cache_key(deployment, messages, max_tokens))
+    
+    def _cache_set(
+        self,
+        deployment: Dict,
+        messages: List[Dict],
+        response: str,
+        max_tokens: int = DEFAULT_MAX_TOKENS
+    ) -> None:
+        if self.cache is not None:
+            self.cache.set(self._cache_key(deployment, messages, max_tokens), response)
+    
+    async def _resolve_api_key(self, deployment: Dict) -> Optional[str]:
+        """Get API key for deployment (OAuth token refresh if needed)"""
+        api_key = deployment.get("api_key")
+        if deployment.get("oauth") and self.oauth_refresher:
+            provider_name = deployment["name"]
+            oauth_provider = OAUTH_PROVIDER_MAP.get(provider_name)
+            if oauth_provider:
+                refreshed_token = await self.oauth_refresher.get_valid_token(oauth_provider)
+                if refreshed_token:
+                    api_key = refreshed_token
+                    print(f"🔑 Using refreshed OAuth token for {provider_name}")
+        return api_key
+    
+    @overload
+    async def chat(
+        self,
+        messages: List[Dict],
+        preferred_provider: Optional[str] = None,
+        stream: Literal[False] = False,
+        hedge: bool = False,
+        room_id: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> str: ...
+    
+    @overload
+    async def chat(
+        self,
+        messages: List[Dict],
+        preferred_provider: Optional[str] = None,
+        stream: Literal[True] = ...,
+        hedge: bool = False,
+        room_id: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> AsyncGenerator[str, None]: ...
+    
     async def chat(
         self, 
         messages: List[Dict], 
         preferred_provider: Optional[str] = None,
-        stream: bool = False
-    ) -> str:
-        """Route chat request to best available LLM"""
+        stream: bool = False,
+        hedge: bool = False,
+        room_id: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> Union[str, AsyncGenerator[str, None]]:
+        """Route chat request to best available LLM
         
-        deployments = self.deployments
-        if preferred_provider:
-            deployments = sorted(
-                deployments,
-                key=lambda x: (0 if x["name"] == preferred_provider else 1, x["priority"])
-            )
+        max_tokens caps the reply (default DEFAULT_MAX_TOKENS - short chat
+        answers; summaries ask for more).
+        
+        With stream=True, returns an async iterator of text deltas
+        (same as stream_chat).
+        
+        With hedge=True, the request may be raced against an equivalent
+        deployment (same hedge_group) - see _hedged_stream.
+        
+        room_id is used for fair queueing across rooms when a deployment
+        is at capacity (see Bulkhead).
+        
+        Under a request deadline (providers/deadline.py) each attempt gets
+        the remaining budget as its timeout, and no fallback deployment is
+        tried once it has passed.
+        
+        Raises:
+            DeadlineExceeded: If the request deadline passed
+        """
+        if stream:
+            return self.stream_chat(messages, preferred_provider, hedge=hedge, room_id=room_id, max_tokens=max_tokens)
+        max_tokens = max_tokens or DEFAULT_MAX_TOKENS
+        
+        if hedge:
+            candidates = self._hedge_candidates(preferred_provider)
+            if len(candidates) > 1:
+                chunks = [delta async for delta in self._hedged_stream(candidates, messages, room_id, max_tokens)]
+                if chunks:
+                    return "".join(chunks)
+                # Every hedged attempt failed - regular fallback below
         
         # Try each deployment
-        for deployment in deployments:
+        for deployment in self._order_deployments(preferred_provider):
+            # MOCK provider (error message - no real AI configured)
+            if deployment["name"] == "mock":
+                return await self.mock.chat(messages)
+            
+            cached = await self._cache_get(deployment, messages, max_tokens)
+            if cached is not None:
+                return cached
+            
             try:
-                # MOCK provider (error message - no real AI configured)
-                if deployment["name"] == "mock":
-                    return await self.mock.chat(messages)
-                
-                # OAuth token refresh if needed
-                api_key = deployment.get("api_key")
-                if deployment.get("oauth") and self.oauth_refresher:
-                    provider_name = deployment["name"]
-                    # Map provider name to OAuth provider
-                    oauth_map = {
-                        "claude": "anthropic",
-                        "gpt": "openai",
-                        "gemini": "google"
-                    }
-                    oauth_provider = oauth_map.get(provider_name)
-                    if oauth_provider:
-                        refreshed_token = await self.oauth_refresher.get_valid_token(oauth_provider)
-                        if refreshed_token:
-                            api_key = refreshed_token
-                            print(f"🔑 Using refreshed OAuth token for {provider_name}")
-                
-                # Real LLM provider
-                if stream:
-                    return self._stream_response(deployment, messages)
-                else:
-                    response = await litellm.acompletion(
-                        model=deployment["model"],
-                        messages=messages,
-                        api_base=deployment.get("api_base"),
-                        api_key=api_key,
-                        stream=False,
-                        timeout=120,  # 120s timeout for local models (DeepSeek-R1 is slow)
-                        max_tokens=150,  # SHORT responses for landing page demo!
-                        temperature=0.7
-                    )
-                    return response.choices[0].message.content
+                # Identical concurrent requests share one upstream call
+                return await self.flights.do(
+                    self._cache_key(deployment, messages, max_tokens),
+                    lambda: self._complete(deployment, messages, room_id, max_tokens)
+                )
+            
+            except CircuitOpenError:
+                continue  # SAFEGUARD: Skip open circuits immediately
+            
+            except BulkheadFullError:
+                print(f"🚧 {deployment['name']} at capacity - spilling over")
+                continue
+            
+            except (asyncio.CancelledError, DeadlineExceeded):
+                raise
             
             except Exception as e:
                 print(f"❌ {deployment['name']} failed: {e}")
@@ -184,26 +375,447 @@ class LLMRouter:
         # Should never reach (mock is always last)
         return await self.mock.chat(messages)
     
+    async def stream_chat(
+        self,
+        messages: List[Dict],
+        preferred_provider: Optional[str] = None,
+        hedge: bool = False,
+        room_id: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> AsyncGenerator[str, None]:
+        """Route chat request to best available LLM, yielding text deltas
+        
+        Falls back to the next deployment only if the current one fails
+        before its first token (a half-sent answer can't be retried).
+        
+        Raises:
+            DeadlineExceeded: If the request deadline passed (even mid-answer)
+        """
+        max_tokens = max_tokens or DEFAULT_MAX_TOKENS
+        if hedge:
+            candidates = self._hedge_candidates(preferred_provider)
+            if len(candidates) > 1:
+                sent = False
+                async for delta in self._hedged_stream(candidates, messages, room_id, max_tokens):
+                    sent = True
+                    yield delta
+                if sent:
+                    return
+                # Every hedged attempt failed - regular fallback below
+        
+        for deployment in self._order_deployments(preferred_provider):
+            if deployment["name"] == "mock":
+                yield await self.mock.chat(messages)
+                return
+            
+            cached = await self._cache_get(deployment, messages, max_tokens)
+            if cached is not None:
+                yield cached
+                return
+            
+            started = False
+            try:
+                # Identical concurrent streams share one upstream stream
+                async for delta in self.flights.stream(
+                    self._cache_key(deployment, messages, max_tokens),
+                    lambda: self._stream_deployment(deployment, messages, room_id, max_tokens)
+                ):
+                    started = True
+                    yield delta
+                return
+            
+            except CircuitOpenError:
+                continue  # SAFEGUARD: Skip open circuits immediately
+            
+            except BulkheadFullError:
+                print(f"🚧 {deployment['name']} at capacity - spilling over")
+                continue
+            
+            except DeadlineExceeded:
+                raise
+            
+            except Exception as e:
+                print(f"❌ {deployment['name']} stream failed: {e}")
+                if started:
+                    return  # Partial answer already sent - stop here
+                continue
+        
+        # Should never reach (mock is always last)
+        yield await self.mock.chat(messages)
+    
+    async def quorum_chat(
+        self,
+        messages: List[Dict],
+        n: Optional[int] = None,
+        k: Optional[int] = None,
+        preferred_provider: Optional[str] = None,
+        equivalent: Optional[Callable[[str, str], bool]] = None,
+        room_id: Optional[str] = None
+    ) -> Dict:
+        """Send one request to N deployments, return once k answers agree
+        
+        Answers are compared as they arrive; as soon as k are equivalent
+        the outstanding calls are cancelled. Latency is that of the k-th
+        fastest deployment instead of the slowest.
+        
+        Args:
+            messages: Chat messages
+            n: Deployments to query (default: settings.quorum_n)
+            k: Equivalent answers needed (default: settings.quorum_k)
+            preferred_provider: Deployment to include first
+            equivalent: Answer comparison (default: answers_agree at
+                quorum_similarity_threshold - similar wording, same
+                negations, same names / numbers)
+            room_id: Room for fair queueing
+        
+        Returns:
+            {
+                'response': str,
+                'deployments': List[str],  # Deployments that agreed
+                'agreed': bool  # False = no quorum (first answer returned)
+            }
+        """
+        # Imported here: orchestrator imports this module
+        from orchestrator.agreement import answers_agree
+        
+        n = n or settings.quorum_n
+        k = k or settings.quorum_k
+        equivalent = equivalent or (lambda a, b: answers_agree([a, b], settings.quorum_similarity_threshold))
+        
+        candidates = [
+            d for d in self._order_deployments(preferred_provider)
+            if d["name"] != "mock"
+        ][:n]
+        if len(candidates) < k:
+            # Not enough deployments for a quorum - regular routing
+            response = await self.chat(messages, preferred_provider, room_id=room_id)
+            return {'response': response, 'deployments': [], 'agreed': False}
+        
+        async def attempt(deployment: Dict) -> str:
+            cached = await self._cache_get(deployment, messages)
+            if cached is not None:
+                return cached
+            return await self.flights.do(
+                self._cache_key(deployment, messages),
+                lambda: self._complete(deployment, messages, room_id)
+            )
+        
+        group, answers = await race_to_quorum(
+            [(d["name"], attempt(d)) for d in candidates], k, equivalent
+        )
+        if group:
+            return {
+                'response': group[0][1],
+                'deployments': [a[0] for a in group],
+                'agreed': True
+            }
+        if answers:
+            return {'response': answers[0][1], 'deployments': [answers[0][0]], 'agreed': False}
+        response = await self.chat(messages, preferred_provider, room_id=room_id)
+        return {'response': response, 'deployments': [], 'agreed': False}
+    
+    async def _complete(
+        self,
+        deployment: Dict,
+        messages: List[Dict],
+        room_id: Optional[str] = None,
+        max_tokens: int = DEFAULT_MAX_TOKENS
+    ) -> str:
+        """One non-streamed call to a deployment (breaker, bulkhead, stats, cache)
+        
+        Raises:
+            CircuitOpenError: If the deployment's circuit is open
+            BulkheadFullError: If the deployment's wait queue is full
+        """
+        step_timeout(DEFAULT_TIMEOUT)  # Deadline already passed → don't even queue
+        breaker = self.breakers[deployment["name"]]
+        if not breaker.allow_request():
+            raise CircuitOpenError(deployment["name"])
+        
+        try:
+            async with self.bulkheads[deployment["name"]].slot(room_id or "global"):
+                api_key = await self._resolve_api_key(deployment)
+                
+                # Real LLM provider (remaining request budget, at most DEFAULT_TIMEOUT)
+                timeout = step_timeout(DEFAULT_TIMEOUT)
+                started_at = time.monotonic()
+                response = await await_until_deadline(litellm.acompletion(
+                    model=deployment["model"],
+                    messages=messages,
+                    api_base=deployment.get("api_base"),
+                    api_key=api_key,
+                    stream=False,
+                    timeout=timeout,
+                    max_tokens=max_tokens,
+                    temperature=DEFAULT_TEMPERATURE
+                ))
+        
+        except (BulkheadFullError, DeadlineExceeded):
+            breaker.release()  # Not the provider's fault
+            raise
+        
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        
+        except Exception as e:
+            breaker.record_failure(timeout=self._is_timeout(e))
+            self.stats[deployment["name"]].record_error()
+            raise
+        
+        elapsed = time.monotonic() - started_at
+        breaker.record_success()
+        # Full latency only: TTFT samples (hedge delay) come from streamed calls
+        self.stats[deployment["name"]].record_completion(elapsed)
+        content = response.choices[0].message.content
+        self._cache_set(deployment, messages, content, max_tokens)
+        return content
+    
+    async def _stream_deployment(
+        self,
+        deployment: Dict,
+        messages: List[Dict],
+        room_id: Optional[str] = None,
+        max_tokens: int = DEFAULT_MAX_TOKENS
+    ) -> AsyncGenerator[str, None]:
+        """One streamed call to a deployment (breaker, bulkhead, stats, cache)
+        
+        Raises (before any delta):
+            CircuitOpenError: If the deployment's circuit is open
+            BulkheadFullError: If the deployment's wait queue is full
+        """
+        step_timeout(DEFAULT_TIMEOUT)  # Deadline already passed → don't even queue
+        breaker = self.breakers[deployment["name"]]
+        if not breaker.allow_request():
+            raise CircuitOpenError(deployment["name"])
+        
+        started = False
+        recorded = False
+        chunks = []
+        try:
+            async with self.bulkheads[deployment["name"]].slot(room_id or "global"):
+                api_key = await self._resolve_api_key(deployment)
+                started_at = time.monotonic()
+                async for delta in iterate_until_deadline(self._stream_response(deployment, messages, api_key, max_tokens)):
+                    if not started:
+                        started = True
+                        breaker.record_success()  # First token = provider is up
+                        recorded = True
+                        self.stats[deployment["name"]].record_ttft(time.monotonic() - started_at)
+                    chunks.append(delta)
+                    yield delta
+                if not recorded:
+                    breaker.record_success()
+                    recorded = True
+                self.stats[deployment["name"]].record_completion(time.monotonic() - started_at)
+                self._cache_set(deployment, messages, "".join(chunks), max_tokens)
+        
+        except (BulkheadFullError, DeadlineExceeded):
+            raise  # Not the provider's fault - probe released in finally
+        
+        except Exception as e:
+            breaker.record_failure(timeout=self._is_timeout(e))
+            self.stats[deployment["name"]].record_error()
+            recorded = True
+            raise
+        
+        finally:
+            if not recorded:
+                breaker.release()  # Consumer stopped before any outcome
+    
+    def _hedge_candidates(self, preferred_provider: Optional[str] = None) -> List[Dict]:
+        """Interchangeable deployments for a hedged request (preferred first)
+        
+        Only deployments in the same hedge_group as the preferred one (or
+        as the first in order) with a closed/half-open circuit qualify.
+        """
+        ordered = [d for d in self._order_deployments(preferred_provider) if d["name"] != "mock"]
+        if not ordered or not ordered[0].get("hedge_group"):
+            return []
+        group = ordered[0]["hedge_group"]
+        return [
+            d for d in ordered
+            if d.get("hedge_group") == group and self.breakers[d["name"]].state != CircuitBreaker.OPEN
+        ]
+    
+    def _hedge_delay(self, deployment: Dict) -> float:
+        """Adaptive delay before firing a backup: deployment's TTFT p90"""
+        stats = self.stats[deployment["name"]]
+        p90 = stats.ttft_percentile(0.9)
+        if p90 is None or stats.sample_count < settings.hedge_min_samples:
+            return settings.hedge_default_delay_seconds
+        return min(max(p90, settings.hedge_min_delay_seconds), settings.hedge_max_delay_seconds)
+    
+    async def _pump_stream(
+        self,
+        deployment: Dict,
+        messages: List[Dict],
+        queue: asyncio.Queue,
+        room_id: Optional[str] = None,
+        max_tokens: int = DEFAULT_MAX_TOKENS
+    ) -> None:
+        """Run one hedged attempt, pushing ("token"|"done"|"error", value) to queue"""
+        try:
+            async for delta in self._stream_deployment(deployment, messages, room_id, max_tokens):
+                await queue.put(("token", delta))
+            await queue.put(("done", None))
+        
+        except (CircuitOpenError, BulkheadFullError) as e:
+            await queue.put(("error", e))
+        
+        except Exception as e:
+            print(f"❌ {deployment['name']} hedged attempt failed: {e}")
+            await queue.put(("error", e))
+    
+    async def _hedged_stream(
+        self,
+        candidates: List[Dict],
+        messages: List[Dict],
+        room_id: Optional[str] = None,
+        max_tokens: int = DEFAULT_MAX_TOKENS
+    ) -> AsyncGenerator[str, None]:
+        """Hedged request across interchangeable deployments
+        
+        1. Send to the preferred deployment
+        2. If no first token within its adaptive delay (TTFT p90),
+           fire a backup request to the next candidate
+        3. Whichever sends a first token first wins, the loser is cancelled
+        
+        Yields nothing if every attempt failed (caller falls back).
+        """
+        # Any interchangeable deployment's cached answer is acceptable
+        for deployment in candidates:
+            cached = await self._cache_get(deployment, messages, max_tokens)
+            if cached is not None:
+                yield cached
+                return
+        
+        remaining = list(candidates)
+        live: Dict[asyncio.Task, tuple] = {}  # queue.get() task -> (deployment, queue, pump task)
+        last_launched = None
+        
+        def launch() -> None:
+            nonlocal last_launched
+            if remaining:
+                deployment = remaining.pop(0)
+                queue: asyncio.Queue = asyncio.Queue()
+                pump = asyncio.create_task(self._pump_stream(deployment, messages, queue, room_id, max_tokens))
+                live[asyncio.create_task(queue.get())] = (deployment, queue, pump)
+                last_launched = deployment
+        
+        winner = None
+        first_delta = None
+        try:
+            launch()
+            while live and winner is None:
+                timeout = self._hedge_delay(last_launched) if remaining else None
+                done, _ = await asyncio.wait(
+                    list(live),
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                if not done:
+                    print(f"⏱️ {last_launched['name']} slow - hedging with backup")
+                    launch()
+                    continue
+                
+                for get_task in done:
+                    deployment, queue, pump = live.pop(get_task)
+                    kind, value = get_task.result()
+                    if kind == "token" and winner is None:
+                        winner = (deployment, queue, pump)
+                        first_delta = value
+                    elif kind != "token":
+                        if winner is None:
+                            launch()  # Attempt failed/empty - try next candidate now
+                    else:
+                        pump.cancel()
+        finally:
+            # Cancel every loser (and everything if the consumer went away)
+            for get_task, (_, _, pump) in live.items():
+                get_task.cancel()
+                pump.cancel()
+            live.clear()
+        
+        if winner is None:
+            return
+        
+        deployment, queue, pump = winner
+        try:
+            yield first_delta
+            while True:
+                kind, value = await queue.get()
+                if kind == "error" and isinstance(value, DeadlineExceeded):
+                    raise value
+                if kind != "token":
+                    break
+                yield value
+        finally:
+            pump.cancel()
+    
     async def _stream_response(
         self, 
         deployment: Dict, 
-        messages: List[Dict]
+        messages: List[Dict],
+        api_key: Optional[str] = None,
+        max_tokens: int = DEFAULT_MAX_TOKENS
     ) -> AsyncGenerator[str, None]:
         """Stream response from LLM"""
         response = await litellm.acompletion(
             model=deployment["model"],
             messages=messages,
             api_base=deployment.get("api_base"),
-            api_key=deployment.get("api_key"),
-            stream=True
+            api_key=api_key or deployment.get("api_key"),
+            stream=True,
+            timeout=step_timeout(DEFAULT_TIMEOUT),
+            max_tokens=max_tokens,
+            temperature=DEFAULT_TEMPERATURE
         )
         
         async for chunk in response:
-            if chunk.choices[0].delta.content:
+            if chunk.choices and chunk.choices[0].delta.content:
                 yield chunk.choices[0].delta.content
     
+    @staticmethod
+    def _is_timeout(error: Exception) -> bool:
+        """Check if a provider error is a timeout (hanging provider)"""
+        return isinstance(error, asyncio.TimeoutError) or "timeout" in type(error).__name__.lower()
+    
+    def get_context_window(self, preferred_provider: Optional[str] = None) -> int:
+        """Context window (tokens) a request must fit in
+        
+        Smallest window of the whole fallback chain: any deployment in it
+        may end up serving the request, so the prompt must fit them all.
+        """
+        windows = [
+            deployment["context_window"]
+            for deployment in self._order_deployments(preferred_provider)
+            if deployment.get("context_window")
+        ]
+        return min(windows) if windows else settings.ollama_context_window  # Conservative default
+    
     def get_available_providers(self) -> List[str]:
         """Get list of available AI providers"""
         return [d["name"] for d in self.deployments]
+    
+    def get_cache_stats(self) -> Optional[Dict]:
+        """Response cache stats (None if caching disabled)"""
+        return self.cache.stats() if self.cache is not None else None
+    
+    def get_coalescing_stats(self) -> Dict:
+        """Single-flight stats (upstream calls saved by coalescing)"""
+        return self.flights.stats()
+    
+    def get_health(self) -> Dict[str, Dict]:
+        """Circuit breaker, latency and bulkhead state per deployment"""
+        return {
+            name: {
+                **breaker.snapshot(),
+                **self.stats[name].snapshot(),
+                "bulkhead": self.bulkheads[name].snapshot()
+            }
+            for name, breaker in self.breakers.items()
+        }
 
 router = LLMRouter()
@@ -0,0 +1,57 @@
+"""Quorum - Return as soon as k of N concurrent answers agree
+
+Shared by LLMRouter.quorum_chat (one question, N deployments) and the
+"quorum" strategy (one question, N AIs). Answers are compared as they
+arrive; once k are equivalent the outstanding calls are cancelled, so
+latency is that of the k-th fastest answer instead of the slowest.
+"""
+import asyncio
+from typing import Awaitable, Callable, List, Tuple
+
+Answer = Tuple[str, str]  # (label, text)
+
+
+async def race_to_quorum(
+    attempts: List[Tuple[str, Awaitable[str]]],
+    k: int,
+    equivalent: Callable[[str, str], bool]
+) -> Tuple[List[Answer], List[Answer]]:
+    """Run attempts concurrently until k answers are equivalent
+
+    Failed attempts and empty answers are skipped.
+
+    Args:
+        attempts: (label, coroutine returning the answer text)
+        k: Equivalent answers needed
+        equivalent: Answer comparison
+
+    Returns:
+        (agreeing answers - [] if no quorum, every answer in arrival order)
+    """
+    async def run(label: str, attempt: Awaitable[str]) -> Answer:
+        return label, await attempt
+
+    tasks = [asyncio.create_task(run(label, attempt)) for label, attempt in attempts]
+    answers: List[Answer] = []
+    try:
+        for finished in asyncio.as_completed(tasks):
+            try:
+                label, text = await finished
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Quorum attempt failed: {e}")
+                continue
+            if not text:
+                continue
+            # A group reaching k always contains the newest answer
+            group = [a for a in answers if equivalent(a[1], text)] + [(label, text)]
+            answers.append((label, text))
+            if len(group) >= k:
+                print(f"🗳️ Quorum {k}/{len(tasks)}: {', '.join(a[0] for a in group)} agree")
+                return group, answers
+    finally:
+        # SAFEGUARD: stop paying for answers we no longer need
+        for task in tasks:
+            task.cancel()
+    return [], answers
@@ -0,0 +1,263 @@
+"""Response Cache - Exact-match LLM response cache with TTL + LRU eviction
+
+Identical (model, messages, temperature, max_tokens) requests are served
+from cache instead of hitting the provider again (fixed demo prompts,
+repeated persona + question pairs).
+
+Backends:
+- memory: in-process OrderedDict (fastest, lost on restart)
+- sqlite: disk-backed, survives restarts; lookups (aget) run on the
+  cache's reader thread, every write (insert, LRU touch, eviction) on its
+  writer thread - never on the event loop
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+
+
+def make_cache_key(
+    model: str,
+    messages: List[Dict],
+    temperature: float,
+    max_tokens: int
+) -> str:
+    """Canonical hash of a completion request"""
+    canonical = json.dumps(
+        {
+            "model": model,
+            "messages": [
+                {"role": m.get("role"), "content": m.get("content")}
+                for m in messages
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(ABC):
+    """Base cache: TTL per entry, size-bounded LRU, hit/miss counters"""
+
+    backend = "base"
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600):
+        """
+        Args:
+            max_entries: Max cached responses (least recently used evicted)
+            ttl_seconds: Lifetime of each entry
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Get cached response (None on miss or expiry)"""
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() from the event loop (backends doing disk I/O override it)"""
+        return self.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        """Cache a response"""
+        if value:
+            self._set(key, value, time.time() + self.ttl_seconds)
+
+    def stats(self) -> Dict:
+        """Cache stats for /health (hits = provider calls saved)"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": self._size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        """Stored value (None if missing or expired)"""
+
+    @abstractmethod
+    def _set(self, key: str, value: str, expires_at: float) -> None:
+        """Store a value (evicting least recently used entries if full)"""
+
+    @abstractmethod
+    def _size(self) -> int:
+        """Number of stored entries"""
+
+
+class MemoryResponseCache(ResponseCache):
+    """In-process LRU cache"""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600):
+        super().__init__(max_entries, ttl_seconds)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def _get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value: str, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _size(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteResponseCache(ResponseCache):
+    """Disk-backed LRU cache (survives restarts)"""
+
+    backend = "sqlite"
+
+    def __init__(
+        self,
+        path: str = "./data/response_cache.db",
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600
+    ):
+        super().__init__(max_entries, ttl_seconds)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Writer connection: used on the writer thread only
+        self._writer = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._writer.execute(
+            "CREATE INDEX IF NOT EXISTS ix_response_cache_last_access "
+            "ON response_cache (last_access)"
+        )
+        # Reader connection: WAL lets lookups run while a write is in progress
+        self._reader = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._read_lock = Lock()
+        self._read_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache-read")
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+
+        # Running entry count (no COUNT(*) per write) + values not written yet
+        self._count = self._writer.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        self._pending: Dict[str, Tuple[float, str]] = {}
+
+    def flush(self) -> None:
+        """Wait until queued writes are on disk (tests, shutdown)"""
+        self._executor.submit(lambda: None).result()
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Lookup on the reader thread (a slow disk never blocks the event loop)"""
+        return await asyncio.get_running_loop().run_in_executor(self._read_executor, self.get, key)
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        pending = self._pending.get(key)
+        if pending is not None:
+            return pending[1] if now < pending[0] else None
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        if now >= row[1]:
+            self._executor.submit(self._delete, key)
+            return None
+        self._executor.submit(self._touch, key, now)  # LRU order, off the event loop
+        return row[0]
+
+    def _set(self, key: str, value: str, expires_at: float) -> None:
+        self._pending[key] = (expires_at, value)  # Readable before it is written
+        self._executor.submit(self._write, key, value, expires_at)
+
+    def _size(self) -> int:
+        return self._count
+
+    # --- Writer thread ---
+
+    def _write(self, key: str, value: str, expires_at: float) -> None:
+        try:
+            exists = self._writer.execute(
+                "SELECT 1 FROM response_cache WHERE key = ?", (key,)
+            ).fetchone() is not None
+            self._writer.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, time.time())
+            )
+            if not exists:
+                self._count += 1
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                evicted = self._writer.execute(
+                    "DELETE FROM response_cache WHERE key IN ("
+                    "SELECT key FROM response_cache ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                ).rowcount
+                self._count -= evicted
+                self.evictions += evicted
+        except Exception as e:
+            print(f"⚠️ Response cache write failed: {e}")
+        finally:
+            if self._pending.get(key, (None, None))[1] == value:
+                self._pending.pop(key, None)
+
+    def _touch(self, key: str, now: float) -> None:
+        self._writer.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+
+    def _delete(self, key: str) -> None:
+        self._count -= self._writer.execute("DELETE FROM response_cache WHERE key = ?", (key,)).rowcount
+
+
+def build_response_cache(
+    backend: str = settings.response_cache_backend
+) -> Optional[ResponseCache]:
+    """Create the configured cache backend (None = caching disabled)"""
+    if backend == "memory":
+        return MemoryResponseCache(
+            max_entries=settings.response_cache_max_entries,
+            ttl_seconds=settings.response_cache_ttl_seconds
+        )
+    if backend == "sqlite":
+        return SQLiteResponseCache(
+            path=settings.response_cache_path,
+            max_entries=settings.response_cache_max_entries,
+            ttl_seconds=settings.response_cache_ttl_seconds
+        )
+    if backend not in ("none", ""):
+        print(f"⚠️ Unknown response cache backend '{backend}' - caching disabled")
+    return None
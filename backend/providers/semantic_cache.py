@@ -0,0 +1,246 @@
+"""Semantic Cache - Reuse answers to repeated questions
+
+The exact-match response cache misses "What is Python?" vs "what's
+python ?": the prompt also carries the room history, which changes after
+every answer. Here only the question is keyed: its content words (case,
+accents, punctuation and stop words ignored, order kept) are embedded
+locally and searched among past (question, AIs, strategy, answer)
+entries; a stored answer is returned without any provider call.
+
+- A hit needs the same content words in the same order: hashed n-grams
+  alone score "sort a list in Python" vs "reverse a list in Python" above
+  0.9, so similarity only pre-filters candidates
+- Questions that depend on the conversation ("why?", "explain it more
+  simply") are never cached: no content words, or a back-reference word
+- Entries are scoped per room or per user (never shared across users),
+  per answering AI(s) and per strategy (an answer written as Claude isn't
+  reused as GPT, a single-AI answer isn't reused for a debate)
+- Blocking work (embedding, SQLite, index files) runs on the cache's own
+  thread via alookup / astore, never on the event loop
+- Vectors: memory-mapped index (room/vector_index.py), one store per
+  scope + AIs + strategy; answers: SQLite side table
+- Eviction by age (TTL) and size (oldest first beyond max_entries)
+"""
+import asyncio
+import functools
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional
+
+from config import settings
+from providers.embeddings import content_words, embed_text, embed_texts, tokenize
+from room.vector_index import VectorIndex
+
+# Words pointing back at the conversation ("explain it", "why is that?"):
+# the same words ask something else after another answer
+REFERENCE_WORDS = frozenset(
+    "it its this that these those they them their he she him her "
+    "ca cela ceci celui celle ceux celles".split()
+)
+
+
+class SemanticCache:
+    """Question-keyed answer cache with hit/miss metrics"""
+
+    def __init__(
+        self,
+        path: str = settings.semantic_cache_path,
+        threshold: float = settings.semantic_cache_threshold,
+        ttl_seconds: float = settings.semantic_cache_ttl_seconds,
+        max_entries: int = settings.semantic_cache_max_entries,
+        dim: int = settings.embedding_dim
+    ):
+        """
+        Args:
+            path: Storage directory (vectors + entries.db)
+            threshold: Min cosine similarity of a candidate (pre-filter)
+            ttl_seconds: Entry lifetime
+            max_entries: Max entries per scope + AIs + strategy
+            dim: Embedding size
+        """
+        root = Path(path)
+        root.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.index = VectorIndex(str(root / "vectors"), dim=dim)
+
+        self._lock = Lock()
+        self._conn = sqlite3.connect(str(root / "entries.db"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_cache ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, scope_key TEXT NOT NULL, "
+            "question TEXT NOT NULL, answer TEXT NOT NULL, created_at REAL NOT NULL, "
+            "question_key TEXT NOT NULL DEFAULT '', author TEXT NOT NULL DEFAULT '')"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(semantic_cache)")}
+        for column in ("question_key", "author"):  # Cache created by an older version
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE semantic_cache ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_semantic_cache_scope_created "
+            "ON semantic_cache (scope_key, created_at)"
+        )
+
+        # Own thread: lookups / stores are serialized and off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="semantic-cache")
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def alookup(self, scope: str, persona: str, question: str, strategy: str = "") -> Optional[Dict]:
+        """lookup() on the cache thread"""
+        return await self._run(self.lookup, scope, persona, question, strategy)
+
+    async def astore(
+        self,
+        scope: str,
+        persona: str,
+        question: str,
+        answer: str,
+        author: str = "",
+        strategy: str = ""
+    ) -> None:
+        """store() on the cache thread"""
+        await self._run(self.store, scope, persona, question, answer, author, strategy)
+
+    def lookup(self, scope: str, persona: str, question: str, strategy: str = "") -> Optional[Dict]:
+        """Cached answer to the same question (None on miss)
+
+        Args:
+            scope: Privacy scope ("room-<id>" / "user-<id>")
+            persona: Answering AI(s), e.g. "claude" or "claude+gpt"
+            question: User message
+            strategy: Orchestration strategy that produced the answer
+
+        Returns:
+            {'response': str, 'author': str}, or None on miss
+        """
+        question_key = self.question_key(question)
+        if not question_key:
+            return None  # Depends on the conversation - never cached
+        key = self._key(scope, persona, strategy)
+        hits = self.index.search(key, embed_text(question_key, self.index.dim), k=5)[0]
+        now = time.time()
+
+        for entry_id, score in hits:
+            if score < self.threshold:
+                break
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT answer, created_at, question_key, author FROM semantic_cache WHERE id = ?",
+                    (entry_id,)
+                ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self._evict(key, [entry_id])
+                continue
+            if row[2] != question_key:
+                continue  # Similar words, different question
+            self.hits += 1
+            return {'response': row[0], 'author': row[3] or persona}
+
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        scope: str,
+        persona: str,
+        question: str,
+        answer: str,
+        author: str = "",
+        strategy: str = ""
+    ) -> None:
+        """Cache an answer (then apply TTL + size limits for this scope)
+
+        Args:
+            author: Author shown with the answer (default: persona)
+        """
+        question_key = self.question_key(question)
+        if not answer or not question_key:
+            return
+        key = self._key(scope, persona, strategy)
+        with self._lock:
+            entry_id = self._conn.execute(
+                "INSERT INTO semantic_cache (scope_key, question, answer, created_at, question_key, author) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, question, answer, time.time(), question_key, author or persona)
+            ).lastrowid
+        self.index.add(key, [entry_id], embed_texts([question_key], self.index.dim))
+        self._enforce_limits(key)
+
+    @staticmethod
+    def question_key(question: str) -> str:
+        """Content words of a question ("" = depends on the conversation)
+
+        "What is Python?" and "what's python ?" both give "python"; "why?"
+        (no content word) and "can you explain it?" (refers back to the
+        previous answer) give "" and are never cached.
+        """
+        if REFERENCE_WORDS.intersection(tokenize(question)):
+            return ""
+        return " ".join(content_words(question))
+
+    def stats(self) -> Dict:
+        """Cache stats for /health (hits = provider calls saved)"""
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM semantic_cache").fetchone()[0]
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+    def _enforce_limits(self, key: str) -> None:
+        """Drop expired entries, then the oldest beyond max_entries"""
+        with self._lock:
+            expired = [
+                row[0] for row in self._conn.execute(
+                    "SELECT id FROM semantic_cache WHERE scope_key = ? AND created_at < ?",
+                    (key, time.time() - self.ttl_seconds)
+                )
+            ]
+            count = self._conn.execute(
+                "SELECT COUNT(*) FROM semantic_cache WHERE scope_key = ?", (key,)
+            ).fetchone()[0]
+            overflow = count - len(expired) - self.max_entries
+            if overflow > 0:
+                expired += [
+                    row[0] for row in self._conn.execute(
+                        "SELECT id FROM semantic_cache WHERE scope_key = ? AND created_at >= ? "
+                        "ORDER BY created_at LIMIT ?",
+                        (key, time.time() - self.ttl_seconds, overflow)
+                    )
+                ]
+        if expired:
+            self._evict(key, expired)
+
+    def _evict(self, key: str, entry_ids: List[int]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM semantic_cache WHERE id = ?", [(i,) for i in entry_ids])
+        self.index.store(key).remove(entry_ids)
+        self.evictions += len(entry_ids)
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+    @staticmethod
+    def _key(scope: str, persona: str, strategy: str = "") -> str:
+        return f"{scope}__{persona}__{strategy}"
+
+
+def build_semantic_cache() -> Optional[SemanticCache]:
+    """Create the semantic cache (None = disabled)"""
+    if not settings.semantic_cache_enabled:
+        return None
+    return SemanticCache()
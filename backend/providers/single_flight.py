@@ -0,0 +1,134 @@
+"""Single-Flight - Coalesce identical in-flight LLM requests
+
+When several callers send the same request to the same deployment at the
+same time, only one upstream call is made and everyone shares its result.
+Streaming joiners replay the buffered prefix, then follow live deltas.
+"""
+import asyncio
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    """One shared upstream call"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _StreamFlight:
+    """One shared upstream stream (buffered for late joiners)"""
+
+    def __init__(self):
+        self.buffer: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.cond = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Request coalescing keyed by canonical request hash
+
+    The upstream call is cancelled only when its last waiter goes away,
+    so one impatient caller never aborts a call others are waiting on.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        self.coalesced = 0  # Upstream calls saved
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() once for all concurrent callers with the same key"""
+        flight = self._calls.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._calls[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._calls, key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()  # Last waiter left - stop paying for it
+            raise
+        finally:
+            flight.waiters -= 1
+
+    async def stream(
+        self,
+        key: str,
+        factory: Callable[[], AsyncIterator[str]]
+    ) -> AsyncGenerator[str, None]:
+        """Share one upstream stream between concurrent callers
+
+        Late joiners first replay the buffered prefix, then get live deltas.
+        """
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _StreamFlight()
+            self._streams[key] = flight
+            flight.task = asyncio.ensure_future(self._pump(flight, factory()))
+            flight.task.add_done_callback(lambda _: self._forget(self._streams, key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        index = 0
+        try:
+            while True:
+                async with flight.cond:
+                    while index >= len(flight.buffer) and not flight.done:
+                        await flight.cond.wait()
+                    pending = flight.buffer[index:]
+                    finished = flight.done
+                    error = flight.error
+
+                for delta in pending:
+                    index += 1
+                    yield delta
+
+                if finished:
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()  # Last reader left - stop the upstream stream
+
+    def stats(self) -> Dict:
+        """Coalescing stats for /health"""
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "coalesced": self.coalesced
+        }
+
+    async def _pump(self, flight: _StreamFlight, stream: AsyncIterator[str]) -> None:
+        """Read the upstream stream into the shared buffer"""
+        try:
+            async for delta in stream:
+                async with flight.cond:
+                    flight.buffer.append(delta)
+                    flight.cond.notify_all()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            async with flight.cond:
+                flight.cond.notify_all()
+
+    @staticmethod
+    def _forget(registry: Dict, key: str, flight) -> None:
+        """Drop a finished flight (new requests start a fresh call)"""
+        if registry.get(key) is flight:
+            del registry[key]
@@ -0,0 +1,124 @@
+"""Context Builder - Token-budgeted conversation context
+
+Instead of sending the whole room history with every call, keep the
+newest turns that fit the deployment's context window (minus room for
+the reply). The system persona, the room summary and the current
+question are pinned; retrieved older messages go first.
+"""
+from typing import Dict, List, Optional
+
+# Local estimator: ~4 characters per token for mixed FR/EN text,
+# plus a few tokens of per-message framing (role, separators)
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Retrieved older messages (room/manager.py): first context trimmed
+RELEVANT_PREFIX = "Messages antérieurs pertinents:\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate token count of a text (no tokenizer download needed)"""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def count_message_tokens(messages: List[Dict]) -> int:
+    """Estimate token count of a message list"""
+    return sum(
+        estimate_tokens(m.get('content') or '') + MESSAGE_OVERHEAD_TOKENS
+        for m in messages
+    )
+
+
+def fit_to_budget(messages: List[Dict], max_tokens: int) -> List[Dict]:
+    """Trim a message list to a token budget
+
+    Pinned (always kept, counted against the budget):
+    - Leading system messages (persona, conversation summary) - cut short,
+      summary first, if they alone exceed the budget
+    - Last message (current question)
+
+    Then, with what is left: history newest-first while it fits, and the
+    retrieval block (leading RELEVANT_PREFIX system message) trimmed line
+    by line - recent turns matter more than retrieved older ones.
+
+    Args:
+        messages: Full message list (system..., history..., question)
+        max_tokens: Prompt token budget
+
+    Returns:
+        Messages in original order, oldest history dropped if needed
+    """
+    if count_message_tokens(messages) <= max_tokens or len(messages) < 2:
+        return messages
+
+    # Split head (system prompts) / history / pinned tail (question)
+    head_end = 0
+    while head_end < len(messages) - 1 and messages[head_end].get('role') == 'system':
+        head_end += 1
+    head = messages[:head_end]
+    history = messages[head_end:-1]
+    tail = messages[-1:]
+
+    pinned = [m for m in head if not _is_retrieval(m)]
+    overflow = count_message_tokens(pinned) + count_message_tokens(tail) - max_tokens
+    if overflow > 0:
+        pinned = _cut_pinned(pinned, overflow)
+    remaining = max_tokens - count_message_tokens(pinned) - count_message_tokens(tail)
+
+    kept: List[Dict] = []
+    for message in reversed(history):
+        cost = count_message_tokens([message])
+        if cost > remaining:
+            break
+        kept.append(message)
+        remaining -= cost
+
+    # Rebuild the head in its original order
+    pinned_iter = iter(pinned)
+    new_head: List[Dict] = []
+    for message in head:
+        if not _is_retrieval(message):
+            new_head.append(next(pinned_iter))
+            continue
+        trimmed = _trim_retrieval(message, remaining)
+        if trimmed is not None:
+            new_head.append(trimmed)
+            remaining -= count_message_tokens([trimmed])
+
+    return new_head + list(reversed(kept)) + tail
+
+
+def _is_retrieval(message: Dict) -> bool:
+    return message.get('role') == 'system' and (message.get('content') or '').startswith(RELEVANT_PREFIX)
+
+
+def _cut_pinned(pinned: List[Dict], overflow: int) -> List[Dict]:
+    """Shorten pinned system messages by overflow tokens, last one first"""
+    pinned = list(pinned)
+    for i in reversed(range(len(pinned))):
+        if overflow <= 0:
+            break
+        content = pinned[i].get('content') or ''
+        tokens = estimate_tokens(content)
+        cut = min(overflow, tokens)
+        pinned[i] = {**pinned[i], 'content': content[:(tokens - cut) * CHARS_PER_TOKEN]}
+        overflow -= cut
+    return pinned
+
+
+def _trim_retrieval(message: Dict, budget: int) -> Optional[Dict]:
+    """Newest retrieved lines that fit the budget (None if none fits)"""
+    lines = message['content'][len(RELEVANT_PREFIX):].split("\n")
+    cost = count_message_tokens([{'content': RELEVANT_PREFIX}])
+    kept: List[str] = []
+    for line in reversed(lines):
+        line_cost = estimate_tokens(line + "\n")
+        if cost + line_cost > budget:
+            break
+        kept.append(line)
+        cost += line_cost
+    if not kept:
+        return None
+    return {**message, 'content': RELEVANT_PREFIX + "\n".join(reversed(kept))}
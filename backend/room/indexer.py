@@ -0,0 +1,133 @@
+"""Vector Indexer - Background indexing of room messages
+
+Embedding is pure-Python hashing (~24s per 100k messages). Doing it while
+building a context blocked the DB thread - and with it every run_db call in
+the app - and ate into the request deadline. The indexer instead catches a
+room's store up in a background task:
+
+- rows (id, content) newer than the store are read in small batches on
+  the DB thread (other queries interleave between batches)
+- embedding + appending to the memory-mapped store runs on the indexer's
+  own thread
+
+Retrieval only searches what is already indexed; the newest turns are in
+the recent-turns window anyway.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.room import Message, SessionLocal, run_db
+from providers.deadline import deadline_scope
+from providers.embeddings import embed_texts
+from room.vector_index import VectorIndex
+
+
+class VectorIndexer:
+    """Keeps room vector stores in sync with the messages table (one task per room)"""
+
+    def __init__(
+        self,
+        vector_index: VectorIndex,
+        session_factory: Callable[[], Session] = SessionLocal,
+        batch_size: int = settings.vector_index_batch_size
+    ):
+        """
+        Args:
+            vector_index: Index the rooms are added to
+            session_factory: Creates the DB session batches are read with
+            batch_size: Messages read + embedded per batch
+        """
+        self.vector_index = vector_index
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-index")
+        self._running: Set[int] = set()
+        self._dirty: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(self, room_pk: int, room_key: str) -> Optional[asyncio.Task]:
+        """Index the room's new messages in the background
+
+        Args:
+            room_pk: Room primary key (rooms.id)
+            room_key: Vector store key (Room.room_id)
+
+        Returns:
+            The background task, or None if one is already running (it
+            runs another pass when done)
+        """
+        if room_pk in self._running:
+            self._dirty.add(room_pk)
+            return None
+
+        self._running.add(room_pk)
+        # Started from a request: don't carry its deadline into the task
+        with deadline_scope(None):
+            task = asyncio.create_task(self._run(room_pk, room_key))
+        # SAFEGUARD: keep a reference so the task isn't garbage collected mid-run
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def sync_room(self, room_pk: int, room_key: str) -> int:
+        """Index every message newer than the room's store
+
+        Returns:
+            Messages indexed
+        """
+        store = self.vector_index.store(room_key)
+        indexed = 0
+        while True:
+            rows = await run_db(self._load_batch, room_pk, store.max_id)
+            if not rows:
+                return indexed
+            await self._offload(self._index_batch, room_key, rows)
+            indexed += len(rows)
+
+    async def wait_idle(self) -> None:
+        """Wait for running index tasks (tests, shutdown)"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def _run(self, room_pk: int, room_key: str) -> None:
+        try:
+            while True:
+                self._dirty.discard(room_pk)
+                indexed = await self.sync_room(room_pk, room_key)
+                if indexed:
+                    print(f"🔎 Room {room_key}: indexed {indexed} messages")
+                if room_pk not in self._dirty:
+                    return
+        except Exception as e:
+            print(f"⚠️ Room {room_key}: vector indexing failed: {e}")
+        finally:
+            self._running.discard(room_pk)
+
+    def _load_batch(self, room_pk: int, after_id: int) -> List[Tuple[int, str]]:
+        """Next messages to index (runs on the DB thread)"""
+        db = self.session_factory()
+        try:
+            rows = db.query(Message.id, Message.content).filter(
+                Message.room_id == room_pk,
+                Message.id > after_id
+            ).order_by(Message.id).limit(self.batch_size).all()
+            return [(row.id, row.content) for row in rows]
+        finally:
+            db.close()
+
+    def _index_batch(self, room_key: str, rows: List[Tuple[int, str]]) -> None:
+        """Embed + append (runs on the indexer thread)"""
+        self.vector_index.add(
+            room_key,
+            [message_id for message_id, _ in rows],
+            embed_texts([content for _, content in rows], self.vector_index.dim)
+        )
+
+    async def _offload(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
@@ -6,32 +6,91 @@ Handles:
 - AI orchestration coordination
 - WebSocket broadcasts
 """
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable, Awaitable, Set, Tuple
 from datetime import datetime
+import asyncio
 import uuid
 
-from models.room import Room, Message, AIDiscussion, get_db
+from config import settings
+from models.room import Room, Message, AIDiscussion, RoomSummary, SessionLocal, get_db, run_db
 from orchestrator.collaborator import AICollaborator
+from orchestrator.strategies import DEFAULT_STRATEGY, STRATEGIES
+from room.context_builder import RELEVANT_PREFIX
+from room.memory import ConversationMemory
+from room.vector_index import VectorIndex
+from room.indexer import VectorIndexer
+from room.write_behind import WriteBehindQueue
+from providers.embeddings import embed_text
+from providers.deadline import DeadlineExceeded, deadline_scope
+
+PARTIAL_SUFFIX = "\n\n[réponse interrompue]"
+
+# Running background refinements (a reference keeps them from being GC'd)
+_background_tasks: Set[asyncio.Task] = set()
 
 
 class RoomManager:
     """Manages chat rooms and coordinates AI collaboration"""
     
-    def __init__(self, llm_router, db_session):
+    def __init__(
+        self,
+        llm_router,
+        db_session,
+        on_token: Optional[Callable[[str, str, str], Awaitable[None]]] = None,
+        memory: Optional[ConversationMemory] = None,
+        vector_index: Optional[VectorIndex] = None,
+        semantic_cache=None,
+        on_refined: Optional[Callable[[str, Dict], Awaitable[None]]] = None,
+        session_factory: Callable = SessionLocal,
+        write_behind: Optional[WriteBehindQueue] = None,
+        indexer: Optional[VectorIndexer] = None
+    ):
         """
         Args:
             llm_router: LLM router instance
             db_session: Database session
+            on_token: Optional async callback(author, phase, delta) for
+                streaming AI output as it is generated
+            memory: Optional rolling summary memory (shared across requests)
+            vector_index: Optional local vector index used to pull relevant
+                earlier messages into context
+            semantic_cache: Optional SemanticCache for repeated questions
+            on_refined: Optional async callback(room_id, payload) - enables
+                background refinement: the primary answer is returned right
+                away, the revised answer is pushed through this callback
+            session_factory: DB sessions for background work (the request
+                session is closed by then)
+            write_behind: Optional WriteBehindQueue - finished turns are
+                queued and written in batches instead of committed inline
+            indexer: Optional VectorIndexer - new messages are embedded into
+                vector_index in the background (retrieval never indexes)
         """
         self.router = llm_router
         self.db = db_session
-        self.collaborator = AICollaborator(llm_router, db_session)
+        self.on_refined = on_refined
+        self.session_factory = session_factory
+        self.memory = memory
+        self.vector_index = vector_index
+        self.write_behind = write_behind
+        self.indexer = indexer
+        # Streamed text per (author, phase) - recorded as a partial answer if
+        # the orchestration is cancelled (client disconnected)
+        self._partial: Dict[Tuple[str, str], List[str]] = {}
+        self._primary_ai: Optional[str] = None
+        self.collaborator = AICollaborator(
+            llm_router,
+            db_session,
+            on_token=self._track_tokens(on_token) if on_token else None,
+            semantic_cache=semantic_cache,
+            unit_of_work=settings.unit_of_work
+        )
     
     def create_room(
         self,
         title: str,
         user_id: str,
-        active_ais: List[str] = None
+        active_ais: List[str] = None,
+        strategy: str = DEFAULT_STRATEGY
     ) -> Room:
         """Create a new chat room
         
@@ -39,6 +98,7 @@ class RoomManager:
             title: Room title
             user_id: User identifier
             active_ais: List of AI names (default: ['claude', 'gpt'])
+            strategy: Orchestration strategy (see orchestrator/strategies.py)
         
         Returns:
             Room object
@@ -49,7 +109,8 @@ class RoomManager:
         room = Room(
             room_id=str(uuid.uuid4()),
             title=title,
-            user_id=user_id
+            user_id=user_id,
+            strategy=strategy
         )
         room.ai_list = active_ais
         
@@ -72,13 +133,15 @@ class RoomManager:
     def add_user_message(
         self,
         room: Room,
-        content: str
+        content: str,
+        commit: bool = True
     ) -> Message:
         """Add user message to room
         
         Args:
             room: Room object
             content: Message content
+            commit: False = only staged in the session (unit of work)
         
         Returns:
             Message object
@@ -91,13 +154,15 @@ class RoomManager:
             room_id=room.id,
             role='user',
             author='user',
-            content=content
+            content=content,
+            timestamp=datetime.utcnow()  # Sent now, even if committed later
         )
         message.mention_list = mentions
         
         self.db.add(message)
-        self.db.commit()
-        self.db.refresh(message)
+        if commit:
+            self.db.commit()
+            self.db.refresh(message)
         
         return message
     
@@ -107,7 +172,9 @@ class RoomManager:
         ai_name: str,
         content: str,
         mentions: List[str] = None,
-        discussion_id: int = None
+        discussion_id: int = None,
+        discussion: Optional[AIDiscussion] = None,
+        commit: bool = True
     ) -> Message:
         """Add AI message to room
         
@@ -117,6 +184,9 @@ class RoomManager:
             content: Message content
             mentions: List of @mentions
             discussion_id: Associated discussion ID (if any)
+            discussion: Associated discussion, possibly not written yet
+                (its ID is assigned when the session flushes)
+            commit: False = only staged in the session (unit of work)
         
         Returns:
             Message object
@@ -126,13 +196,17 @@ class RoomManager:
             role='assistant',
             author=ai_name,
             content=content,
-            discussion_id=discussion_id
+            discussion_id=discussion_id,
+            timestamp=datetime.utcnow()
         )
         message.mention_list = mentions or []
+        if discussion is not None:
+            message.discussion = discussion
         
         self.db.add(message)
-        self.db.commit()
-        self.db.refresh(message)
+        if commit:
+            self.db.commit()
+            self.db.refresh(message)
         
         return message
     
@@ -156,52 +230,323 @@ class RoomManager:
                 'discussion': AIDiscussion | None
             }
         """
-        # 1. Save user message
-        user_msg = self.add_user_message(room, content)
+        # DB work runs on the DB thread (run_db) - a slow SQLite commit
+        # never blocks other requests or WebSocket streams
+        # Unit of work: the user message, discussion and AI answer are
+        # staged and written in ONE transaction at step 4 (or handed to
+        # the write-behind queue)
+        uow = settings.unit_of_work or self.write_behind is not None
+        
+        # 1. Save user message (staged, or committed first for crash safety)
+        user_msg = await run_db(
+            self.add_user_message,
+            room,
+            content,
+            commit=not uow or settings.unit_of_work_persist_user_first
+        )
+        
+        # Catch the vector index up in the background (old rooms: backfill)
+        self._schedule_indexing(room)
         
         # 2. Get conversation context (comme ton MCP!)
-        # FREEMIUM: 50 messages | PRO: 999999 (illimité)
+        # Bounded DB read - the collaborator then trims each call to the
+        # deployment's token budget (newest turns that fit)
         # TODO: Check if user is PRO tier
-        context_limit = 999999  # Unlimited for now (PRO-like behavior)
-        context = self.get_conversation_context(room, limit=context_limit)
-        
-        # 3. Orchestrate AI collaboration
-        result = await self.collaborator.process_user_message(
-            room=room,
-            user_message=content,
-            context=context
+        context = await run_db(
+            self.get_conversation_context,
+            room,
+            limit=settings.context_max_messages,
+            query=content
         )
         
-        # 4. Save AI response
-        ai_msg = self.add_ai_message(
+        self._partial = {}
+        self._primary_ai = None
+        try:
+            # 3. Background refinement: answer with the primary AI now,
+            #    review/discussion continue after the response is sent
+            target_ais = self.collaborator.select_target_ais(room, content)
+            self._primary_ai = target_ais[0] if target_ais else None
+            if self._refine_in_background(room, target_ais):
+                return await self._answer_then_refine(room, user_msg, target_ais, content, context)
+            
+            # 3. Orchestrate AI collaboration
+            result = await self.collaborator.process_user_message(
+                room=room,
+                user_message=content,
+                context=context
+            )
+        except (asyncio.CancelledError, DeadlineExceeded):
+            await run_db(self._record_partial, room)
+            raise
+        except Exception:
+            await run_db(self.db.commit)  # Keep the staged user message
+            raise
+        
+        # 4. Save AI response (unit of work: single commit for the whole turn)
+        ai_msg = await run_db(
+            self.add_ai_message,
             room=room,
             ai_name=result['author'],
             content=result['response'],
             mentions=result.get('mentions', []),
-            discussion_id=result.get('discussion_id')
+            discussion_id=result.get('discussion_id'),
+            discussion=result.get('discussion'),
+            commit=not uow
         )
+        if self.write_behind is not None:
+            self._queue_turn(user_msg, ai_msg, result.get('discussion'))
+        elif uow:
+            await run_db(self.db.commit)
         
         # 5. Get discussion if exists
-        discussion = None
-        if result.get('discussion_id'):
-            discussion = self.db.query(AIDiscussion).get(result['discussion_id'])
+        discussion = result.get('discussion')
+        if discussion is None and result.get('discussion_id'):
+            discussion = await run_db(self.db.get, AIDiscussion, result['discussion_id'])
+        
+        # 6. Fold older turns into the room summary, index the new turn (background)
+        if self.memory:
+            self.memory.maybe_schedule(room.id, await run_db(self._count_unsummarized, room))
+        self._schedule_indexing(room)
         
         return {
             'user_message': user_msg,
             'ai_message': ai_msg,
-            'discussion': discussion
+            'discussion': discussion,
+            'refinement': None
         }
     
+    def _schedule_indexing(self, room: Room) -> None:
+        if self.indexer is not None:
+            self.indexer.schedule(room.id, room.room_id)
+    
+    def _queue_turn(
+        self,
+        user_msg: Message,
+        ai_msg: Message,
+        discussion: Optional[AIDiscussion]
+    ) -> None:
+        """Move the staged turn from the session to the write-behind queue
+        
+        Only rows still pending in the session move (SessionLocal doesn't
+        autoflush); a user message committed first stays as is.
+        """
+        staged = [obj for obj in (discussion, user_msg, ai_msg) if obj is not None and obj in self.db.new]
+        for obj in staged:
+            self.db.expunge(obj)
+        self.write_behind.add_turn(
+            [m for m in (user_msg, ai_msg) if m in staged],
+            discussion if discussion in staged else None
+        )
+    
+    def _track_tokens(
+        self,
+        on_token: Callable[[str, str, str], Awaitable[None]]
+    ) -> Callable[[str, str, str], Awaitable[None]]:
+        """Wrap on_token to keep the text streamed so far per author and phase"""
+        async def track(author: str, phase: str, delta: str) -> None:
+            self._partial.setdefault((author, phase), []).append(delta)
+            await on_token(author, phase, delta)
+        return track
+    
+    def _partial_answer(self) -> Optional[Tuple[str, str]]:
+        """Best answer streamed so far: consensus text, else primary AI's draft
+        
+        Reviews and discussion turns are never used (they aren't answers
+        to the user), and phases are never concatenated.
+        
+        Returns:
+            (author, text), or None if no answer was streamed
+        """
+        def text(key: Tuple[str, str]) -> str:
+            return "".join(self._partial[key]).strip()
+        
+        consensus = [key for key in self._partial if key[1] == 'consensus' and text(key)]
+        if consensus:
+            return consensus[-1][0], text(consensus[-1])
+        primary = (self._primary_ai, 'draft')
+        if primary in self._partial and text(primary):
+            return self._primary_ai, text(primary)
+        drafts = [key for key in self._partial if key[1] == 'draft' and text(key)]
+        if drafts:
+            longest = max(drafts, key=lambda key: len(text(key)))
+            return longest[0], text(longest)
+        return None
+    
+    def _record_partial(self, room: Room) -> Optional[Message]:
+        """Save the answer streamed before cancellation (see _partial_answer)
+        
+        Also commits what the unit of work staged so far (user message,
+        discussion).
+        """
+        message = None
+        partial = self._partial_answer()
+        if partial:
+            author, content = partial
+            print(f"🔌 Room {room.room_id}: orchestration cancelled - partial answer from {author} recorded")
+            message = self.add_ai_message(room=room, ai_name=author, content=content + PARTIAL_SUFFIX, commit=False)
+        self.db.commit()
+        return message
+    
+    def _refine_in_background(self, room: Room, target_ais: List[str]) -> bool:
+        """Background refinement applies to multi-AI answers of consensus rooms"""
+        return (
+            self.on_refined is not None
+            and settings.background_refinement
+            and len(target_ais) > 1
+            and (getattr(room, 'strategy', None) or DEFAULT_STRATEGY) == DEFAULT_STRATEGY
+        )
+    
+    async def _answer_then_refine(
+        self,
+        room: Room,
+        user_msg: Message,
+        target_ais: List[str],
+        content: str,
+        context: List[Dict]
+    ) -> Dict:
+        """Persist + return the primary answer, refine it in a background task"""
+        primary = await self.collaborator.primary_answer(
+            room=room,
+            target_ais=target_ais,
+            user_message=content,
+            context=context
+        )
+        primary_response = primary['response']
+        # Commits the staged user message too (unit of work)
+        ai_msg = await run_db(
+            self.add_ai_message,
+            room=room,
+            ai_name=primary['author'],
+            content=primary_response,
+            mentions=primary.get('mentions', ['@user'])
+        )
+        
+        task = asyncio.create_task(self._refine(
+            room_pk=room.id,
+            room_key=room.room_id,
+            target_ais=target_ais,
+            content=content,
+            context=context,
+            primary_message_id=ai_msg.id,
+            primary_response=primary_response
+        ))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        
+        if self.memory:
+            self.memory.maybe_schedule(room.id, await run_db(self._count_unsummarized, room))
+        
+        return {
+            'user_message': user_msg,
+            'ai_message': ai_msg,
+            'discussion': None,
+            'refinement': task
+        }
+    
+    async def _refine(
+        self,
+        room_pk: int,
+        room_key: str,
+        target_ais: List[str],
+        content: str,
+        context: List[Dict],
+        primary_message_id: int,
+        primary_response: str
+    ) -> Optional[Message]:
+        """Review / discuss the primary answer, push the outcome to the room
+        
+        Returns:
+            The revised message, or None if the reviewers agreed
+        """
+        db = self.session_factory()
+        try:
+            room = await run_db(db.get, Room, room_pk)
+            collaborator = AICollaborator(self.router, db, unit_of_work=settings.unit_of_work)
+            # The user already has an answer - the /chat deadline no longer applies
+            with deadline_scope(None):
+                result = await collaborator.refine(
+                    room=room,
+                    target_ais=target_ais,
+                    user_message=content,
+                    context=context,
+                    primary_response=primary_response
+                )
+            
+            if not result.get('discussion_id') and result.get('discussion') is None:
+                # Reviewers agreed - the answer already sent stands
+                await self.on_refined(room_key, {
+                    "status": "confirmed",
+                    "message_id": primary_message_id
+                })
+                return None
+            
+            revised = Message(
+                room_id=room_pk,
+                role='assistant',
+                author=result['author'],
+                content=result['response'],
+                discussion_id=result['discussion_id'],
+                timestamp=datetime.utcnow()
+            )
+            revised.mention_list = result.get('mentions', [])
+            discussion = result.get('discussion')
+            if discussion is not None:
+                revised.discussion = discussion
+            
+            # One commit: discussion (if staged) + revised answer, and the
+            # primary answer marked as replaced (left out of later contexts)
+            def save() -> AIDiscussion:
+                db.add(revised)
+                db.flush()
+                primary = db.get(Message, primary_message_id)
+                if primary is not None:
+                    primary.superseded_by_id = revised.id
+                db.commit()
+                db.refresh(revised)
+                return discussion or db.get(AIDiscussion, result['discussion_id'])
+            
+            discussion = await run_db(save)
+            await self.on_refined(room_key, {
+                "status": "revised",
+                "replaces_message_id": primary_message_id,
+                "ai_message": {
+                    "role": revised.role,
+                    "author": revised.author,
+                    "content": revised.content,
+                    "mentions": revised.mention_list,
+                    "timestamp": revised.timestamp.isoformat()
+                },
+                "discussion": {
+                    "id": discussion.id,
+                    "participants": discussion.participant_list,
+                    "topic": discussion.topic,
+                    "messages": discussion.message_list,
+                    "consensus": discussion.consensus,
+                    "status": discussion.status
+                }
+            })
+            print(f"✨ Room {room_key}: refined answer pushed")
+            return revised
+        except Exception as e:
+            await run_db(db.rollback)
+            print(f"❌ Background refinement failed for room {room_key}: {e}")
+            return None
+        finally:
+            await run_db(db.close)
+    
     def get_conversation_context(
         self,
         room: Room,
-        limit: int = 50
+        limit: int = 50,
+        query: Optional[str] = None
     ) -> List[Dict]:
         """Get recent conversation history for context
         
         Args:
             room: Room object
             limit: Max number of messages (50=freemium, 999999=PRO unlimited)
+            query: Current question - with a vector index, earlier messages
+                relevant to it are added (leading system message)
         
         Returns:
             List of message dicts in OpenAI format
@@ -210,24 +555,85 @@ class RoomManager:
             Équivalent à ton système MCP shared-context!
             - FREEMIUM: 50 messages (puis oublie les anciens)
             - PRO: 999999 = pratiquement illimité (comme ton MCP)
+            
+            With memory enabled, turns already folded into the room
+            summary are replaced by the summary (leading system message).
+            Older messages relevant to the question are retrieved from
+            the vector index, so they survive summarization and the
+            recent-turns window.
         """
-        messages = self.db.query(Message).filter(
-            Message.room_id == room.id
-        ).order_by(Message.timestamp.desc()).limit(limit).all()
+        summary = self._get_summary(room)
+        
+        recent = self.db.query(Message).filter(
+            Message.room_id == room.id,
+            Message.superseded_by_id.is_(None)
+        )
+        if summary is not None:
+            recent = recent.filter(Message.id > summary.covered_until_id)
+        messages = recent.order_by(Message.id.desc()).limit(limit).all()
         
         # Reverse to get chronological order
         messages = list(reversed(messages))
         
+        # Not yet written turns (write-behind overlay) are the newest
+        if self.write_behind is not None:
+            messages = (messages + self.write_behind.pending_messages(room.id))[-limit:]
+        
         # Convert to OpenAI format
-        context = []
-        for msg in messages:
-            context.append({
-                'role': msg.role,
-                'content': msg.content
-            })
+        context = ConversationMemory.build_context(summary, messages)
+        
+        if self.vector_index is not None and query:
+            relevant = self._retrieve_relevant(room, query, exclude={m.id for m in messages})
+            if relevant:
+                lines = "\n".join(f"{m.author}: {m.content}" for m in relevant)
+                position = 1 if summary is not None else 0
+                context.insert(position, {
+                    'role': 'system',
+                    'content': RELEVANT_PREFIX + lines
+                })
         
         return context
     
+    def _retrieve_relevant(self, room: Room, query: str, exclude: set) -> List[Message]:
+        """Earlier messages most similar to the query (chronological order)
+        
+        Only searches what VectorIndexer already indexed - embedding is
+        never done here (this runs on the DB thread).
+        """
+        try:
+            hits = self.vector_index.search(
+                room.room_id,
+                embed_text(query, self.vector_index.dim),
+                k=settings.retrieval_top_k,
+                exclude=exclude
+            )[0]
+        except Exception as e:
+            print(f"⚠️ Vector retrieval failed for room {room.room_id}: {e}")
+            return []
+        
+        ids = [message_id for message_id, score in hits if score >= settings.retrieval_min_score]
+        if not ids:
+            return []
+        return self.db.query(Message).filter(
+            Message.id.in_(ids),
+            Message.superseded_by_id.is_(None)
+        ).order_by(Message.id).all()
+    
+    def _get_summary(self, room: Room) -> Optional[RoomSummary]:
+        """Stored rolling summary (None when memory is off or not built yet)"""
+        if self.memory is None or not self.memory.enabled:
+            return None
+        return self.db.query(RoomSummary).filter(RoomSummary.room_id == room.id).first()
+    
+    def _count_unsummarized(self, room: Room) -> int:
+        """Messages newer than the room summary"""
+        summary = self._get_summary(room)
+        query = self.db.query(Message).filter(Message.room_id == room.id)
+        if summary is not None:
+            query = query.filter(Message.id > summary.covered_until_id)
+        pending = len(self.write_behind.pending_messages(room.id)) if self.write_behind else 0
+        return query.count() + pending
+    
     def get_messages(
         self,
         room: Room,
@@ -242,9 +648,13 @@ class RoomManager:
         Returns:
             List of Message objects
         """
-        return self.db.query(Message).filter(
-            Message.room_id == room.id
+        messages = self.db.query(Message).filter(
+            Message.room_id == room.id,
+            Message.superseded_by_id.is_(None)
         ).order_by(Message.timestamp).limit(limit).all()
+        if self.write_behind is not None:
+            messages = (messages + self.write_behind.pending_messages(room.id))[:limit]
+        return messages
     
     def get_discussions(
         self,
@@ -258,9 +668,12 @@ class RoomManager:
         Returns:
             List of AIDiscussion objects
         """
-        return self.db.query(AIDiscussion).filter(
+        discussions = self.db.query(AIDiscussion).filter(
             AIDiscussion.room_id == room.id
         ).order_by(AIDiscussion.created_at.desc()).all()
+        if self.write_behind is not None:
+            discussions = list(reversed(self.write_behind.pending_discussions(room.id))) + discussions
+        return discussions
     
     def update_room_ais(
         self,
@@ -281,3 +694,25 @@ class RoomManager:
         self.db.commit()
         self.db.refresh(room)
         return room
+    
+    def update_room_strategy(
+        self,
+        room: Room,
+        strategy: str
+    ) -> Room:
+        """Change a room's orchestration strategy
+        
+        Args:
+            room: Room object
+            strategy: Strategy name (single, vote, quorum, debate, ...)
+        
+        Returns:
+            Updated Room object
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}. Allowed: {sorted(STRATEGIES)}")
+        room.strategy = strategy
+        room.updated_at = datetime.utcnow()
+        self.db.commit()
+        self.db.refresh(room)
+        return room
@@ -0,0 +1,203 @@
+"""Conversation Memory - Rolling summary of long rooms
+
+Once a room has more than `memory_summary_threshold` unsummarized
+messages, a background task folds everything but the newest
+`memory_recent_turns` into a stored summary. Context sent to the AIs is
+then summary + recent turns, so prompt size stays roughly constant as
+the room grows instead of increasing with every message.
+
+Messages are folded in chunks of at most `memory_chunk_tokens` (the first
+summary of a large existing room never goes out as one huge prompt). If no
+real provider answers, the summary is left as it was.
+"""
+import asyncio
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.room import Message, RoomSummary, SessionLocal, run_db
+from providers.deadline import deadline_scope
+from providers.mock_llm import is_unavailable_response
+from room.context_builder import estimate_tokens
+
+SUMMARY_PREFIX = "Résumé de la conversation précédente:\n"
+
+SUMMARIZER_PROMPT = (
+    "You maintain the memory of a group chat between a user and several AIs. "
+    "Update the summary with the new messages. Keep facts, decisions, open "
+    "questions and user preferences; drop small talk. Answer with the updated "
+    "summary only."
+)
+
+
+class ConversationMemory:
+    """Rolling summary memory (one background summarization per room at a time)"""
+
+    def __init__(
+        self,
+        llm_router,
+        session_factory: Callable[[], Session] = SessionLocal,
+        threshold: int = settings.memory_summary_threshold,
+        recent_turns: int = settings.memory_recent_turns,
+        enabled: bool = settings.memory_enabled,
+        chunk_tokens: int = settings.memory_chunk_tokens,
+        max_tokens: int = settings.memory_summary_max_tokens
+    ):
+        """
+        Args:
+            llm_router: LLM router used for summarization
+            session_factory: Creates a DB session for background tasks
+                (the request's session may be closed by then)
+            threshold: Unsummarized messages before a summary is triggered
+            recent_turns: Newest messages always kept verbatim
+            enabled: Turn summarization off (context = raw messages)
+            chunk_tokens: Max transcript tokens folded per summarizer call
+            max_tokens: Reply cap for each summarizer call (the router's
+                chat default is too short for a running summary)
+        """
+        self.router = llm_router
+        self.session_factory = session_factory
+        self.threshold = threshold
+        self.recent_turns = recent_turns
+        self.enabled = enabled
+        self.chunk_tokens = chunk_tokens
+        self.max_tokens = max_tokens
+        self._running: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def maybe_schedule(self, room_pk: int, unsummarized: int) -> Optional[asyncio.Task]:
+        """Start a background summary if the room passed the threshold
+
+        Args:
+            room_pk: Room primary key (rooms.id)
+            unsummarized: Messages newer than the current summary
+
+        Returns:
+            The background task, or None if nothing to do
+        """
+        if not self.enabled or unsummarized <= self.threshold or room_pk in self._running:
+            return None
+
+        self._running.add(room_pk)
+        task = asyncio.create_task(self.summarize_room(room_pk))
+        # SAFEGUARD: keep a reference so the task isn't garbage collected mid-run
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def summarize_room(self, room_pk: int) -> Optional[RoomSummary]:
+        """Fold older messages into the room summary
+
+        Runs without a deadline: a task created during /chat would otherwise
+        inherit the request's remaining budget (ContextVar copy).
+
+        Returns:
+            Updated summary, or None if nothing was summarized
+        """
+        with deadline_scope(None):
+            return await self._summarize_room(room_pk)
+
+    async def _summarize_room(self, room_pk: int) -> Optional[RoomSummary]:
+        self._running.add(room_pk)
+        db = self.session_factory()
+
+        def load() -> Tuple[Optional[RoomSummary], List[Message]]:
+            summary = db.query(RoomSummary).filter(RoomSummary.room_id == room_pk).first()
+            covered_until = summary.covered_until_id if summary else 0
+            pending = db.query(Message).filter(
+                Message.room_id == room_pk,
+                Message.id > covered_until,
+                Message.superseded_by_id.is_(None)  # Replaced by a refined answer
+            ).order_by(Message.id).all()
+            return summary, pending
+
+        try:
+            summary, pending = await run_db(load)
+
+            to_fold = pending[:-self.recent_turns] if self.recent_turns else pending
+            if not to_fold:
+                return None
+
+            text = summary.summary if summary else ""
+            folded: List[Message] = []
+            for chunk in self._chunks(to_fold):
+                updated = await self.router.chat(
+                    messages=self._build_summary_prompt(text, chunk),
+                    stream=False,
+                    max_tokens=self.max_tokens
+                )
+                # SAFEGUARD: no real provider answered - never store the
+                # fallback text as memory (keep what was folded so far)
+                if not updated or is_unavailable_response(updated):
+                    print(f"⚠️ Room {room_pk}: no AI available for summarization")
+                    break
+                text = updated
+                folded.extend(chunk)
+            if not folded:
+                return None
+
+            if summary is None:
+                summary = RoomSummary(room_id=room_pk, summary=text, covered_count=0)
+                db.add(summary)
+            summary.summary = text
+            summary.covered_until_id = folded[-1].id
+            summary.covered_count = (summary.covered_count or 0) + len(folded)
+            await run_db(db.commit)
+            print(f"🧠 Room {room_pk}: summarized {len(folded)} messages")
+            return summary
+        except Exception as e:
+            await run_db(db.rollback)
+            print(f"⚠️ Room {room_pk}: summarization failed: {e}")
+            return None
+        finally:
+            await run_db(db.close)
+            self._running.discard(room_pk)
+
+    async def wait_idle(self) -> None:
+        """Wait for running summaries (tests, shutdown)"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def _chunks(self, messages: List[Message]) -> List[List[Message]]:
+        """Split messages into transcripts of at most chunk_tokens (oldest first)"""
+        chunks: List[List[Message]] = []
+        current: List[Message] = []
+        tokens = 0
+        for msg in messages:
+            size = estimate_tokens(f"{msg.author}: {msg.content}")
+            if current and tokens + size > self.chunk_tokens:
+                chunks.append(current)
+                current, tokens = [], 0
+            current.append(msg)  # A single oversized message gets its own chunk
+            tokens += size
+        if current:
+            chunks.append(current)
+        return chunks
+
+    @staticmethod
+    def build_context(summary: Optional[RoomSummary], recent: List[Message]) -> List[Dict]:
+        """Context in OpenAI format: summary (system message) + recent turns"""
+        context = []
+        if summary is not None and summary.summary:
+            context.append({
+                'role': 'system',
+                'content': SUMMARY_PREFIX + summary.summary
+            })
+        for msg in recent:
+            context.append({
+                'role': msg.role,
+                'content': msg.content
+            })
+        return context
+
+    @staticmethod
+    def _build_summary_prompt(previous: str, messages: List[Message]) -> List[Dict]:
+        transcript = "\n".join(f"{m.author}: {m.content}" for m in messages)
+        return [
+            {'role': 'system', 'content': SUMMARIZER_PROMPT},
+            {
+                'role': 'user',
+                'content': f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"
+            }
+        ]
@@ -0,0 +1,319 @@
+"""Vector Index - In-process, memory-mapped vector store per room
+
+Replaces an external vector DB for retrieval-augmented context:
+- One directory per room (or tenant) holding append-only segments:
+  seg-NNNNNN.vec (float32 rows) + seg-NNNNNN.ids (int64 message ids)
+- Segments are memory-mapped, so large rooms are paged by the OS
+  instead of loaded into Python objects
+- Search is one batched matrix product per segment (cosine = dot
+  product on normalized vectors) + argpartition top-k
+- Small tail segments and removed ids are periodically compacted into
+  one contiguous segment
+"""
+import os
+import re
+import shutil
+from pathlib import Path
+from threading import RLock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from config import settings
+
+_SAFE_KEY_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class _Segment:
+    """One append-only segment (vectors + ids files)"""
+
+    def __init__(self, vec_path: Path, ids_path: Path, dim: int):
+        self.vec_path = vec_path
+        self.ids_path = ids_path
+        self.dim = dim
+        self._mapped_rows = -1
+        self._vectors: Optional[np.ndarray] = None
+        self._ids: Optional[np.ndarray] = None
+
+    @property
+    def rows(self) -> int:
+        """Complete rows on disk (a crash mid-append leaves a partial tail)"""
+        if not self.vec_path.exists() or not self.ids_path.exists():
+            return 0
+        vec_rows = self.vec_path.stat().st_size // (self.dim * 4)
+        id_rows = self.ids_path.stat().st_size // 8
+        return min(vec_rows, id_rows)
+
+    def append(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        with open(self.vec_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self.ids_path, "ab") as f:
+            f.write(np.ascontiguousarray(ids, dtype=np.int64).tobytes())
+
+    def load(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Memory-mapped (vectors, ids), remapped only when the segment grew"""
+        rows = self.rows
+        if rows != self._mapped_rows:
+            if rows == 0:
+                self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+                self._ids = np.zeros(0, dtype=np.int64)
+            else:
+                self._vectors = np.memmap(self.vec_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+                self._ids = np.memmap(self.ids_path, dtype=np.int64, mode="r", shape=(rows,))
+            self._mapped_rows = rows
+        return self._vectors, self._ids
+
+    def release(self) -> None:
+        """Drop memory maps (before files are replaced or deleted)"""
+        self._vectors = None
+        self._ids = None
+        self._mapped_rows = -1
+
+
+class RoomVectorStore:
+    """Segments of one room / tenant"""
+
+    def __init__(self, directory: Path, dim: int, segment_rows: int, max_segments: int):
+        """
+        Args:
+            directory: Storage directory of this room
+            dim: Vector size
+            segment_rows: Rows per append segment before a new one starts
+            max_segments: Segment count that triggers compaction
+        """
+        self.directory = directory
+        self.dim = dim
+        self.segment_rows = segment_rows
+        self.max_segments = max_segments
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = RLock()
+        self._segments: List[_Segment] = [
+            self._segment(int(p.stem.split("-")[1]))
+            for p in sorted(self.directory.glob("seg-*.vec"))
+        ]
+        self._removed: Set[int] = self._load_removed()
+        self._max_id = -1
+        for segment in self._segments:
+            _, ids = segment.load()
+            if len(ids):
+                self._max_id = max(self._max_id, int(ids.max()))
+
+    @property
+    def count(self) -> int:
+        """Live vectors (removed ids excluded)"""
+        with self._lock:
+            return sum(s.rows for s in self._segments) - len(self._removed)
+
+    @property
+    def max_id(self) -> int:
+        """Highest id ever added (-1 if empty) - for incremental indexing"""
+        return self._max_id
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray) -> None:
+        """Append vectors (rows must be L2-normalized)"""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if not len(ids):
+            return
+        with self._lock:
+            start = 0
+            while start < len(ids):
+                tail = self._segments[-1] if self._segments else None
+                if tail is None or tail.rows >= self.segment_rows:
+                    tail = self._segment(self._next_segment_number())
+                    self._segments.append(tail)
+                room = self.segment_rows - tail.rows
+                end = start + room
+                tail.append(ids[start:end], vectors[start:end])
+                start = end
+            self._max_id = max(self._max_id, int(ids.max()))
+
+            if len(self._segments) > self.max_segments:
+                self.compact()
+
+    def remove(self, ids: Iterable[int]) -> None:
+        """Mark ids as removed (purged on next compaction)"""
+        with self._lock:
+            self._removed.update(int(i) for i in ids)
+            self._save_removed()
+            # Mostly dead rows → rewrite (keeps scans and disk proportional to live data)
+            if len(self._removed) * 2 > sum(s.rows for s in self._segments):
+                self.compact()
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        exclude: Optional[Iterable[int]] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """Batched cosine top-k
+
+        Args:
+            queries: Normalized query vectors, shape (q, dim) or (dim,)
+            k: Results per query
+            exclude: Ids to skip (e.g. messages already in context)
+
+        Returns:
+            Per query: [(id, score)] sorted by decreasing score
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        skipped = self._removed | set(int(i) for i in (exclude or ()))
+        # Over-fetch by the skip count and filter afterwards (cheaper than
+        # masking every row of a 100k-row segment)
+        fetch = k + len(skipped)
+
+        candidate_ids: List[np.ndarray] = []
+        candidate_scores: List[np.ndarray] = []
+        with self._lock:
+            for segment in self._segments:
+                vectors, ids = segment.load()
+                if not len(ids):
+                    continue
+                scores = vectors @ queries.T  # (rows, q)
+                if fetch < len(ids):
+                    index = np.argpartition(-scores, fetch - 1, axis=0)[:fetch]  # (fetch, q)
+                    candidate_ids.append(np.asarray(ids)[index])
+                    candidate_scores.append(np.take_along_axis(scores, index, axis=0))
+                else:
+                    candidate_ids.append(np.repeat(np.asarray(ids)[:, None], len(queries), axis=1))
+                    candidate_scores.append(scores)
+
+        if not candidate_ids:
+            return [[] for _ in range(len(queries))]
+
+        all_ids = np.concatenate(candidate_ids)
+        all_scores = np.concatenate(candidate_scores)
+        results = []
+        for q in range(len(queries)):
+            hits = []
+            for i in np.argsort(-all_scores[:, q]):
+                message_id = int(all_ids[i, q])
+                if message_id in skipped:
+                    continue
+                hits.append((message_id, float(all_scores[i, q])))
+                if len(hits) == k:
+                    break
+            results.append(hits)
+        return results
+
+    def compact(self) -> None:
+        """Merge all segments into one contiguous segment, dropping removed ids"""
+        with self._lock:
+            if len(self._segments) <= 1 and not self._removed:
+                return
+
+            parts_vec = []
+            parts_ids = []
+            for segment in self._segments:
+                vectors, ids = segment.load()
+                if self._removed:
+                    keep = ~np.isin(ids, np.fromiter(self._removed, dtype=np.int64))
+                    vectors, ids = vectors[keep], ids[keep]
+                parts_vec.append(np.array(vectors))
+                parts_ids.append(np.array(ids))
+
+            merged = self._segment(self._next_segment_number())
+            tmp_vec = merged.vec_path.with_suffix(".vec.tmp")
+            tmp_ids = merged.ids_path.with_suffix(".ids.tmp")
+            np.concatenate(parts_vec or [np.zeros((0, self.dim), np.float32)]).astype(np.float32).tofile(tmp_vec)
+            np.concatenate(parts_ids or [np.zeros(0, np.int64)]).astype(np.int64).tofile(tmp_ids)
+            # SAFEGUARD: ids first, vectors last - a segment only "exists" once its .vec is in place
+            os.replace(tmp_ids, merged.ids_path)
+            os.replace(tmp_vec, merged.vec_path)
+
+            for segment in self._segments:
+                segment.release()
+                segment.vec_path.unlink(missing_ok=True)
+                segment.ids_path.unlink(missing_ok=True)
+
+            self._segments = [merged]
+            self._removed.clear()
+            self._save_removed()
+
+    def _segment(self, number: int) -> _Segment:
+        return _Segment(
+            self.directory / f"seg-{number:06d}.vec",
+            self.directory / f"seg-{number:06d}.ids",
+            self.dim
+        )
+
+    def _next_segment_number(self) -> int:
+        if not self._segments:
+            return 1
+        return int(self._segments[-1].vec_path.stem.split("-")[1]) + 1
+
+    def _load_removed(self) -> Set[int]:
+        path = self.directory / "removed.ids"
+        if not path.exists():
+            return set()
+        return set(np.fromfile(path, dtype=np.int64).tolist())
+
+    def _save_removed(self) -> None:
+        path = self.directory / "removed.ids"
+        np.fromiter(self._removed, dtype=np.int64).tofile(path)
+
+
+class VectorIndex:
+    """Vector stores keyed by room / tenant"""
+
+    def __init__(
+        self,
+        root: str = settings.vector_index_path,
+        dim: int = settings.embedding_dim,
+        segment_rows: int = settings.vector_index_segment_rows,
+        max_segments: int = settings.vector_index_max_segments
+    ):
+        """
+        Args:
+            root: Base directory (one subdirectory per key)
+            dim: Vector size
+            segment_rows: Rows per append segment
+            max_segments: Segments per key before compaction
+        """
+        self.root = Path(root)
+        self.dim = dim
+        self.segment_rows = segment_rows
+        self.max_segments = max_segments
+        self._stores: Dict[str, RoomVectorStore] = {}
+        self._lock = RLock()
+
+    def store(self, key: str) -> RoomVectorStore:
+        """Store of one room / tenant (created on first use)"""
+        with self._lock:
+            store = self._stores.get(key)
+            if store is None:
+                store = RoomVectorStore(
+                    self.root / _SAFE_KEY_RE.sub("_", key),
+                    self.dim,
+                    self.segment_rows,
+                    self.max_segments
+                )
+                self._stores[key] = store
+            return store
+
+    def add(self, key: str, ids: Iterable[int], vectors: np.ndarray) -> None:
+        self.store(key).add(ids, vectors)
+
+    def search(
+        self,
+        key: str,
+        queries: np.ndarray,
+        k: int = 5,
+        exclude: Optional[Iterable[int]] = None
+    ) -> List[List[Tuple[int, float]]]:
+        return self.store(key).search(queries, k=k, exclude=exclude)
+
+    def drop(self, key: str) -> None:
+        """Delete all vectors of a room / tenant"""
+        with self._lock:
+            store = self._stores.pop(key, None)
+            directory = store.directory if store else self.root / _SAFE_KEY_RE.sub("_", key)
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def stats(self) -> Dict:
+        """Index stats for /health"""
+        with self._lock:
+            return {
+                "stores": len(self._stores),
+                "vectors": sum(s.count for s in self._stores.values())
+            }
@@ -0,0 +1,202 @@
+"""Write-Behind Queue - Batched persistence of messages and discussions
+
+High-traffic rooms turn every user message into its own SQLite
+transaction. With write-behind, a finished turn (user message, private
+discussion, AI answer) is queued in memory and the request returns; a
+background task writes queued turns every flush_interval_ms, or as soon as
+max_rows are waiting, as a few multi-row INSERTs in ONE transaction.
+
+Reads stay consistent through an overlay: RoomManager merges the room's
+pending messages into contexts and message lists until they are written.
+Rows are written and removed from the overlay on the DB thread (run_db),
+where reads also run, so a reader never sees a row twice or not at all.
+
+Queued rows get their IDs when their batch is written.
+"""
+import asyncio
+from threading import Lock
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+
+from config import settings
+from models.room import AIDiscussion, DiscussionTurn, Message, SessionLocal, run_db
+from providers.deadline import deadline_scope
+
+
+class WriteBehindQueue:
+    """In-process write-behind buffer for Message / AIDiscussion rows"""
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        flush_interval_ms: int = settings.write_behind_flush_ms,
+        max_rows: int = settings.write_behind_max_rows
+    ):
+        """
+        Args:
+            session_factory: Creates the session batches are written with
+            flush_interval_ms: Max time a row waits before being written
+            max_rows: Pending rows that trigger an immediate write
+        """
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+
+        self._lock = Lock()  # Overlay is read on the DB thread
+        self._messages: List[Message] = []
+        self._discussions: List[AIDiscussion] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.batches = 0
+        self.rows_written = 0
+        self.failures = 0
+
+    def add_turn(self, messages: List[Message], discussion: Optional[AIDiscussion] = None) -> None:
+        """Queue transient rows (not attached to any session)
+
+        Messages linked to the discussion (message.discussion) get its ID
+        when the batch is written.
+        """
+        with self._lock:
+            if discussion is not None:
+                self._discussions.append(discussion)
+            self._messages.extend(messages)
+            pending = len(self._messages) + len(self._discussions)
+        self._ensure_running()
+        if pending >= self.max_rows:
+            self._wake.set()
+
+    def pending_messages(self, room_pk: int) -> List[Message]:
+        """Room's queued messages, oldest first (read overlay)"""
+        with self._lock:
+            return [m for m in self._messages if m.room_id == room_pk]
+
+    def pending_discussions(self, room_pk: int) -> List[AIDiscussion]:
+        """Room's queued discussions, oldest first (read overlay)"""
+        with self._lock:
+            return [d for d in self._discussions if d.room_id == room_pk]
+
+    async def flush(self) -> int:
+        """Write everything queued now
+
+        Returns:
+            Rows written
+        """
+        return await run_db(self._write_batch)
+
+    async def close(self) -> None:
+        """Stop the background task after a final flush (shutdown)"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict:
+        """Queue stats for /health"""
+        with self._lock:
+            pending = len(self._messages) + len(self._discussions)
+        return {
+            "pending_rows": pending,
+            "batches": self.batches,
+            "rows_written": self.rows_written,
+            "rows_per_batch": round(self.rows_written / self.batches, 1) if self.batches else 0.0,
+            "failures": self.failures
+        }
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            # Started from a request: don't carry its deadline into the loop
+            with deadline_scope(None):
+                self._task = asyncio.create_task(self._drain_loop())
+
+    async def _drain_loop(self) -> None:
+        """Write batches every flush_interval (or earlier when max_rows wait)"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # SAFEGUARD: rows stay queued (and visible) - retried next tick
+                self.failures += 1
+                print(f"⚠️ Write-behind flush failed: {e}")
+
+    def _write_batch(self) -> int:
+        """One transaction: discussions + turns, then messages (runs on the DB thread)"""
+        with self._lock:
+            discussions = list(self._discussions)
+            messages = list(self._messages)
+        if not discussions and not messages:
+            return 0
+
+        db = self.session_factory()
+        try:
+            if discussions:
+                ids = db.execute(
+                    insert(AIDiscussion).returning(AIDiscussion.id, sort_by_parameter_order=True),
+                    [_row(d) for d in discussions]
+                ).scalars().all()
+                for discussion, new_id in zip(discussions, ids):
+                    discussion.id = new_id
+                turns = [
+                    {**_row(turn), 'discussion_id': discussion.id}
+                    for discussion in discussions for turn in discussion.turns
+                ]
+                if turns:
+                    db.execute(insert(DiscussionTurn), turns)
+
+            for message in messages:
+                if message.discussion is not None:
+                    message.discussion_id = message.discussion.id
+            if messages:
+                ids = db.execute(
+                    insert(Message).returning(Message.id, sort_by_parameter_order=True),
+                    [_row(m) for m in messages]
+                ).scalars().all()
+                for message, new_id in zip(messages, ids):
+                    message.id = new_id
+            db.commit()
+        except Exception:
+            db.rollback()
+            for obj in discussions + messages:
+                obj.id = None
+            raise
+        finally:
+            db.close()
+
+        # Written - drop from the overlay (same thread as readers)
+        with self._lock:
+            written = {id(obj) for obj in discussions + messages}
+            self._discussions = [d for d in self._discussions if id(d) not in written]
+            self._messages = [m for m in self._messages if id(m) not in written]
+        self.batches += 1
+        self.rows_written += len(written)
+        return len(written)
+
+
+def _row(obj) -> Dict:
+    """Column values of a transient ORM object (Python-side defaults applied)"""
+    row = {}
+    for column in obj.__table__.columns:
+        if column.primary_key:
+            continue
+        value = getattr(obj, column.key)
+        if value is None and column.default is not None:
+            value = column.default.arg(None) if column.default.is_callable else column.default.arg
+        row[column.key] = value
+    return row
+
+
+def build_write_behind() -> Optional[WriteBehindQueue]:
+    """Create the write-behind queue (None = disabled, writes are synchronous)"""
+    if not settings.write_behind_enabled:
+        return None
+    return WriteBehindQueue()
@@ -1,15 +1,20 @@
 """Demo endpoints - Persistent anonymous sessions with rate limiting"""
 from fastapi import APIRouter, Request, HTTPException, Depends, Response
 from pydantic import BaseModel, field_validator
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, asc, func
+import re
 import uuid
 from datetime import datetime
 
 # Models
-from models.room import get_db, DemoSession, Room as DBRoom, Message as DBMessage
-from providers.llm_router import LLMRouter
+from models.room import get_db, run_db, DemoSession, Room as DBRoom, Message as DBMessage
+from orchestrator.consensus import StreamingConsensus
+from orchestrator.cancellation import ClientDisconnected, cancel_on_disconnect
+from orchestrator.strategies import Step, StrategyContext, register_strategy, run_strategy
+from providers.deadline import DeadlineExceeded, deadline_scope, near_deadline
+from providers.mock_llm import is_unavailable_response
 from security.input_sanitizer import InputSanitizer
 from security.prompt_filter import PromptSecurityFilter
 
@@ -18,20 +23,180 @@ router = APIRouter(prefix="/demo", tags=["demo"])
 # === SAFEGUARDS: Circuit Breakers === #
 MAX_DISCUSSION_ROUNDS = 3  # Free tier: 3 rounds max (cost control)
 CONSENSUS_KEYWORDS = ["CONSENSUS", "AGREE", "AGREED", "FINAL", "CONCLUDED", "COMPLETE"]
+# Whole uppercase words only: "complete", "finally" or "DISAGREE" are not signals
+CONSENSUS_PATTERNS = [rf"\b{re.escape(keyword)}\b" for keyword in CONSENSUS_KEYWORDS]
+CONSENSUS_RE = re.compile("|".join(CONSENSUS_PATTERNS))
 MAX_CONTEXT_LENGTH = 4000  # Character limit per message (cost control)
-DISCUSSION_TIMEOUT_SECONDS = 60  # Future: Force synthesis after timeout
+DISCUSSION_TIMEOUT_SECONDS = 60  # Deadline for rounds + synthesis (whole message)
+SYNTHESIS_RESERVE_SECONDS = 10  # Less left → stop rounds, force synthesis
 
 def check_consensus(response_text: str) -> bool:
     """
     Check if AI response indicates consensus using multiple keywords
     
     SAFEGUARD: Multiple keywords prevent infinite loops from missed detections
-    Returns True if ANY consensus keyword found (case-insensitive)
+    Returns True if ANY consensus keyword is written as an uppercase word
+    (the AIs are told to say CONSENSUS - prose like "complete" doesn't count)
     """
     if not response_text:
         return False
-    upper_text = response_text.upper()
-    return any(keyword in upper_text for keyword in CONSENSUS_KEYWORDS)
+    return CONSENSUS_RE.search(response_text) is not None
+
+async def stream_turn(
+    llm_router,
+    messages: List[Dict],
+    speaker: str,
+    room_id: str,
+    cut_off: bool = True
+) -> Tuple[str, bool]:
+    """
+    Stream one discussion turn, checking consensus keywords on every delta
+    
+    SAFEGUARD: Once a speaker signals consensus and finishes that sentence,
+    the rest of the turn is cut off (unless it writes "CONSENSUS: <answer>")
+    cut_off=False streams the whole turn (first answer = the payload)
+    Returns (response_text, consensus_signalled)
+    """
+    detector = StreamingConsensus(patterns=CONSENSUS_PATTERNS, case_sensitive=True)
+    # Free tier: any equivalent free deployment may answer (hedged)
+    stream = llm_router.stream_chat(
+        messages=messages,
+        preferred_provider=speaker,
+        hedge=True,
+        room_id=room_id
+    )
+    try:
+        async for delta in stream:
+            if detector.feed(delta) and cut_off:
+                break
+    except DeadlineExceeded:
+        if not detector.text:
+            raise
+        print(f"⏱️ Discussion timeout - keeping {speaker}'s partial turn")
+    finally:
+        await stream.aclose()  # Cancels the upstream call when cut off
+    return (detector.final_text if cut_off else detector.text), detector.agreed
+
+@register_strategy("demo", selectable=False)
+def demo_strategy(ctx: StrategyContext) -> List[Step]:
+    """
+    Free-tier discussion: the two demo AIs take turns, then CHIKA synthesizes
+    
+    ctx.options: llm_router, system_prompt, synthesis_ai, and the
+    discussion_log / ai_responses lists filled turn by turn (kept by the
+    route if the visitor leaves mid-discussion)
+    Result: {'response': synthesis or None, 'author': 'CHIKA', ...}
+    """
+    llm_router = ctx.options["llm_router"]
+    system_prompt = ctx.options["system_prompt"]
+    discussion_log = ctx.options["discussion_log"]
+    ai_responses = ctx.options["ai_responses"]
+    first_ai, second_ai = ctx.target_ais[0], ctx.target_ais[1]
+    room_id = ctx.room.room_id
+    
+    async def discuss(_: Dict) -> List[Dict]:
+        """Discussion rounds (cancelled if the visitor leaves)"""
+        
+        # === AUTONOMOUS AI DISCUSSION (Self-regulated) === #
+        
+        max_rounds = MAX_DISCUSSION_ROUNDS  # SAFEGUARD: Hard limit
+        conversation = []
+        current_speaker = first_ai
+        ais_agreed = set()  # Track which AIs have agreed
+        
+        for round_num in range(max_rounds):
+            # SAFEGUARD: timeout near - force synthesis with what we have
+            if round_num > 0 and near_deadline(SYNTHESIS_RESERVE_SECONDS):
+                print(f"⏱️ Discussion timeout near - forcing synthesis after {round_num} rounds")
+                break
+            
+            try:
+                # Let AIs decide autonomously when to stop
+                if round_num == 0:
+                    instruction = "Give your answer. If you want another AI's input, say DISCUSS. If you're confident, say CONSENSUS."
+                else:
+                    instruction = "Read the discussion. Add your perspective, or say CONSENSUS if you agree with current direction."
+                
+                prompt = f"{current_speaker}: {instruction}"
+                
+                # Build message history
+                messages = [{"role": "system", "content": system_prompt}]
+                for entry in conversation:
+                    messages.append({"role": "assistant", "content": f"{entry['ai']}: {entry['msg']}"})
+                messages.append({"role": "user", "content": prompt})
+                
+                # Get AI response (consensus checked while streaming)
+                # SAFEGUARD: the first answer is never cut off - it's what gets synthesized
+                response, agreed = await stream_turn(
+                    llm_router, messages, current_speaker, room_id, cut_off=round_num > 0
+                )
+                
+                # Log discussion
+                discussion_log.append({
+                    "ai": current_speaker,
+                    "msg": response,
+                    "round": round_num + 1
+                })
+                
+                conversation.append({
+                    "ai": current_speaker,
+                    "msg": response
+                })
+                
+                ai_responses.append({
+                    "ai": current_speaker,
+                    "display_name": AI_DISPLAY_NAMES.get(current_speaker, current_speaker),
+                    "content": response
+                })
+                
+                # SAFEGUARD: Check for consensus (multiple keywords)
+                # The second AI agreeing ends the discussion - the first answer
+                # alone is not a consensus (nobody has reviewed it yet)
+                if agreed or check_consensus(response):
+                    ais_agreed.add(current_speaker)
+                    if round_num > 0:
+                        print(f"✅ Consensus reached: {len(ais_agreed)} AIs agreed after {round_num + 1} rounds")
+                        break
+                
+                # Switch speaker
+                current_speaker = second_ai if current_speaker == first_ai else first_ai
+                
+            except Exception as e:
+                print(f"❌ Round {round_num + 1} error: {e}")
+                break
+        
+        # Log discussion outcome
+        print(f"✅ Discussion completed: {len(discussion_log)} messages, {len(ais_agreed)} AIs agreed")
+        return discussion_log
+    
+    async def synthesize(deps: Dict) -> Dict:
+        """SYNTHESIS (Token-efficient) - None if fewer than 2 turns"""
+        log = deps["discussion"]
+        synthesis_response = None
+        if len(log) >= 2:
+            try:
+                # Minimal synthesis prompt - AIs already share context
+                synthesis_response = await llm_router.chat(
+                    messages=[
+                        {"role": "system", "content": f"{system_prompt}\n\nDiscussion:\n" + "\n".join([f"{d['ai']}: {d['msg']}" for d in log])},
+                        {"role": "user", "content": "CHIKA, synthesize final answer (1-2 sentences):"}
+                    ],
+                    preferred_provider=ctx.options["synthesis_ai"],
+                    hedge=True,
+                    room_id=room_id
+                )
+            except Exception as e:
+                print(f"❌ Synthesis: {e}")
+                synthesis_response = None
+        
+        return {
+            'response': synthesis_response,
+            'author': "CHIKA",
+            'discussion_id': None,
+            'mentions': ['@user']
+        }
+    
+    return [Step("discussion", discuss), Step("result", synthesize, ("discussion",))]
 
 # === AI Provider Names (Transparency) === #
 AI_DISPLAY_NAMES = {
@@ -101,7 +266,7 @@ def get_or_create_demo_session(
         room_id=f"demo_{new_session_id[:8]}_{int(datetime.utcnow().timestamp())}",
         title="Demo Chat",
         user_id=f"demo_{new_session_id[:8]}",
-        active_ais='["gpt", "gemini"]'  # Demo uses free/fast AIs
+        active_ais=["gpt", "gemini"]  # Demo uses free/fast AIs
     )
     db.add(room)
     db.flush()  # Get room.id
@@ -140,12 +305,14 @@ async def demo_chat(
     - Session persists across browser restarts (30 days)
     """
     
+    # DB calls run on the DB thread (run_db) - never on the event loop
+    
     # Get or create demo session
-    demo = get_or_create_demo_session(message.session_id, db, request)
+    demo = await run_db(get_or_create_demo_session, message.session_id, db, request)
     
     # SAFEGUARD: Reset query count if it's a new day
     if demo.reset_if_new_day():
-        db.commit()
+        await run_db(db.commit)
         print(f"✅ Daily reset for session {demo.session_id[:8]}: query_count reset to 0")
     
     # Set cookie for persistence (30 days)
@@ -171,7 +338,7 @@ async def demo_chat(
         )
     
     # Get room
-    room = db.query(DBRoom).filter(DBRoom.id == demo.room_id).first()
+    room = await run_db(lambda: db.query(DBRoom).filter(DBRoom.id == demo.room_id).first())
     if room is None:
         raise HTTPException(status_code=500, detail="Room not found")
     
@@ -181,22 +348,14 @@ async def demo_chat(
         role="user",
         author="user",
         content=message.content,
-        mentions="[]",
+        mentions=[],
         timestamp=datetime.utcnow()
     )
     db.add(user_msg)
     
     # Get AI responses (simplified - no full orchestration for demo)
-    from providers.llm_router import LLMRouter
-    from auth.token_store import TokenStore
-    from auth.oauth_refresh import OAuthRefresher
-    from auth.oauth_manager import OAuthManager
-    
-    # Initialize LLM router
-    oauth_manager = OAuthManager()
-    token_store = TokenStore()
-    oauth_refresher = OAuthRefresher(oauth_manager, token_store)
-    llm_router = LLMRouter(token_store=token_store, oauth_refresher=oauth_refresher)
+    # Shared app-wide router (keeps circuit breaker state across requests)
+    llm_router = request.app.state.llm_router
     
     ai_responses = []
     available_ais = llm_router.get_available_providers()
@@ -209,12 +368,11 @@ async def demo_chat(
         return {"success": False, "message": "Not enough AIs available"}
     
     first_ai = demo_ais[0]
-    second_ai = demo_ais[1]
     
     # Get conversation history from DB (shared context)
-    history = db.query(DBMessage).filter(
+    history = await run_db(lambda: db.query(DBMessage).filter(
         DBMessage.room_id == room.id
-    ).order_by(desc(DBMessage.timestamp)).limit(5).all()
+    ).order_by(desc(DBMessage.timestamp)).limit(5).all())
     
     shared_context = "\n".join([f"{m.author}: {m.content}" for m in reversed(history)]) if history else ""
     
@@ -233,105 +391,79 @@ Previous conversation:
 User's new question: {message.content}"""
     
     discussion_log = []
+    strategy_ctx = StrategyContext(
+        collaborator=None,
+        room=room,
+        target_ais=demo_ais,
+        user_message=message.content,
+        context=[],
+        options={
+            "llm_router": llm_router,
+            "system_prompt": system_prompt,
+            "synthesis_ai": "AI-1" if "AI-1" in available_ais else first_ai,
+            "discussion_log": discussion_log,
+            "ai_responses": ai_responses
+        }
+    )
     
-    # === AUTONOMOUS AI DISCUSSION (Self-regulated) === #
-    
-    max_rounds = MAX_DISCUSSION_ROUNDS  # SAFEGUARD: Hard limit
-    conversation = []
-    current_speaker = first_ai
-    ais_agreed = set()  # Track which AIs have agreed
-    
-    for round_num in range(max_rounds):
-        try:
-            # Let AIs decide autonomously when to stop
-            if round_num == 0:
-                instruction = "Give your answer. If you want another AI's input, say DISCUSS. If you're confident, say CONSENSUS."
-            else:
-                instruction = "Read the discussion. Add your perspective, or say CONSENSUS if you agree with current direction."
-            
-            prompt = f"{current_speaker}: {instruction}"
-            
-            # Build message history
-            messages = [{"role": "system", "content": system_prompt}]
-            for entry in conversation:
-                messages.append({"role": "assistant", "content": f"{entry['ai']}: {entry['msg']}"})
-            messages.append({"role": "user", "content": prompt})
-            
-            # Get AI response
-            response = await llm_router.chat(
-                messages=messages,
-                preferred_provider=current_speaker
-            )
-            
-            # Log discussion
-            discussion_log.append({
-                "ai": current_speaker,
-                "msg": response,
-                "round": round_num + 1
-            })
-            
-            conversation.append({
-                "ai": current_speaker,
-                "msg": response
-            })
-            
-            ai_responses.append({
-                "ai": current_speaker,
-                "display_name": AI_DISPLAY_NAMES.get(current_speaker, current_speaker),
-                "content": response
-            })
-            
-            # SAFEGUARD: Check for consensus (multiple keywords)
-            if check_consensus(response):
-                ais_agreed.add(current_speaker)
-                # If both AIs agree, stop discussion
-                if len(ais_agreed) >= 2 or round_num >= 3:
-                    print(f"✅ Consensus reached: {len(ais_agreed)} AIs agreed after {round_num + 1} rounds")
-                    break
-            
-            # Switch speaker
-            current_speaker = second_ai if current_speaker == first_ai else first_ai
-            
-        except Exception as e:
-            print(f"❌ Round {round_num + 1} error: {e}")
-            break
-    
-    # Log discussion outcome
-    print(f"✅ Discussion completed: {len(discussion_log)} messages, {len(ais_agreed)} AIs agreed")
-    
-    # === SYNTHESIS (Token-efficient) === #
-    synthesis_response = None
-    if len(discussion_log) >= 2:
+    # Same question asked again in this session → cached synthesis, no provider call
+    semantic_cache = getattr(request.app.state, "semantic_cache", None)
+    cache_scope = f"room-{room.room_id}"
+    cache_persona = "+".join(demo_ais)
+    cached = None
+    if semantic_cache is not None:
+        cached = await semantic_cache.alookup(cache_scope, cache_persona, message.content, "demo")
+    
+    if cached is not None:
+        synthesis_response = cached["response"]
+        db.add(DBMessage(
+            room_id=room.id,
+            role="assistant",
+            author="CHIKA",
+            content=synthesis_response,
+            mentions=[],
+            timestamp=datetime.utcnow()
+        ))
+    else:
+        # SAFEGUARD: Visitor left → abort in-flight provider calls, skip further
+        # rounds, keep the turns generated so far
+        # SAFEGUARD: DISCUSSION_TIMEOUT_SECONDS bounds the whole discussion -
+        # each call gets the remaining budget (no synthesis = turns returned as is)
         try:
-            # Minimal synthesis prompt - AIs already share context
-            synthesis_ai = "AI-1" if "AI-1" in available_ais else first_ai
-            
-            synthesis_response = await llm_router.chat(
-                messages=[
-                    {"role": "system", "content": f"{system_prompt}\n\nDiscussion:\n" + "\n".join([f"{d['ai']}: {d['msg']}" for d in discussion_log])},
-                    {"role": "user", "content": "CHIKA, synthesize final answer (1-2 sentences):"}
-                ],
-                preferred_provider=synthesis_ai
-            )
-            
-            # Save to shared context
-            db.add(DBMessage(
-                room_id=room.id,
-                role="assistant",
-                author="CHIKA",
-                content=synthesis_response,
-                mentions="[]",
-                timestamp=datetime.utcnow()
-            ))
-            
-        except Exception as e:
-            print(f"❌ Synthesis: {e}")
+            with deadline_scope(DISCUSSION_TIMEOUT_SECONDS):
+                result = await cancel_on_disconnect(request.is_disconnected, run_strategy("demo", strategy_ctx))
+            synthesis_response = result['response']
+            if synthesis_response:
+                # Save to shared context
+                db.add(DBMessage(
+                    room_id=room.id,
+                    role="assistant",
+                    author="CHIKA",
+                    content=synthesis_response,
+                    mentions=[],
+                    timestamp=datetime.utcnow()
+                ))
+        except ClientDisconnected:
             synthesis_response = None
+            for entry in discussion_log:
+                db.add(DBMessage(
+                    room_id=room.id,
+                    role="assistant",
+                    author=entry["ai"],
+                    content=entry["msg"],
+                    mentions=[],
+                    timestamp=datetime.utcnow()
+                ))
+            print(f"🔌 Demo session {demo.session_id[:8]}: visitor left after {len(discussion_log)} turns")
+        
+        # SAFEGUARD: never cache the "no AI available" fallback
+        if semantic_cache is not None and synthesis_response and not is_unavailable_response(synthesis_response):
+            await semantic_cache.astore(cache_scope, cache_persona, message.content, synthesis_response, "CHIKA", "demo")
     
     # Update session query count
     demo.query_count += 1
     demo.last_activity = datetime.utcnow()
-    db.commit()
+    await run_db(db.commit)
     
     return {
         "success": True,
@@ -374,70 +506,78 @@ async def get_demo_session(
             "messages": []
         }
     
-    # Find session in DB
-    demo = db.query(DemoSession).filter(DemoSession.session_id == session_id).first()
-    
-    if demo is None or demo.is_expired:
-        # Session expired or not found
-        return {
-            "session_id": "",
-            "query_count": 0,
-            "queries_remaining": 10,
-            "max_queries": 10,
-            "created_at": datetime.utcnow().isoformat(),
-            "messages": []
-        }
-    
-    # Get room and messages
-    room = db.query(DBRoom).filter(DBRoom.id == demo.room_id).first()
-    if room is None:
+    def load() -> Dict:
+        # Find session in DB
+        demo = db.query(DemoSession).filter(DemoSession.session_id == session_id).first()
+        
+        if demo is None or demo.is_expired:
+            # Session expired or not found
+            return {
+                "session_id": "",
+                "query_count": 0,
+                "queries_remaining": 10,
+                "max_queries": 10,
+                "created_at": datetime.utcnow().isoformat(),
+                "messages": []
+            }
+        
+        # Get room and messages
+        room = db.query(DBRoom).filter(DBRoom.id == demo.room_id).first()
+        if room is None:
+            return {
+                "session_id": demo.session_id,
+                "query_count": demo.query_count,
+                "queries_remaining": demo.queries_remaining,
+                "max_queries": demo.max_queries,
+                "created_at": demo.created_at.isoformat(),
+                "messages": []
+            }
+        
+        # Get all messages in room
+        messages = db.query(DBMessage).filter(
+            DBMessage.room_id == room.id
+        ).order_by(asc(DBMessage.timestamp)).all()
+        
+        messages_data = [{
+            "role": m.role,
+            "author": m.author,
+            "content": m.content,
+            "timestamp": m.timestamp.isoformat()
+        } for m in messages]
+        
         return {
             "session_id": demo.session_id,
             "query_count": demo.query_count,
             "queries_remaining": demo.queries_remaining,
             "max_queries": demo.max_queries,
             "created_at": demo.created_at.isoformat(),
-            "messages": []
+            "messages": messages_data
         }
     
-    # Get all messages in room
-    messages = db.query(DBMessage).filter(
-        DBMessage.room_id == room.id
-    ).order_by(asc(DBMessage.timestamp)).all()
-    
-    messages_data = [{
-        "role": m.role,
-        "author": m.author,
-        "content": m.content,
-        "timestamp": m.timestamp.isoformat()
-    } for m in messages]
-    
-    return {
-        "session_id": demo.session_id,
-        "query_count": demo.query_count,
-        "queries_remaining": demo.queries_remaining,
-        "max_queries": demo.max_queries,
-        "created_at": demo.created_at.isoformat(),
-        "messages": messages_data
-    }
+    # DB reads run on the DB thread (run_db) - never on the event loop
+    return await run_db(load)
 
 
 @router.get("/stats")
 async def demo_stats(db: Session = Depends(get_db)):
     """Get demo usage statistics"""
-    from sqlalchemy import func
     
-    total_sessions = db.query(DemoSession).count()
-    active_sessions = db.query(DemoSession).filter(
-        DemoSession.query_count > 0
-    ).count()
-    total_queries = db.query(func.sum(DemoSession.query_count)).scalar() or 0
+    def count() -> Dict:
+        total_sessions = db.query(DemoSession).count()
+        active_sessions = db.query(DemoSession).filter(
+            DemoSession.query_count > 0
+        ).count()
+        total_queries = db.query(func.sum(DemoSession.query_count)).scalar() or 0
+        
+        return {
+            "total_sessions": total_sessions,
+            "active_sessions": active_sessions,
+            "total_queries": total_queries
+        }
     
-    return {
-        "total_sessions": total_sessions,
-        "active_sessions": active_sessions,
-        "total_queries": total_queries
-    }
+    return await run_db(count)
+
+
 @router.delete("/session/reset")
 async def reset_demo_session(
     request: Request,
@@ -455,30 +595,34 @@ async def reset_demo_session(
     if not session_id:
         raise HTTPException(status_code=404, detail="No session found")
     
-    # Find session
-    demo = db.query(DemoSession).filter(DemoSession.session_id == session_id).first()
-    
-    if demo is None or demo.is_expired:
-        raise HTTPException(status_code=404, detail="Session not found or expired")
-    
-    # Get room
-    room = db.query(DBRoom).filter(DBRoom.id == demo.room_id).first()
-    if room is None:
-        raise HTTPException(status_code=404, detail="Room not found")
-    
-    # Delete all messages in the room
-    db.query(DBMessage).filter(DBMessage.room_id == room.id).delete()
-    
-    # Update last activity
-    demo.last_activity = datetime.utcnow()
-    
-    db.commit()
+    def reset() -> Dict:
+        # Find session
+        demo = db.query(DemoSession).filter(DemoSession.session_id == session_id).first()
+        
+        if demo is None or demo.is_expired:
+            raise HTTPException(status_code=404, detail="Session not found or expired")
+        
+        # Get room
+        room = db.query(DBRoom).filter(DBRoom.id == demo.room_id).first()
+        if room is None:
+            raise HTTPException(status_code=404, detail="Room not found")
+        
+        # Delete all messages in the room
+        db.query(DBMessage).filter(DBMessage.room_id == room.id).delete()
+        
+        # Update last activity
+        demo.last_activity = datetime.utcnow()
+        
+        db.commit()
+        
+        return {
+            "success": True,
+            "message": "Conversation reset",
+            "session_id": demo.session_id,
+            "query_count": demo.query_count,
+            "queries_remaining": demo.queries_remaining,
+            "max_queries": demo.max_queries
+        }
     
-    return {
-        "success": True,
-        "message": "Conversation reset",
-        "session_id": demo.session_id,
-        "query_count": demo.query_count,
-        "queries_remaining": demo.queries_remaining,
-        "max_queries": demo.max_queries
-    }
+    # Delete + commit on the DB thread (run_db), not a threadpool worker
+    return await run_db(reset)
@@ -1,16 +1,26 @@
 """Pytest configuration"""
+import os
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from models.room import Base
 
+# Use LiteLLM's bundled model cost map (no network fetch at import)
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
 
 @pytest.fixture(scope="function")
 def test_db():
     """Create test database"""
-    engine = create_engine("sqlite:///:memory:")
+    # One shared connection: DB calls also run on the DB thread (run_db)
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
     Base.metadata.create_all(bind=engine)
-    SessionLocal = sessionmaker(bind=engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)  # Same as the app
     db = SessionLocal()
     
     yield db
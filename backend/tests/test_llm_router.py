@@ -0,0 +1,388 @@
+"""Tests for LLM Router"""
+import asyncio
+from types import SimpleNamespace
+import litellm
+from providers.llm_router import LLMRouter
+
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def _make_router(*names):
+    router = LLMRouter()
+    router.deployments = [
+        {"name": name, "model": f"test/{name}", "priority": 1, "enabled": True}
+        for name in names
+    ] + [{"name": "mock", "model": "mock-ai", "priority": 999, "enabled": True}]
+    router._init_deployment_state()
+    return router
+
+
+class TestStreaming:
+    def test_stream_falls_back_before_first_token(self, monkeypatch):
+        async def fake_acompletion(model, **kwargs):
+            if model == "test/down":
+                raise RuntimeError("provider down")
+            
+            async def gen():
+                for text in ["Hel", "lo"]:
+                    yield _chunk(text)
+            return gen()
+        
+        monkeypatch.setattr(litellm, "acompletion", fake_acompletion)
+        router = _make_router("down", "up")
+        
+        async def collect():
+            return [d async for d in router.stream_chat([{"role": "user", "content": "hi"}])]
+        
+        assert asyncio.run(collect()) == ["Hel", "lo"]
+
+
+class TestCircuitBreaker:
+    def test_open_circuit_skips_deployment(self, monkeypatch):
+        calls = []
+        
+        async def fake_acompletion(model, **kwargs):
+            calls.append(model)
+            raise asyncio.TimeoutError()
+        
+        monkeypatch.setattr(litellm, "acompletion", fake_acompletion)
+        router = _make_router("hanging")
+        messages = [{"role": "user", "content": "hi"}]
+        
+        for _ in range(3):
+            asyncio.run(router.chat(messages))
+        
+        # Two consecutive timeouts open the circuit - third call skips it
+        assert len(calls) == 2
+        assert router.get_health()["hanging"]["state"] == "open"
+
+
+class TestHedging:
+    def test_backup_wins_when_preferred_is_slow(self, monkeypatch):
+        cancelled = []
+        
+        async def fake_acompletion(model, **kwargs):
+            async def gen():
+                try:
+                    if model == "test/slow":
+                        await asyncio.sleep(5)
+                    yield _chunk(model)
+                except asyncio.CancelledError:
+                    cancelled.append(model)
+                    raise
+            return gen()
+        
+        monkeypatch.setattr(litellm, "acompletion", fake_acompletion)
+        router = _make_router("slow", "fast")
+        for deployment in router.deployments[:2]:
+            deployment["hedge_group"] = "free"
+        monkeypatch.setattr(router, "_hedge_delay", lambda deployment: 0.05)
+        
+        result = asyncio.run(router.chat(
+            [{"role": "user", "content": "hi"}],
+            preferred_provider="slow",
+            hedge=True
+        ))
+        
+        assert result == "test/fast"
+        assert cancelled == ["test/slow"]
+    
+    def test_non_streamed_calls_do_not_feed_ttft(self, monkeypatch):
+        async def fake_acompletion(model, **kwargs):
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="hello"))])
+        
+        monkeypatch.setattr(litellm, "acompletion", fake_acompletion)
+        router = _make_router("only")
+        router.cache = None
+        asyncio.run(router.chat([{"role": "user", "content": "hi"}]))
+        
+        assert router.stats["only"].sample_count == 0  # Hedge delay unaffected
+        assert router.stats["only"].ewma_latency is not None
+
+
+
+class TestQuorum:
+    def test_returns_when_k_agree_and_cancels_the_rest(self, monkeypatch):
+        cancelled = []
+        delays = {"test/a": 0.01, "test/b": 0.02, "test/c": 5.0}
+        
+        async def fake_acompletion(model, **kwargs):
+            try:
+                await asyncio.sleep(delays[model])
+            except asyncio.CancelledError:
+                cancelled.append(model)
+                raise
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Paris"))])
+        
+        monkeypatch.setattr(litellm, "acompletion", fake_acompletion)
+        router = _make_router("a", "b", "c")
+        
+        result = asyncio.run(router.quorum_chat([{"role": "user", "content": "capital?"}], n=3, k=2))
+        
+        assert result == {"response": "Paris", "deployments": ["a", "b"], "agreed": True}
+        assert cancelled == ["test/c"]
+
+    def test_default_equivalence_accepts_paraphrases_not_other_facts(self, monkeypatch):
+        answers = {
+            "test/a": (0.01, "The capital of France is Paris."),
+            "test/b": (0.02, "The capital of France is Lyon."),
+            "test/c": (0.03, "Paris is the capital of France.")
+        }
+        
+        async def fake_acompletion(model, **kwargs):
+            delay, answer = answers[model]
+            await asyncio.sleep(delay)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=answer))])
+        
+        monkeypatch.setattr(litellm, "acompletion", fake_acompletion)
+        router = _make_router("a", "b", "c")
+        router.cache = None
+        
+        result = asyncio.run(router.quorum_chat([{"role": "user", "content": "capital?"}], n=3, k=2))
+        
+        assert result["deployments"] == ["a", "c"] and result["agreed"]
+
+class TestDeadline:
+    def test_call_gets_remaining_budget_and_no_fallback_after_deadline(self, monkeypatch):
+        import pytest
+        from providers.deadline import DeadlineExceeded, deadline_scope
+        calls = []
+        
+        async def fake_acompletion(model, timeout=None, **kwargs):
+            calls.append((model, timeout))
+            await asyncio.sleep(5)
+        
+        monkeypatch.setattr(litellm, "acompletion", fake_acompletion)
+        router = _make_router("slow", "backup")
+        
+        async def run():
+            with deadline_scope(0.1):
+                await router.chat([{"role": "user", "content": "hi"}])
+        
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(run())
+        
+        # Only the first deployment was tried, with the request's budget
+        assert [model for model, _ in calls] == ["test/slow"]
+        assert calls[0][1] <= 0.1
+        assert router.get_health()["slow"]["state"] == "closed"
+    
+    def test_only_the_deadline_cut_off_becomes_deadline_exceeded(self):
+        import pytest
+        from providers.deadline import DeadlineExceeded, deadline_scope, iterate_until_deadline
+        
+        async def provider_timeout():
+            yield "a"
+            raise asyncio.TimeoutError()  # The provider's own timeout
+        
+        async def hanging():
+            yield "a"
+            await asyncio.sleep(5)
+            yield "b"
+        
+        async def collect(stream):
+            with deadline_scope(0.1):
+                return [item async for item in iterate_until_deadline(stream)]
+        
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(collect(provider_timeout()))
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(collect(hanging()))
+
+class TestResponseCache:
+    def test_identical_request_served_from_cache(self, monkeypatch):
+        calls = []
+        
+        async def fake_acompletion(model, **kwargs):
+            calls.append(model)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="cached answer"))])
+        
+        monkeypatch.setattr(litellm, "acompletion", fake_acompletion)
+        router = _make_router("up")
+        messages = [{"role": "user", "content": "hi"}]
+        
+        assert asyncio.run(router.chat(messages)) == "cached answer"
+        assert asyncio.run(router.chat(messages)) == "cached answer"
+        assert len(calls) == 1
+        assert router.get_cache_stats()["hits"] == 1
+    
+    def test_sqlite_cache_survives_restart(self, tmp_path):
+        from providers.response_cache import SQLiteResponseCache
+        
+        path = str(tmp_path / "cache.db")
+        cache = SQLiteResponseCache(path=path, max_entries=2)
+        cache.set("a", "answer")
+        assert cache.get("a") == "answer"  # Readable before the write lands
+        cache.flush()
+        
+        reopened = SQLiteResponseCache(path=path, max_entries=2)
+        assert reopened.get("a") == "answer"
+        
+        # Router lookups read on the cache's reader thread, not the event loop
+        import threading
+        readers = []
+        read = reopened._get
+        reopened._get = lambda key: readers.append(threading.current_thread().name) or read(key)
+        assert asyncio.run(reopened.aget("a")) == "answer"
+        assert readers[0].startswith("response-cache-read")
+        reopened.set("b", "2")
+        reopened.set("c", "3")
+        reopened.flush()
+        assert reopened.stats()["entries"] == 2  # Running count, LRU "a" evicted
+        assert reopened.stats()["evictions"] == 1
+
+    
+    def test_semantic_cache_matches_same_question_per_scope(self, tmp_path):
+        from providers.semantic_cache import SemanticCache
+        
+        cache = SemanticCache(path=str(tmp_path), threshold=0.9, max_entries=2, dim=128)
+        cache.store("room-1", "claude", "What is Python?", "A programming language")
+        
+        assert cache.lookup("room-1", "claude", "what's python ?")['response'] == "A programming language"
+        assert cache.lookup("room-2", "claude", "What is Python?") is None  # Other scope
+        assert cache.lookup("room-1", "gpt", "What is Python?") is None  # Other persona
+        assert cache.lookup("room-1", "claude", "What is Python?", strategy="debate") is None  # Other strategy
+        assert cache.lookup("room-1", "claude", "How do I cook pasta?") is None
+        
+        # Similar wording, different question (hashed n-grams score these > 0.9)
+        cache.store("room-1", "claude", "How to reverse a list in Python without modifying the original", "reversed(xs)")
+        assert cache.lookup("room-1", "claude", "How to sort a list in Python without modifying the original") is None
+        assert cache.lookup("room-1", "claude", "Why?") is None  # Follow-up: never cached
+        
+        cache.store("room-1", "claude", "What is Rust?", "Another language")
+        cache.store("room-1", "claude", "What is Go?", "Yet another one")
+        assert cache.lookup("room-1", "claude", "What is Python?") is None  # Oldest evicted
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["evictions"] == 2
+
+
+class TestHTTPTransport:
+    def test_shared_client_reused_then_closed_and_throwaway_fallback(self, monkeypatch):
+        from providers.http_transport import HTTPTransport
+        
+        monkeypatch.setattr(litellm, "aclient_session", None)
+        transport = HTTPTransport(http2=False)
+        router = _make_router("up")
+        
+        async def scenario():
+            async with transport.session() as client:
+                throwaway = client  # Not started: one-off client...
+            assert throwaway.is_closed  # ...closed after use
+            
+            await transport.start()
+            router.use_transport(transport)
+            async with transport.session() as first:
+                pass
+            async with transport.session() as second:
+                pass
+            assert first is second is transport.client  # Pool reused, left open
+            assert not first.is_closed
+            assert litellm.aclient_session is first  # Provider calls share it
+            
+            await transport.close()
+            return first
+        
+        shared = asyncio.run(scenario())
+        assert shared.is_closed
+        assert transport.client is None
+        assert litellm.aclient_session is None
+
+
+class TestSingleFlight:
+    def test_concurrent_identical_requests_share_one_call(self, monkeypatch):
+        calls = []
+        
+        async def fake_acompletion(model, stream=False, **kwargs):
+            calls.append(model)
+            
+            async def gen():
+                for text in ["a", "b", "c"]:
+                    await asyncio.sleep(0.02)
+                    yield _chunk(text)
+            return gen()
+        
+        monkeypatch.setattr(litellm, "acompletion", fake_acompletion)
+        router = _make_router("up")
+        router.cache = None
+        messages = [{"role": "user", "content": "hi"}]
+        
+        async def collect(delay):
+            await asyncio.sleep(delay)
+            return "".join([d async for d in router.stream_chat(messages)])
+        
+        async def burst():
+            return await asyncio.gather(collect(0), collect(0.03))
+        
+        # Late joiner replays the buffered prefix
+        assert asyncio.run(burst()) == ["abc", "abc"]
+        assert len(calls) == 1
+
+
+class TestAdaptiveRouting:
+    def test_faster_deployment_tried_first(self):
+        router = _make_router("slow", "fast")
+        for _ in range(5):
+            router.stats["slow"].record_completion(4.0)
+            router.stats["fast"].record_completion(0.5)
+        
+        order = [d["name"] for d in router._order_deployments()]
+        assert order == ["fast", "slow", "mock"]
+        
+        # Preferred provider (persona) still goes first
+        order = [d["name"] for d in router._order_deployments("slow")]
+        assert order[0] == "slow"
+    
+    def test_context_window_fits_every_fallback(self):
+        router = _make_router("big", "small")
+        router.deployments[0]["context_window"] = 200000
+        router.deployments[1]["context_window"] = 4096
+        
+        assert router.get_context_window("big") == 4096  # "small" may serve it
+    
+    def test_stale_slow_stats_decay_back_to_default(self):
+        from providers.deployment_stats import DeploymentStats
+        
+        now = [0.0]
+        stats = DeploymentStats("slow", alpha=1.0, half_life_seconds=60, default_latency=2.0, clock=lambda: now[0])
+        stats.record_completion(10.0)  # One slow call
+        assert stats.expected_latency() == 10.0
+        
+        now[0] = 60.0
+        assert stats.expected_latency() == 6.0  # Halfway back after one half-life
+        now[0] = 600.0
+        assert abs(stats.expected_latency() - 2.0) < 0.01  # Ranked like a fresh deployment again
+
+
+class TestBulkhead:
+    def test_full_queue_raises_and_rooms_are_served_fairly(self):
+        from providers.bulkhead import Bulkhead, BulkheadFullError
+        
+        async def scenario():
+            bulkhead = Bulkhead("ollama", max_concurrent=1, max_queue=3)
+            served = []
+            
+            async def call(room):
+                async with bulkhead.slot(room):
+                    served.append(room)
+                    await asyncio.sleep(0.01)
+            
+            holder = asyncio.create_task(call("busy"))
+            await asyncio.sleep(0)
+            waiters = [asyncio.create_task(call(room)) for room in ["busy", "busy", "quiet"]]
+            await asyncio.sleep(0)
+            
+            try:
+                await bulkhead.acquire("late")
+                rejected = False
+            except BulkheadFullError:
+                rejected = True
+            
+            await asyncio.gather(holder, *waiters)
+            return rejected, served
+        
+        rejected, served = asyncio.run(scenario())
+        assert rejected
+        # "quiet" doesn't wait behind every queued "busy" request
+        assert served == ["busy", "busy", "quiet", "busy"]
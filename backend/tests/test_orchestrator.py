@@ -1,7 +1,71 @@
 """Tests for AI Orchestrator"""
+import asyncio
+import time
 import pytest
 from orchestrator.collaborator import AICollaborator
 
+
+class FakeRoom:
+    """Room stand-in for orchestration tests (no DB row)"""
+    id = 1
+    room_id = "room-1"
+    user_id = "u1"
+    
+    def __init__(self, *ais, strategy=None):
+        self.ai_list = list(ais)
+        self.strategy = strategy
+
+
+class FakeRouter:
+    """Scripted LLM router
+    
+    answers: one text for every AI, {ai: text}, or a list served in order
+    (an Exception instance is raised instead of returned); reviews get
+    review (text or {ai: text}, "I agree, sounds good." by default).
+    Records the AI of each call, review count and cancelled calls.
+    """
+    
+    def __init__(self, answers="", review="I agree, sounds good.", delays=None):
+        self.answers = answers
+        self.review = review
+        self.delays = delays or {}
+        self.calls = []
+        self.reviews = 0
+        self.cancelled = []
+    
+    async def chat(self, messages, preferred_provider=None, **kwargs):
+        self.calls.append(preferred_provider)
+        try:
+            await asyncio.sleep(self.delays.get(preferred_provider, 0))
+        except asyncio.CancelledError:
+            self.cancelled.append(preferred_provider)
+            raise
+        if "proposed this response" in messages[-1]['content']:
+            self.reviews += 1
+            return self._pick(self.review, preferred_provider, "I agree, sounds good.")
+        answer = self.answers.pop(0) if isinstance(self.answers, list) else self._pick(self.answers, preferred_provider)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    
+    async def stream_chat(self, messages, preferred_provider=None, **kwargs):
+        yield "I agree."
+    
+    @staticmethod
+    def _pick(script, ai, default=None):
+        return script.get(ai, default) if isinstance(script, dict) else script
+
+
+def ask(router, room, question):
+    """One user message to every AI of the room (all @mentioned)"""
+    mentions = " ".join(f"@{ai}" for ai in room.ai_list)
+    return asyncio.run(AICollaborator(router, None).process_user_message(
+        room=room,
+        user_message=f"{mentions} {question}",
+        context=[]
+    ))
+
+
 class TestAICollaborator:
     def test_extract_mentions(self):
         collaborator = AICollaborator(None, None)
@@ -13,3 +77,291 @@ class TestAICollaborator:
         collaborator = AICollaborator(None, None)
         response = "I disagree"
         assert collaborator._detect_disagreement(response) == True
+    
+    def test_concurrent_mode_fans_out(self):
+        router = FakeRouter(
+            answers={
+                'claude': "Use PostgreSQL for concurrent writes.",
+                'gpt': "SQLite is enough for a single user app.",
+                'gemini': "Consider a managed cloud database service."
+            },
+            delays={'claude': 0.1, 'gpt': 0.1, 'gemini': 0.1}
+        )
+        start = time.perf_counter()
+        result = ask(router, FakeRoom('claude', 'gpt', 'gemini'), "hi")
+        elapsed = time.perf_counter() - start
+        
+        assert len(router.calls) == 6  # 3 drafts + 3 reviews
+        assert elapsed < 0.35  # 2 phases, not 6 serial calls
+        assert result['discussion_id'] is None
+    
+    def test_discussion_stops_streaming_on_agreement(self, test_db):
+        from models.room import Room
+        
+        class StreamingRouter:
+            def __init__(self):
+                self.calls = 0
+                self.tokens_sent = 0
+                self.closed = False
+            
+            async def stream_chat(self, messages, preferred_provider=None, **kwargs):
+                self.calls += 1
+                try:
+                    for token in ["I agree", " with gpt.", " Let", " me", " also", " add"] + [" more"] * 50:
+                        self.tokens_sent += 1
+                        yield token
+                finally:
+                    self.closed = True
+        
+        room = Room(room_id="room-1", title="t", user_id="u1")
+        room.ai_list = ['claude', 'gpt']
+        test_db.add(room)
+        test_db.commit()
+        
+        router = StreamingRouter()
+        collaborator = AICollaborator(router, test_db)
+        result = asyncio.run(collaborator._private_discussion(
+            room=room,
+            participants=['claude', 'gpt'],
+            topic="t",
+            initial_messages=[{'ai': 'gpt', 'content': "Use PostgreSQL."}],
+            context=[]
+        ))
+        
+        assert router.calls == 1  # No further rounds
+        assert router.closed and router.tokens_sent < 20  # Generation cut off
+        assert result['consensus'] == "Use PostgreSQL."
+        assert result['messages'][-1]['content'] == "I agree with gpt."
+    
+    
+    def test_streaming_consensus_keeps_final_response_payload(self):
+        from orchestrator.consensus import StreamingConsensus
+        
+        detector = StreamingConsensus()
+        text = "I agree. Final response: use PostgreSQL with read replicas for the reporting load."
+        stops = [detector.feed(text[i:i + 4]) for i in range(0, len(text), 4)]
+        
+        assert detector.agreed and detector.has_payload
+        assert not any(stops)
+        assert detector.final_text == text
+    
+    def test_demo_consensus_needs_uppercase_whole_keyword(self):
+        from routes.demo import check_consensus, stream_turn
+        
+        class ChunkRouter:
+            def __init__(self, text):
+                self.text = text
+            
+            async def stream_chat(self, messages, preferred_provider=None, **kwargs):
+                for i in range(0, len(self.text), 5):
+                    yield self.text[i:i + 5]
+        
+        prose = "Here is a complete overview of the topic. First, " + "details " * 20
+        text, agreed = asyncio.run(stream_turn(ChunkRouter(prose), [], "AI-1", "room-1"))
+        assert not agreed and text == prose
+        assert not check_consensus("I disagree with that point. Finally, it is not COMPLETED.")
+        
+        signal = "CONSENSUS. We both recommend PostgreSQL. " + "More text " * 20
+        text, agreed = asyncio.run(stream_turn(ChunkRouter(signal), [], "AI-1", "room-1", cut_off=False))
+        assert agreed and text == signal  # First answer kept whole
+        text, agreed = asyncio.run(stream_turn(ChunkRouter(signal), [], "AI-2", "room-1"))
+        assert agreed and len(text) < len(signal)
+    
+    
+    def test_converging_drafts_skip_review(self):
+        router = FakeRouter("Python is a readable high-level language with a large library ecosystem.")
+        result = ask(router, FakeRoom('claude', 'gpt'), "what is python?")
+        
+        assert len(router.calls) == 2  # Drafts only, no review calls
+        assert result['author'] in ('claude', 'gpt')  # Primary draft (mention order is a set)
+    
+    def test_semantic_cache_skips_fallback_and_follow_ups(self, tmp_path):
+        from providers.mock_llm import UNAVAILABLE_MESSAGE
+        from providers.semantic_cache import SemanticCache
+        
+        cache = SemanticCache(path=str(tmp_path), dim=128)
+        router = FakeRouter([UNAVAILABLE_MESSAGE, "Because of the GIL.", "Because it is slow.", "Again?"])
+        collaborator = AICollaborator(router, None, semantic_cache=cache)
+        ask = lambda question: asyncio.run(
+            collaborator.process_user_message(FakeRoom('claude'), question, [])
+        )['response']
+        
+        ask("Why is Python slow?")
+        assert ask("Why is Python slow?") == "Because of the GIL."  # Fallback text was not cached
+        assert ask("why is python slow") == "Because of the GIL."  # Served from cache
+        assert ask("Why?") == "Because it is slow."
+        assert ask("Why?") == "Again?"  # Follow-up depends on the conversation → never cached
+        assert len(router.calls) == 4
+    
+    def test_contradictory_drafts_still_reviewed(self):
+        router = FakeRouter({
+            'claude': "The function is correct and handles every edge case of the input parsing properly.",
+            'gpt': "The function is not correct and handles every edge case of the input parsing properly."
+        })
+        ask(router, FakeRoom('claude', 'gpt'), "is my function correct?")
+        
+        assert router.reviews == 2  # Similar words, opposite claims → review
+    
+    def test_drafts_naming_different_facts_still_reviewed(self):
+        from orchestrator.agreement import agreement_score
+        
+        router = FakeRouter({
+            'claude': "The capital of Australia is Sydney, a large city on the east coast.",
+            'gpt': "The capital of Australia is Canberra, a large city on the east coast."
+        })
+        assert agreement_score(list(router.answers.values())) >= 0.9  # Wording alone says "agree"
+        ask(router, FakeRoom('claude', 'gpt'), "what is the capital of Australia?")
+        
+        assert router.reviews == 2  # Same words, different city → review
+    
+    def test_polite_however_is_not_disagreement(self):
+        collaborator = AICollaborator(None, None)
+        draft = "Python is a high-level programming language known for readability and a large library ecosystem."
+        review = "Good answer. However, Python is also known for readability and its large library ecosystem."
+        assert collaborator._detect_disagreement(review, reference=draft) == False
+        assert collaborator._detect_disagreement("However, Rust is faster and memory safe.", reference=draft) == True
+    
+    def test_strategy_dag_runs_independent_steps_concurrently(self):
+        from orchestrator.strategies import Step, run_dag
+        
+        async def slow(value):
+            await asyncio.sleep(0.1)
+            return value
+        
+        steps = [
+            Step("a", lambda deps: slow(1)),
+            Step("b", lambda deps: slow(2)),
+            Step("sum", lambda deps: slow(deps["a"] + deps["b"]), ("a", "b"))
+        ]
+        start = time.perf_counter()
+        results = asyncio.run(run_dag(steps))
+        
+        assert results["sum"] == 3
+        assert time.perf_counter() - start < 0.3  # a and b in parallel
+    
+    def test_failing_step_cancels_its_siblings(self):
+        from orchestrator.strategies import Step, run_dag
+        
+        cleaned_up = []
+        
+        async def slow(deps):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                await asyncio.sleep(0)  # Releasing a slot takes a turn
+                cleaned_up.append("slow")
+                raise
+        
+        async def failing(deps):
+            raise RuntimeError("provider down")
+        
+        async def run():
+            with pytest.raises(RuntimeError):
+                await run_dag([Step("slow", slow), Step("failing", failing), Step("result", slow, ("slow", "failing"))])
+            return list(cleaned_up)  # Cleanup finished before run_dag raised
+        
+        assert asyncio.run(run()) == ["slow"]
+    
+    def test_quorum_strategy_returns_when_k_agree(self):
+        router = FakeRouter(
+            "Python is a readable high-level language with many libraries.",
+            delays={'claude': 0.01, 'gpt': 0.02, 'gemini': 5.0}
+        )
+        result = ask(router, FakeRoom('claude', 'gpt', 'gemini', strategy='quorum'), "what is python?")
+        
+        assert result['author'] == 'claude & gpt'
+        assert router.cancelled == ['gemini']
+    
+    def test_quorum_does_not_count_near_duplicates_that_disagree(self):
+        router = FakeRouter(
+            {
+                'claude': "Paris is the capital of France.",
+                'gpt': "Lyon is the capital of France.",  # 0.83 similar to claude's
+                'gemini': "The capital of France is Paris."
+            },
+            delays={'claude': 0.01, 'gpt': 0.02, 'gemini': 0.05}
+        )
+        result = ask(router, FakeRoom('claude', 'gpt', 'gemini', strategy='quorum'), "capital of France?")
+        
+        assert result['author'] == 'claude & gemini'
+        assert result['response'] == "Paris is the capital of France."
+    
+    def test_provider_quorum_sends_no_persona(self):
+        class QuorumRouter:
+            async def quorum_chat(self, messages, **kwargs):
+                self.messages = messages
+                return {'response': "Paris", 'deployments': ['gemini', 'llama'], 'agreed': True}
+        
+        router = QuorumRouter()
+        result = asyncio.run(AICollaborator(router, None)._get_quorum_response('claude', "capital of France?", []))
+        
+        assert result['response'] == "Paris"
+        assert [m['role'] for m in router.messages] == ['user']  # No "you are Claude" for Gemini
+    
+    
+    def test_cancel_on_disconnect_aborts_provider_call(self):
+        from orchestrator.cancellation import ClientDisconnected, cancel_on_disconnect
+        
+        state = {'cancelled': False, 'disconnected': False}
+        
+        async def slow_provider_call():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                state['cancelled'] = True
+                raise
+        
+        async def is_disconnected():
+            return state['disconnected']
+        
+        async def run():
+            async def leave():
+                await asyncio.sleep(0.05)
+                state['disconnected'] = True
+            asyncio.create_task(leave())
+            with pytest.raises(ClientDisconnected):
+                await cancel_on_disconnect(is_disconnected, slow_provider_call(), poll_interval=0.01)
+        
+        asyncio.run(run())
+        assert state['cancelled']
+    
+    
+    def test_failing_draft_cancels_the_other_drafts(self):
+        from providers.deadline import DeadlineExceeded
+        
+        router = FakeRouter(
+            {'claude': "Use PostgreSQL.", 'gpt': DeadlineExceeded("no budget left")},
+            delays={'claude': 5.0, 'gpt': 0.01}
+        )
+        
+        async def run():
+            with pytest.raises(DeadlineExceeded):
+                await AICollaborator(router, None).process_user_message(
+                    room=FakeRoom('claude', 'gpt'),
+                    user_message="@claude @gpt hi",
+                    context=[]
+                )
+            return list(router.cancelled)  # Before the loop closes leftovers
+        
+        assert asyncio.run(run()) == ['claude']
+    
+    def test_refine_asks_every_other_ai(self, test_db):
+        from models.room import Room
+        
+        room = Room(room_id="room-1", title="t", user_id="u1")
+        room.ai_list = ['claude', 'gpt', 'gemini']
+        test_db.add(room)
+        test_db.commit()
+        
+        router = FakeRouter(review={'gemini': "I disagree: PostgreSQL handles concurrent writes."})
+        result = asyncio.run(AICollaborator(router, test_db).refine(
+            room=room,
+            target_ais=['claude', 'gpt', 'gemini'],
+            user_message="which database?",
+            context=[],
+            primary_response="Use SQLite."
+        ))
+        
+        assert router.calls == ['gpt', 'gemini']  # Not only the first reviewer
+        assert result['author'] == 'claude & gemini'  # Discussion with the dissenter
+        assert result['discussion_id'] is not None
@@ -0,0 +1,489 @@
+"""Tests for room context & persistence"""
+from room.context_builder import fit_to_budget, count_message_tokens
+
+
+def test_context_keeps_newest_turns_and_pins_persona_and_question():
+    messages = [{'role': 'system', 'content': 'persona'}]
+    messages += [{'role': 'user', 'content': f"turn {i} " + "x" * 400} for i in range(50)]
+    messages.append({'role': 'user', 'content': 'current question'})
+    
+    trimmed = fit_to_budget(messages, max_tokens=1000)
+    
+    assert count_message_tokens(trimmed) <= 1000
+    assert trimmed[0]['content'] == 'persona'
+    assert trimmed[-1]['content'] == 'current question'
+    assert trimmed[-2]['content'].startswith('turn 49')
+
+
+def test_context_budget_counts_pinned_and_trims_retrieval_first():
+    from room.context_builder import RELEVANT_PREFIX
+    
+    summary = {'role': 'system', 'content': "summary " + "s" * 4000}
+    retrieved = {'role': 'system', 'content': RELEVANT_PREFIX + "\n".join(f"old {i} " + "r" * 100 for i in range(20))}
+    history = [{'role': 'user', 'content': f"turn {i} " + "x" * 100} for i in range(5)]
+    question = {'role': 'user', 'content': 'current question'}
+    
+    # History fits, retrieval only partly: oldest retrieved lines go first
+    trimmed = fit_to_budget([{'role': 'system', 'content': 'persona'}, retrieved] + history + [question], max_tokens=400)
+    assert count_message_tokens(trimmed) <= 400
+    assert trimmed[2:] == history + [question]
+    assert trimmed[1]['content'].startswith(RELEVANT_PREFIX) and "old 19 " in trimmed[1]['content']
+    assert "old 0 " not in trimmed[1]['content']
+    
+    # Pinned summary alone over budget: cut, still within budget
+    trimmed = fit_to_budget([{'role': 'system', 'content': 'persona'}, summary] + history + [question], max_tokens=300)
+    assert count_message_tokens(trimmed) <= 300
+    assert trimmed[0]['content'] == 'persona' and trimmed[1]['content'].startswith("summary")
+    assert trimmed[-1] == question
+
+
+def test_rolling_summary_replaces_old_turns(test_db):
+    import asyncio
+    from sqlalchemy.orm import sessionmaker
+    from models.room import Room, Message
+    from room.manager import RoomManager
+    from room.memory import ConversationMemory
+    
+    class SummaryRouter:
+        async def chat(self, messages, **kwargs):
+            return "summary of old turns"
+    
+    room = Room(room_id="room-1", title="Long room", user_id="u1")
+    room.ai_list = ["claude", "gpt"]
+    test_db.add(room)
+    test_db.commit()
+    for i in range(40):
+        message = Message(room_id=room.id, role='user', author='user', content=f"turn {i}")
+        message.mention_list = []
+        test_db.add(message)
+    test_db.commit()
+    
+    memory = ConversationMemory(
+        SummaryRouter(),
+        session_factory=sessionmaker(bind=test_db.get_bind()),
+        threshold=30,
+        recent_turns=10
+    )
+    manager = RoomManager(None, test_db, memory=memory)
+    
+    async def run():
+        task = memory.maybe_schedule(room.id, manager._count_unsummarized(room))
+        assert task is not None
+        await memory.wait_idle()
+    
+    asyncio.run(run())
+    
+    context = manager.get_conversation_context(room, limit=200)
+    assert context[0]['role'] == 'system'
+    assert context[0]['content'].endswith("summary of old turns")
+    assert [m['content'] for m in context[1:]] == [f"turn {i}" for i in range(30, 40)]
+    assert manager._count_unsummarized(room) == 10
+
+
+def test_summary_folds_in_chunks_and_skips_fallback(test_db):
+    import asyncio
+    from sqlalchemy.orm import sessionmaker
+    from models.room import Room, Message, RoomSummary
+    from providers.mock_llm import UNAVAILABLE_MESSAGE
+    from room.memory import ConversationMemory
+    from config import settings
+    
+    class ChunkRouter:
+        def __init__(self, answers):
+            self.answers = list(answers)
+            self.prompts = []
+            self.max_tokens = []
+        
+        async def chat(self, messages, **kwargs):
+            self.prompts.append(messages[-1]['content'])
+            self.max_tokens.append(kwargs.get('max_tokens'))
+            return self.answers.pop(0)
+    
+    room = Room(room_id="room-1", title="Big room", user_id="u1")
+    room.ai_list = ["claude"]
+    test_db.add(room)
+    test_db.commit()
+    for i in range(30):
+        test_db.add(Message(room_id=room.id, role='user', author='user', content=f"turn {i} " + "x" * 36))
+    test_db.commit()
+    factory = sessionmaker(bind=test_db.get_bind(), expire_on_commit=False)
+    
+    # Every provider down: nothing stored, messages stay unsummarized
+    down = ConversationMemory(ChunkRouter([UNAVAILABLE_MESSAGE]), session_factory=factory, recent_turns=0, chunk_tokens=100)
+    assert asyncio.run(down.summarize_room(room.id)) is None
+    assert test_db.query(RoomSummary).count() == 0
+    
+    # ~13 tokens per message → 7 per chunk; second chunk fails → first kept
+    router = ChunkRouter(["summary 1", UNAVAILABLE_MESSAGE])
+    memory = ConversationMemory(router, session_factory=factory, recent_turns=0, chunk_tokens=100)
+    summary = asyncio.run(memory.summarize_room(room.id))
+    assert len(router.prompts) == 2 and "turn 7 " not in router.prompts[0]
+    assert summary.summary == "summary 1" and summary.covered_count == 7
+    assert router.max_tokens == [settings.memory_summary_max_tokens] * 2  # Not the chat reply cap
+
+
+def test_background_summary_ignores_request_deadline(test_db):
+    import asyncio
+    from sqlalchemy.orm import sessionmaker
+    from models.room import Room, Message
+    from providers.deadline import current_deadline, deadline_scope
+    from room.memory import ConversationMemory
+    
+    seen = []
+    
+    class DeadlineRouter:
+        async def chat(self, messages, **kwargs):
+            seen.append(current_deadline())
+            return "summary"
+    
+    room = Room(room_id="room-1", title="t", user_id="u1")
+    room.ai_list = ["claude"]
+    test_db.add(room)
+    test_db.commit()
+    for i in range(5):
+        test_db.add(Message(room_id=room.id, role='user', author='user', content=f"turn {i}"))
+    test_db.commit()
+    memory = ConversationMemory(
+        DeadlineRouter(),
+        session_factory=sessionmaker(bind=test_db.get_bind(), expire_on_commit=False),
+        threshold=1,
+        recent_turns=0
+    )
+    
+    async def run():
+        with deadline_scope(60):  # /chat request
+            memory.maybe_schedule(room.id, 5)
+        await memory.wait_idle()
+    
+    asyncio.run(run())
+    assert seen == [None]
+
+
+def test_vector_index_search_survives_compaction(tmp_path):
+    from providers.embeddings import embed_texts
+    from room.vector_index import VectorIndex
+    
+    texts = [f"message number {i} about topic {i % 7}" for i in range(50)]
+    texts[17] = "Le déploiement Kubernetes plante au démarrage du pod"
+    index = VectorIndex(str(tmp_path), dim=128, segment_rows=8, max_segments=3)
+    for start in range(0, 50, 5):
+        index.add("room-1", range(start, start + 5), embed_texts(texts[start:start + 5], 128))
+    
+    store = index.store("room-1")
+    assert len(store._segments) <= 3  # Tail segments were compacted
+    assert store.count == 50
+    
+    query = embed_texts(["pourquoi le pod kubernetes plante au demarrage ?"], 128)
+    assert index.search("room-1", query, k=3)[0][0][0] == 17
+    assert 17 not in [i for i, _ in index.search("room-1", query, k=3, exclude={17})[0]]
+    
+    store.remove([17])
+    store.compact()
+    reopened = VectorIndex(str(tmp_path), dim=128).store("room-1")
+    assert reopened.count == 49
+    assert reopened.max_id == 49
+    assert 17 not in [i for i, _ in reopened.search(query, k=3)[0]]
+
+
+def test_context_retrieves_relevant_older_message(test_db, tmp_path):
+    import asyncio
+    from sqlalchemy.orm import sessionmaker
+    from models.room import Room, Message
+    from room.indexer import VectorIndexer
+    from room.manager import RoomManager, RELEVANT_PREFIX
+    from room.vector_index import VectorIndex
+    
+    room = Room(room_id="room-1", title="t", user_id="u1")
+    room.ai_list = ["claude"]
+    test_db.add(room)
+    test_db.commit()
+    contents = [f"small talk number {i}" for i in range(20)]
+    contents[2] = "Our Kubernetes pod crashes at startup"
+    for content in contents:
+        message = Message(room_id=room.id, role='user', author='user', content=content)
+        message.mention_list = []
+        test_db.add(message)
+    test_db.commit()
+    
+    index = VectorIndex(str(tmp_path), dim=128)
+    manager = RoomManager(None, test_db, vector_index=index)
+    assert manager.get_conversation_context(room, limit=5, query="kubernetes pod crash")[0]['role'] == 'user'  # Not indexed yet
+    
+    # Background indexing in small batches, off the DB thread
+    indexer = VectorIndexer(index, session_factory=sessionmaker(bind=test_db.get_bind()), batch_size=8)
+    assert asyncio.run(indexer.sync_room(room.id, room.room_id)) == 20
+    context = manager.get_conversation_context(room, limit=5, query="why does the kubernetes pod crash?")
+    
+    assert context[0]['content'].startswith(RELEVANT_PREFIX)
+    assert "Kubernetes pod crashes" in context[0]['content']
+    assert len(context) == 6
+
+
+def test_background_refinement_returns_primary_then_pushes_revision(test_db, monkeypatch):
+    import asyncio
+    from sqlalchemy.orm import sessionmaker
+    from config import settings
+    from room.manager import RoomManager
+    
+    class ReviewRouter:
+        async def chat(self, messages, preferred_provider=None, **kwargs):
+            if "Do you agree" in messages[-1]['content']:
+                return "I disagree: PostgreSQL handles concurrent writes."
+            return "Use SQLite."
+        
+        async def stream_chat(self, messages, preferred_provider=None, **kwargs):
+            yield "I agree."
+    
+    monkeypatch.setattr(settings, 'background_refinement', True)
+    pushed = []
+    
+    async def on_refined(room_id, payload):
+        pushed.append((room_id, payload))
+    
+    manager = RoomManager(
+        ReviewRouter(),
+        test_db,
+        on_refined=on_refined,
+        session_factory=sessionmaker(bind=test_db.get_bind())
+    )
+    room = manager.create_room("t", "u1", active_ais=['claude', 'gpt'])
+    
+    async def run():
+        result = await manager.process_user_message(room, "@claude @gpt which database?")
+        assert result['ai_message'].content == "Use SQLite."  # Returned before review
+        assert not pushed
+        return await result['refinement']
+    
+    revised = asyncio.run(run())
+    
+    assert revised.content == "I disagree: PostgreSQL handles concurrent writes."
+    assert pushed[0][0] == room.room_id
+    assert pushed[0][1]['status'] == 'revised'
+    assert pushed[0][1]['discussion']['status'] == 'resolved'
+    
+    # Later contexts only see the revision, not the superseded answer
+    contents = [m['content'] for m in manager.get_conversation_context(room)]
+    assert "Use SQLite." not in contents
+    assert revised.content in contents
+
+
+def test_partial_answer_never_mixes_phases(test_db):
+    import asyncio
+    from room.manager import RoomManager
+    
+    async def ignore(author, phase, delta):
+        pass
+    
+    manager = RoomManager(None, test_db, on_token=ignore)
+    manager._primary_ai = 'claude'
+    track = manager.collaborator.on_token
+    
+    async def stream():
+        await track('claude', 'draft', "Use PostgreSQL.")
+        await track('gpt', 'draft', "Use SQLite, it is enough for one user.")
+        await track('claude', 'review', "I disagree with @gpt, SQLite can't handle concurrent writers well.")
+    
+    asyncio.run(stream())
+    assert manager._partial_answer() == ('claude', "Use PostgreSQL.")  # Primary draft, no review text
+    
+    asyncio.run(track('claude & gpt', 'consensus', "Use PostgreSQL"))
+    assert manager._partial_answer() == ('claude & gpt', "Use PostgreSQL")
+
+
+def test_run_db_keeps_event_loop_responsive():
+    import asyncio
+    import threading
+    import time
+    from models.room import run_db
+    
+    def slow_commit():
+        time.sleep(0.2)  # e.g. SQLite fsync
+        return threading.current_thread().name
+    
+    async def run():
+        ticks = 0
+        
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        
+        beat = asyncio.create_task(heartbeat())
+        thread_name = await run_db(slow_commit)
+        beat.cancel()
+        return thread_name, ticks
+    
+    thread_name, ticks = asyncio.run(run())
+    assert thread_name.startswith("db")
+    assert ticks >= 10  # Loop kept running during the blocking call
+
+
+def test_unit_of_work_commits_once_per_message(test_db, monkeypatch):
+    import asyncio
+    from sqlalchemy import event
+    from config import settings
+    from models.room import Message
+    from room.manager import RoomManager
+    
+    class DisagreeingRouter:
+        async def chat(self, messages, preferred_provider=None, **kwargs):
+            if "Do you agree" in messages[-1]['content']:
+                return "I disagree: use PostgreSQL instead."
+            return {"claude": "Use SQLite.", "gpt": "Pick a managed cloud database."}[preferred_provider]
+        
+        async def stream_chat(self, messages, preferred_provider=None, **kwargs):
+            yield "I agree."
+    
+    monkeypatch.setattr(settings, 'unit_of_work', True)
+    manager = RoomManager(DisagreeingRouter(), test_db)
+    room = manager.create_room("t", "u1", active_ais=['claude', 'gpt'])
+    
+    commits = []
+    event.listen(test_db, "after_commit", lambda session: commits.append(1))
+    result = asyncio.run(manager.process_user_message(room, "@claude @gpt which database?"))
+    
+    assert len(commits) == 1  # User message + discussion + AI answer together
+    assert result['discussion'].status == 'resolved'
+    assert result['ai_message'].discussion_id == result['discussion'].id
+    assert test_db.query(Message).filter(Message.room_id == room.id).count() == 2
+
+
+def test_write_behind_overlay_then_batched_write(test_db):
+    import asyncio
+    from sqlalchemy.orm import sessionmaker
+    from models.room import AIDiscussion, Message
+    from room.manager import RoomManager
+    from room.write_behind import WriteBehindQueue
+    
+    class DisagreeingRouter:
+        async def chat(self, messages, preferred_provider=None, **kwargs):
+            if "Do you agree" in messages[-1]['content']:
+                return "I disagree: use PostgreSQL instead."
+            return {"claude": "Use SQLite.", "gpt": "Pick a managed cloud database."}[preferred_provider]
+        
+        async def stream_chat(self, messages, preferred_provider=None, **kwargs):
+            yield "I agree."
+    
+    queue = WriteBehindQueue(sessionmaker(bind=test_db.get_bind()), flush_interval_ms=60000)
+    manager = RoomManager(DisagreeingRouter(), test_db, write_behind=queue)
+    room = manager.create_room("t", "u1", active_ais=['claude', 'gpt'])
+    
+    async def run():
+        await manager.process_user_message(room, "@claude @gpt which database?")
+        await manager.process_user_message(room, "@claude thanks")
+        
+        # Nothing written yet - reads go through the overlay
+        assert test_db.query(Message).count() == 0
+        assert [m.role for m in manager.get_messages(room)] == ['user', 'assistant'] * 2
+        assert len(manager.get_discussions(room)) == 1
+        assert manager.get_conversation_context(room)[-1]['role'] == 'assistant'
+        
+        assert await queue.flush() == 5  # 4 messages + 1 discussion
+        await queue.close()
+    
+    asyncio.run(run())
+    
+    assert queue.stats()['batches'] == 1 and queue.stats()['pending_rows'] == 0
+    discussion = test_db.query(AIDiscussion).one()
+    assert [m['ai'] for m in discussion.message_list][-1] in ('claude', 'gpt')  # Turns written too
+    assert len(discussion.turns) == 5  # 2 drafts + 2 reviews + 1 round
+    linked = test_db.query(Message).filter(Message.discussion_id == discussion.id).all()
+    assert len(linked) == 1 and linked[0].role == 'assistant'
+    assert [m.content for m in manager.get_messages(room)][0] == "@claude @gpt which database?"
+
+
+def test_discussion_turns_append_rows_and_read_legacy_json(test_db):
+    import json
+    from sqlalchemy import text
+    from models.room import Room, AIDiscussion, DiscussionTurn
+    
+    room = Room(room_id="room-1", title="t", user_id="u1")
+    room.ai_list = ["claude", "gpt"]
+    test_db.add(room)
+    test_db.commit()
+    
+    discussion = AIDiscussion(room_id=room.id, topic="t", status="ongoing")
+    discussion.participant_list = ["claude", "gpt"]
+    discussion.message_list = [{'ai': 'claude', 'content': "Use SQLite."}]
+    test_db.add(discussion)
+    test_db.commit()
+    discussion.add_message('gpt', "I agree.")
+    test_db.commit()
+    
+    assert discussion.messages == []  # JSON blob no longer rewritten
+    assert [(t.seq, t.ai) for t in test_db.query(DiscussionTurn).order_by(DiscussionTurn.seq)] == [(0, 'claude'), (1, 'gpt')]
+    assert [m['content'] for m in discussion.message_list] == ["Use SQLite.", "I agree."]
+    
+    # Discussion written before turns existed: JSON read, migrated on append
+    test_db.execute(text(
+        "INSERT INTO ai_discussions (room_id, participants, topic, messages, status, created_at) "
+        "VALUES (:room_id, '[]', 'old', :messages, 'resolved', CURRENT_TIMESTAMP)"
+    ), {'room_id': room.id, 'messages': json.dumps([{'ai': 'gpt', 'content': "Old turn"}])})
+    test_db.commit()
+    legacy = test_db.query(AIDiscussion).filter(AIDiscussion.topic == "old").one()
+    assert legacy.message_list[0]['content'] == "Old turn"
+    legacy.add_message('claude', "New turn")
+    test_db.commit()
+    assert [t.content for t in legacy.turns] == ["Old turn", "New turn"]
+
+
+def test_json_columns_decode_once_and_track_changes(test_db):
+    import json
+    from unittest.mock import patch
+    from sqlalchemy import text
+    import models.room as room_models
+    from models.room import Room
+    
+    room = Room(room_id="room-json", title="t", user_id="u1")
+    room.ai_list = ["claude", "gpt"]
+    test_db.add(room)
+    test_db.commit()
+    raw = test_db.execute(text("SELECT active_ais FROM rooms WHERE id = :id"), {'id': room.id}).scalar()
+    assert json.loads(raw) == ["claude", "gpt"]  # Still plain JSON text on disk
+    
+    test_db.expire_all()
+    with patch.object(room_models, 'json_loads', wraps=room_models.json_loads) as loads:
+        loaded = test_db.query(Room).filter(Room.room_id == "room-json").one()
+        for _ in range(10):
+            assert loaded.ai_list == ["claude", "gpt"]
+    assert loads.call_count == 1  # Once per load, not per access
+    
+    loaded.ai_list.append("gemini")  # In-place change is persisted
+    test_db.commit()
+    test_db.expire_all()
+    assert test_db.query(Room).filter(Room.room_id == "room-json").one().ai_list == ["claude", "gpt", "gemini"]
+
+
+def test_repeated_question_hits_semantic_cache(test_db, tmp_path):
+    import asyncio
+    from models.room import Room
+    from providers.semantic_cache import SemanticCache
+    from room.manager import RoomManager
+    
+    class CountingRouter:
+        def __init__(self):
+            self.calls = 0
+        
+        async def chat(self, messages, **kwargs):
+            self.calls += 1
+            return f"Python is a programming language (answer {self.calls})."
+    
+    room = Room(room_id="room-1", title="t", user_id="u1", strategy="single")
+    room.ai_list = ["claude"]
+    test_db.add(room)
+    test_db.commit()
+    
+    router = CountingRouter()
+    cache = SemanticCache(path=str(tmp_path), dim=128)
+    manager = RoomManager(router, test_db, semantic_cache=cache)
+    
+    # The history grows after every answer - the question alone is the key
+    answers = [
+        asyncio.run(manager.process_user_message(room, "What is Python?"))['ai_message'].content
+        for _ in range(3)
+    ]
+    
+    assert router.calls == 1
+    assert cache.stats()["hits"] == 2
+    assert answers == ["Python is a programming language (answer 1)."] * 3